@@ -0,0 +1,1240 @@
+"""
+Benchmark cho pipeline AI (chạy offline, dữ liệu tổng hợp)
+
+Cách chạy (từ thư mục ai/):
+    python benchmarks.py loader [số dòng]
+    python benchmarks.py sidecar [số dòng]
+    python benchmarks.py streaming [số dòng]
+    python benchmarks.py forecast [horizon tối đa]
+    python benchmarks.py batch [số collection tối đa]
+    python benchmarks.py features [số dòng tối đa]
+    python benchmarks.py model_cache [số request]
+    python benchmarks.py model_memory [số worker] [số collection]
+    python benchmarks.py api [số giây mỗi lượt] [số client đồng thời] [số worker gunicorn]
+    python benchmarks.py api_batch [số dòng]
+    python benchmarks.py train_latency [số giây mỗi lượt]
+    python benchmarks.py forecast_cache [số request]
+    python benchmarks.py snapshots [số request]
+    python benchmarks.py history [số dòng]
+    python benchmarks.py scraper [số collection tối đa] [số thread]
+    python benchmarks.py http_cache [số collection]
+    python benchmarks.py delta [số collection]
+    python benchmarks.py rate_limit [số process] [số collection mỗi process] [quota] [period giây]
+    python benchmarks.py decode [số điểm mỗi series]
+    python benchmarks.py dataset_write [số dòng]
+    python benchmarks.py dataset_append [số dòng có sẵn] [số lần append]
+    python benchmarks.py parallel [số collection tối đa] [số worker]
+    python benchmarks.py inference_threads [số client đồng thời] [số request mỗi client] [n_jobs lúc train]
+"""
+
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import shutil
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+import requests
+
+from coingecko_client import CoinGeckoClient, decode_market_chart, market_chart_frame
+from coingecko_stub import start_stub
+from rate_limiter import RateLimiter
+from data_scraper import NFTDataScraper
+from dataset_store import load_dataset_columns, sidecar_path, read_txt_columns, frame_from_columns, write_dataset, write_atomic, format_rows, find_last_line, prefix_hash, read_byte_range
+from history_stream import load_history, slice_range, iter_rows, parse_bound, JSON
+from feature_engine import StreamingFeatureEngine, ForecastState, FEATURE_COLUMNS
+from model_store import ModelArtifacts, ModelCache, artifact_paths
+from nft_predictor_from_txt import NFTPredictorFromTXT, predict_future_prices_batch
+from core_budget import available_cores
+from parallel_runner import run_collections
+
+
+def legacy_load_txt_dataset(txt_file_path):
+    """Bản đọc TXT cũ (loop từng dòng) để so sánh"""
+    data = []
+    with open(txt_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#') or not line:
+                continue
+            parts = line.split('|')
+            if len(parts) == 4:
+                data.append({
+                    'date': pd.to_datetime(parts[0]),
+                    'floor_price': float(parts[1]),
+                    'volume': float(parts[2]),
+                    'market_cap': float(parts[3])
+                })
+    df = pd.DataFrame(data)
+    return df.sort_values('date').reset_index(drop=True)
+
+
+def make_synthetic_dataset(path, rows, freq='h', seed=42):
+    """Tạo file TXT tổng hợp theo format của data_scraper"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', periods=rows, freq=freq)
+    floor_prices = np.abs(50 + np.cumsum(rng.normal(0, 0.5, rows))) + 1
+    volumes = rng.lognormal(8, 1, rows)
+    market_caps = floor_prices * rng.uniform(8000, 15000, rows)
+
+    date_fmt = '%Y-%m-%d %H:%M:%S' if freq != 'D' else '%Y-%m-%d'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# NFT Dataset for benchmark\n")
+        f.write(f"# Total records: {rows}\n")
+        f.write("# Format: DATE|FLOOR_PRICE_USD|VOLUME_USD|MARKET_CAP_USD\n")
+        f.write("#" + "="*60 + "\n")
+        pd.DataFrame({
+            'date': dates.strftime(date_fmt),
+            'floor_price': np.round(floor_prices, 6),
+            'volume': np.round(volumes, 2),
+            'market_cap': np.round(market_caps, 2)
+        }).to_csv(f, sep='|', header=False, index=False)
+
+    return path
+
+
+def timed(fn, *args, repeat=1, **kwargs):
+    """Chạy fn và trả về (kết quả, thời gian tốt nhất tính bằng giây)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench_loader(rows=1_000_000):
+    """So sánh load_txt_dataset (bulk) với bản loop từng dòng"""
+    rows = int(rows)
+    predictor = NFTPredictorFromTXT()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_synthetic_dataset(os.path.join(tmp, 'nft_data_bench_20250101_000000.txt'), rows)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"📄 {rows:,} dòng ({size_mb:.1f} MB)")
+
+        df_new, t_new = timed(predictor.load_txt_dataset, path, repeat=3)
+        df_old, t_old = timed(legacy_load_txt_dataset, path)
+
+    pd.testing.assert_frame_equal(df_new, df_old)
+    print(f"  loop từng dòng : {t_old:8.3f} s")
+    print(f"  bulk columnar  : {t_new:8.3f} s")
+    print(f"  tăng tốc       : {t_old / t_new:8.1f}x (kết quả giống hệt)")
+
+
+def bench_sidecar(rows=1_000_000):
+    """So sánh parse TXT với đọc lại từ sidecar .npz"""
+    rows = int(rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_synthetic_dataset(os.path.join(tmp, 'nft_data_bench_20250101_000000.txt'), rows)
+
+        parsed, t_parse = timed(load_dataset_columns, path, use_sidecar=False, repeat=3)
+        _, t_cold = timed(load_dataset_columns, path)
+        cached, t_warm = timed(load_dataset_columns, path, repeat=5)
+        sidecar_mb = os.path.getsize(sidecar_path(path)) / 1e6
+
+        # Append một dòng: sidecar hash lại phần đầu file rồi chỉ parse phần mới
+        with open(path, 'a') as f:
+            f.write('2100-01-01|1.000000|1.00|1.00\n')
+        resumed, t_resume = timed(load_dataset_columns, path)
+        t_hash = timed(lambda: prefix_hash(read_byte_range(path, 0)).digest(), repeat=3)[1]
+
+    for col, values in parsed.items():
+        np.testing.assert_array_equal(values, cached[col])
+    assert len(resumed['date']) == rows + 1
+
+    print(f"📄 {rows:,} dòng, sidecar {sidecar_mb:.1f} MB")
+    print(f"  parse TXT          : {t_parse * 1000:8.1f} ms")
+    print(f"  lần đầu (+ghi npz) : {t_cold * 1000:8.1f} ms")
+    print(f"  đọc lại từ sidecar : {t_warm * 1000:8.1f} ms")
+    print(f"  resume sau append  : {t_resume * 1000:8.1f} ms (hash phần đầu file {t_hash * 1000:.1f} ms)")
+
+
+def synthetic_frame(rows, freq='D', seed=42):
+    """DataFrame tổng hợp cùng format với load_txt_dataset"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_synthetic_dataset(os.path.join(tmp, 'bench.txt'), rows, freq=freq, seed=seed)
+        return frame_from_columns(read_txt_columns(path))
+
+
+def bench_streaming(rows=2000):
+    """Kiểm tra StreamingFeatureEngine khớp preprocess_data từng bước, đo thời gian/row"""
+    rows = int(rows)
+    predictor = NFTPredictorFromTXT()
+    df = synthetic_frame(rows)
+
+    engine = StreamingFeatureEngine()
+    max_err = 0.0
+    for i, row in enumerate(df.itertuples(index=False)):
+        streamed = engine.update(row.date, row.floor_price, row.volume, row.market_cap)[0]
+        # So sánh với pandas trên prefix (lấy mẫu để chạy nhanh)
+        if i < 40 or i % 97 == 0 or i == rows - 1:
+            X, _, _ = predictor.prepare_features(predictor.preprocess_data(df.iloc[:i + 1]))
+            expected = X.iloc[-1].to_numpy(dtype=np.float64)
+            np.testing.assert_allclose(streamed, expected, rtol=1e-9, atol=1e-9)
+            max_err = max(max_err, float(np.max(np.abs(streamed - expected))))
+
+    # Dựng lại state từ dataset phải ra cùng vector
+    rebuilt = predictor.build_feature_engine(df)
+    np.testing.assert_allclose(rebuilt.vector(), engine.vector(), rtol=1e-9, atol=1e-9)
+
+    engine = StreamingFeatureEngine()
+    records = list(df.itertuples(index=False))
+    _, t_stream = timed(lambda: [engine.update(r.date, r.floor_price, r.volume, r.market_cap) for r in records])
+    _, t_pandas = timed(lambda: predictor.prepare_features(predictor.preprocess_data(df)), repeat=3)
+
+    print(f"📄 {rows:,} dòng, sai số lớn nhất so với pandas: {max_err:.2e}")
+    print(f"  streaming / observation   : {t_stream / rows * 1e6:8.1f} µs")
+    print(f"  pandas full pass (1 lần)  : {t_pandas * 1e3:8.1f} ms")
+
+
+def legacy_predict_future_prices(predictor, df, days_ahead=7):
+    """Vòng forecast cũ: copy 1 dòng DataFrame, chỉ cập nhật floor_price và date"""
+    future_predictions = []
+    last_row = df.iloc[-1:].copy()
+    for _ in range(days_ahead):
+        X_future, _, _ = predictor.prepare_features(last_row)
+        pred = predictor.predict(X_future)
+        future_predictions.append(pred[0])
+        last_row['date'] = last_row['date'].iloc[0] + timedelta(days=1)
+        last_row['floor_price'] = pred[0]
+    return future_predictions
+
+
+def trained_predictor(rows=365, seed=42):
+    """NFTPredictorFromTXT đã train trên dữ liệu tổng hợp, kèm DataFrame đã xử lý"""
+    predictor = NFTPredictorFromTXT()
+    df_processed = predictor.preprocess_data(synthetic_frame(rows, seed=seed))
+    X, y, _ = predictor.prepare_features(df_processed)
+    predictor.train_model(X, y)
+    return predictor, df_processed
+
+
+def bench_forecast(max_horizon=365):
+    """So sánh forecast đệ quy (cửa sổ NumPy) với vòng lặp DataFrame cũ theo horizon"""
+    max_horizon = int(max_horizon)
+    predictor, df_processed = trained_predictor()
+
+    # Feature bước đầu tiên phải trùng với dòng cuối của prepare_features
+    X, _, feature_names = predictor.prepare_features(df_processed)
+    state = ForecastState.from_engine(predictor.build_feature_engine(df_processed))
+    np.testing.assert_allclose(state.features(feature_names)[0], X.iloc[-1].to_numpy(dtype=np.float64), rtol=1e-9)
+
+    print(f"{'horizon':>8} | {'cũ (ms)':>10} | {'mới (ms)':>10} | {'tăng tốc':>8} | {'std cũ':>8} | {'std mới':>8}")
+    for horizon in [h for h in (7, 30, 90, 180, 365) if h <= max_horizon]:
+        old, t_old = timed(legacy_predict_future_prices, predictor, df_processed, horizon)
+        new, t_new = timed(predictor.predict_future_prices, df_processed, horizon)
+        print(f"{horizon:>8} | {t_old * 1e3:>10.1f} | {t_new * 1e3:>10.1f} | {t_old / t_new:>7.1f}x | "
+              f"{np.std(old):>8.3f} | {np.std(new):>8.3f}")
+
+
+def bench_batch(max_collections=500, days=7):
+    """Forecast N collection: từng collection một vs một lượt batch (model dùng chung)"""
+    max_collections, days = int(max_collections), int(days)
+    predictor, _ = trained_predictor()
+
+    print(f"{'collections':>11} | {'từng cái (ms)':>13} | {'batch (ms)':>10} | {'tăng tốc':>8}")
+    for n in [n for n in (5, 50, 500, 5000) if n <= max_collections]:
+        items = []
+        for i in range(n):
+            clone = NFTPredictorFromTXT()
+            clone.model, clone.scaler, clone.is_trained = predictor.model, predictor.scaler, True
+            items.append((clone, synthetic_frame(60, seed=i), days))
+
+        serial, t_serial = timed(lambda: [p.predict_future_prices(df, d) for p, df, d in items])
+        batch, t_batch = timed(predict_future_prices_batch, items)
+        np.testing.assert_allclose(batch, serial, rtol=1e-9)
+        print(f"{n:>11} | {t_serial * 1e3:>13.1f} | {t_batch * 1e3:>10.1f} | {t_serial / t_batch:>7.1f}x")
+
+
+def bench_features(max_rows=10_000_000):
+    """Thời gian preprocess_data: pandas vs NumPy kernel (1e5 - 1e7 dòng, 1e7 cần ~6GB RAM)"""
+    max_rows = int(float(max_rows))
+    predictor = NFTPredictorFromTXT()
+
+    # Kiểm tra tương đương trên dữ liệu nhỏ / NaN / hằng số: tests/test_feature_engine.py
+    print(f"{'dòng':>12} | {'pandas (ms)':>11} | {'numpy (ms)':>10} | {'tăng tốc':>8}")
+    for rows in [r for r in (100_000, 1_000_000, 10_000_000) if r <= max_rows]:
+        rng = np.random.default_rng(rows)
+        df = pd.DataFrame({
+            'date': pd.date_range('1990-01-01', periods=rows, freq='min'),
+            'floor_price': np.abs(50 + np.cumsum(rng.normal(0, 0.05, rows))) + 1,
+            'volume': rng.lognormal(8, 1, rows),
+            'market_cap': rng.uniform(1e5, 1e6, rows)
+        })
+        expected, t_pandas = timed(predictor.preprocess_data, df, backend='pandas')
+        actual, t_numpy = timed(predictor.preprocess_data, df, backend='numpy')
+        # rolling().std() của pandas cộng/trừ dần nên sai số tích lũy trên chuỗi dài,
+        # NumPy tính lại từng cửa sổ nên chỉ khớp trong sai số nới rộng
+        actual_values = actual[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        expected_values = expected[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        np.testing.assert_allclose(actual_values, expected_values, rtol=1e-6, atol=1e-6)
+        diff = np.max(np.abs(actual_values - expected_values))
+        del expected, actual
+        print(f"{rows:>12,} | {t_pandas * 1e3:>11.0f} | {t_numpy * 1e3:>10.0f} | "
+              f"{t_pandas / t_numpy:>7.1f}x | lệch max {diff:.1e}")
+
+
+def bench_model_cache(requests=200):
+    """joblib.load model + scaler mỗi request (cách cũ của /api/predict) vs ModelCache"""
+    requests = int(requests)
+    predictor, df_processed = trained_predictor()
+    X, _, _ = predictor.prepare_features(df_processed)
+    features = X.iloc[[-1]].to_numpy(dtype=np.float64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        predictor.model_dir = tmp
+        predictor.export_model('bench')
+        model_path, scaler_path, _ = artifact_paths(tmp, 'bench')
+
+        def load_per_request():
+            return joblib.load(model_path).predict(joblib.load(scaler_path).transform(features))
+
+        cache = ModelCache(tmp)
+
+        def cached():
+            artifacts = cache.get('bench')
+            return artifacts.model.predict(artifacts.scaler.transform(features))
+
+        expected, t_old = timed(load_per_request, repeat=max(1, requests // 20))
+        actual, t_new = timed(cached, repeat=requests)
+        np.testing.assert_array_equal(actual, expected)
+
+        # Ghi đè model (train lại) -> request sau phải thấy bản mới
+        os.utime(model_path, ns=(0, os.stat(model_path).st_mtime_ns + 1))
+        cached()
+
+    print(f"  load mỗi request: {t_old * 1e3:8.2f} ms/request")
+    print(f"  ModelCache      : {t_new * 1e3:8.2f} ms/request")
+    print(f"  tăng tốc        : {t_old / t_new:8.1f}x")
+    print(f"  cache stats     : {cache.stats()}")
+
+
+def process_memory_kb():
+    """(RSS, PSS) của process hiện tại theo kB, đọc từ /proc/self/smaps_rollup (Linux)"""
+    memory = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                memory[parts[0][:-1]] = int(parts[1])
+    return memory['Rss'], memory['Pss']
+
+
+def _memory_worker(model_dir, collection_ids, features, use_flat, ready, done, results):
+    """Worker giống ai_api: load mọi collection, predict một lần rồi chờ các worker khác"""
+    before = process_memory_kb()
+    for collection_id in collection_ids:
+        if use_flat:
+            model = ModelArtifacts.load(model_dir, collection_id).model
+        else:
+            model = joblib.load(artifact_paths(model_dir, collection_id)[0])
+        model.predict(features)
+    ready.wait()
+    # Đo khi mọi worker đều đã load xong để PSS chia đúng phần page dùng chung
+    after = process_memory_kb()
+    results.put((before, after))
+    done.wait()
+
+
+def bench_model_memory(workers=4, collections=20):
+    """RSS/PSS mỗi worker khi load mọi model: unpickle .pkl vs FlatForest mmap"""
+    workers, collections = int(workers), int(collections)
+    collection_ids = [f'bench-{i}' for i in range(collections)]
+    ctx = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, collection_id in enumerate(collection_ids):
+            predictor, df_processed = trained_predictor(rows=2000, seed=i)
+            predictor.model_dir = tmp
+            predictor.export_model(collection_id)
+        X, _, _ = predictor.prepare_features(df_processed)
+        features = X.iloc[[-1]].to_numpy(dtype=np.float64)
+
+        # Kết quả phải giống hệt model sklearn
+        for collection_id in collection_ids:
+            expected = joblib.load(artifact_paths(tmp, collection_id)[0]).predict(X.to_numpy())
+            actual = ModelArtifacts.load(tmp, collection_id).model.predict(X.to_numpy())
+            np.testing.assert_array_equal(actual, expected)
+
+        print(f"{workers} worker, {collections} collection (~{predictor.model.estimators_[0].tree_.node_count} node/cây)")
+        print(f"{'format':>8} | {'RSS/worker (MB)':>15} | {'PSS/worker (MB)':>15} | {'tổng PSS (MB)':>13}")
+        for name, use_flat in (('pickle', False), ('mmap', True)):
+            ready, done = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1)
+            results = ctx.Queue()
+            processes = [
+                ctx.Process(target=_memory_worker, args=(tmp, collection_ids, features, use_flat, ready, done, results))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            ready.wait()
+            measured = [results.get() for _ in processes]
+            done.wait()
+            for process in processes:
+                process.join()
+
+            # Chỉ tính phần tăng thêm do load model (bỏ phần interpreter + sklearn import)
+            rss = np.mean([after[0] - before[0] for before, after in measured]) / 1024
+            pss = np.mean([after[1] - before[1] for before, after in measured]) / 1024
+            print(f"{name:>8} | {rss:>15.1f} | {pss:>15.1f} | {pss * workers:>13.1f}")
+
+
+API_URL = 'http://127.0.0.1:5000'
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def export_dataset_models(model_dir, collection_ids):
+    """Train model từ dataset thật của từng collection rồi export vào model_dir"""
+    for collection_id in collection_ids:
+        predictor = NFTPredictorFromTXT()
+        predictor.model_dir = model_dir
+        df_processed = predictor.preprocess_data(predictor.get_latest_dataset(collection_id))
+        X, y, _ = predictor.prepare_features(df_processed)
+        predictor.train_model(X, y)
+        predictor.export_model(collection_id)
+    return len(X.columns)
+
+
+def start_api_server(mode, model_dir, workers, **extra_env):
+    """Chạy ai_api (dev server hoặc gunicorn) trong process riêng, chờ /health trả lời"""
+    env = dict(
+        os.environ, AI_MODEL_DIR=model_dir, AI_RESULTS_DIR=model_dir, AI_API_DEBUG='0', AI_API_BIND='127.0.0.1:5000',
+        **extra_env
+    )
+    if mode == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(workers), 'ai_api:app']
+    else:
+        command = [sys.executable, 'ai_api.py']
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for _ in range(600):
+        try:
+            if requests.get(f'{API_URL}/health', timeout=1).ok:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"ai_api ({mode}) không khởi động được")
+
+
+def measure_throughput(method, path, body, seconds, clients):
+    """Gọi endpoint liên tục từ nhiều client, trả về (request/s, p50 ms, p95 ms)"""
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        latencies = []
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = session.request(method, f'{API_URL}{path}', json=body)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = np.concatenate([np.array(f.result()) for f in [pool.submit(client) for _ in range(clients)]])
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, np.percentile(latencies, 50) * 1e3, np.percentile(latencies, 95) * 1e3
+
+
+def bench_api(seconds=10, clients=8, workers=None):
+    """Throughput của /predict và /predict/future: Werkzeug dev server vs gunicorn prefork"""
+    seconds, clients = float(seconds), int(clients)
+    workers = int(workers) if workers else os.cpu_count() * 2 + 1
+    collection_id = 'azuki'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Đủ model cho mọi collection để preload không tự train
+        n_features = export_dataset_models(tmp, ['cryptopunks', 'azuki', 'bored-ape-yacht-club'])
+        endpoints = [
+            ('POST', f'/predict/{collection_id}', {'features': [0.1] * n_features}),
+            ('GET', f'/predict/future/{collection_id}?days=7', None)
+        ]
+
+        print(f"{clients} client, {seconds:.0f}s mỗi lượt, {os.cpu_count()} CPU")
+        print(f"{'server':>16} | {'endpoint':>24} | {'req/s':>8} | {'p50 (ms)':>8} | {'p95 (ms)':>8}")
+        for mode in ('dev', 'gunicorn'):
+            server = start_api_server(mode, tmp, workers)
+            try:
+                name = 'werkzeug' if mode == 'dev' else f'gunicorn -w {workers}'
+                for method, path, body in endpoints:
+                    measure_throughput(method, path, body, 1, clients)
+                    rps, p50, p95 = measure_throughput(method, path, body, seconds, clients)
+                    print(f"{name:>16} | {path.split('?')[0]:>24} | {rps:>8.1f} | {p50:>8.1f} | {p95:>8.1f}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+def bench_api_batch(rows=500):
+    """rows request /predict/<id> (mỗi request 1 dòng) vs một request /predict/batch"""
+    rows = int(rows)
+    collection_ids = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
+    rng = np.random.default_rng(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n_features = export_dataset_models(tmp, collection_ids)
+        items = [
+            {'collection_id': collection_ids[i % len(collection_ids)], 'features': rng.normal(size=n_features).tolist()}
+            for i in range(rows)
+        ]
+
+        server = start_api_server('dev', tmp, 1)
+        try:
+            with requests.Session() as session:
+                def one_by_one():
+                    return [
+                        session.post(f"{API_URL}/predict/{item['collection_id']}", json={'features': item['features']}).json()['prediction']
+                        for item in items
+                    ]
+
+                def batched():
+                    response = session.post(f'{API_URL}/predict/batch', json={'items': items}).json()
+                    return [p['prediction'] for p in response['predictions']]
+
+                expected, t_old = timed(one_by_one)
+                actual, t_new = timed(batched, repeat=5)
+        finally:
+            server.terminate()
+            server.wait()
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-12)
+    print(f"📊 {rows} dòng, {len(collection_ids)} collection")
+    print(f"  từng request  : {t_old * 1e3:9.1f} ms")
+    print(f"  /predict/batch: {t_new * 1e3:9.1f} ms")
+    print(f"  tăng tốc      : {t_old / t_new:9.1f}x")
+
+
+def bench_train_latency(seconds=15):
+    """Latency /predict khi không train vs khi liên tục có job train chạy nền"""
+    seconds = float(seconds)
+    collection_ids = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
+    clients = 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n_features = export_dataset_models(tmp, collection_ids)
+        endpoint = ('POST', '/predict/azuki', {'features': [0.1] * n_features})
+
+        print(f"{clients} client, {seconds:.0f}s mỗi lượt, {os.cpu_count()} CPU")
+        print(f"{'lượt':>28} | {'req/s':>8} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'job xong':>8}")
+        for name, nice, n_jobs, training in (
+            ('không train', 10, 1, False),
+            ('train, nice 0, n_jobs=-1', 0, -1, True),
+            ('train, nice 10, n_jobs=1', 10, 1, True)
+        ):
+            server = start_api_server('dev', tmp, 1, AI_TRAINING_NICE=str(nice), AI_TRAINING_N_JOBS=str(n_jobs))
+            stop = time.perf_counter() + seconds + 1
+            finished = []
+
+            def keep_training():
+                # Luôn có một job đang chạy trong suốt lượt đo
+                while training and time.perf_counter() < stop:
+                    job = requests.post(f'{API_URL}/train/{collection_ids[len(finished) % 3]}').json()
+                    while requests.get(f"{API_URL}/train/jobs/{job['job_id']}").json()['status'] in ('queued', 'running'):
+                        time.sleep(0.05)
+                    finished.append(job['job_id'])
+
+            try:
+                with ThreadPoolExecutor(1) as trainer:
+                    trainer.submit(keep_training)
+                    measure_throughput(*endpoint, 1, clients)
+                    rps, p50, p95 = measure_throughput(*endpoint, seconds, clients)
+                print(f"{name:>28} | {rps:>8.1f} | {p50:>8.1f} | {p95:>8.1f} | {len(finished):>8}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+def bench_forecast_cache(requests=1000, days=30):
+    """/predict/future: chạy lại pipeline mỗi request vs ForecastCache (trong process, không qua HTTP)"""
+    requests, days = int(requests), int(days)
+    collection_ids = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_dataset_models(tmp, collection_ids)
+        os.environ['AI_MODEL_DIR'] = os.environ['AI_RESULTS_DIR'] = tmp
+        sys.path.insert(0, BACKEND_DIR)
+        import ai_api
+
+        predictor = ai_api.api_predictor
+        expected, t_old = timed(predictor.compute_future_predictions, 'azuki', days, repeat=max(1, requests // 100))
+        first, t_first = timed(predictor.get_future_predictions, 'azuki', days)
+        actual, t_hit = timed(predictor.get_future_predictions, 'azuki', days, repeat=requests)
+        assert actual == expected == first
+
+        # Export model mới -> fingerprint đổi -> forecast phải được tính lại
+        model_path = artifact_paths(tmp, 'azuki')[0]
+        os.utime(model_path, ns=(0, os.stat(model_path).st_mtime_ns + 1))
+        misses = ai_api.forecast_cache.misses
+        predictor.get_future_predictions('azuki', days)
+        assert ai_api.forecast_cache.misses == misses + 1
+
+        stats = ai_api.forecast_cache.stats()
+
+    print(f"📊 /predict/future azuki, days={days}")
+    print(f"  tính lại mỗi request: {t_old * 1e3:9.3f} ms/request")
+    print(f"  lần đầu (miss)      : {t_first * 1e3:9.3f} ms")
+    print(f"  cache hit           : {t_hit * 1e3:9.3f} ms/request")
+    print(f"  tăng tốc            : {t_old / t_hit:9.0f}x")
+    print(f"  cache stats         : {stats}")
+
+
+def bench_snapshots(requests=2000):
+    """/api/predictions: đọc + json.load file mỗi request (cách cũ) vs PredictionSnapshots + ETag/304"""
+    requests = int(requests)
+    ai_dir = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in glob.glob(os.path.join(ai_dir, 'ai_predictions_*.json')):
+            shutil.copy(path, tmp)
+        os.environ['AI_MODEL_DIR'] = os.environ['AI_RESULTS_DIR'] = tmp
+        sys.path.insert(0, BACKEND_DIR)
+        import ai_api
+
+        client = ai_api.app.test_client()
+        paths = sorted(glob.glob(os.path.join(tmp, 'ai_predictions_*.json')))
+
+        def legacy_predictions():
+            data = {}
+            for path in paths:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data[os.path.basename(path).split('_')[2]] = json.load(f)
+            return ai_api.jsonify(data)
+
+        ai_api.app.add_url_rule('/bench/legacy_predictions', view_func=legacy_predictions)
+
+        def load_per_request():
+            return client.get('/bench/legacy_predictions').get_data()
+
+        def served():
+            return client.get('/api/predictions').get_data()
+
+        etag = client.get('/api/predictions').headers['ETag']
+
+        def not_modified():
+            return client.get('/api/predictions', headers={'If-None-Match': etag}).status_code
+
+        _, t_old = timed(load_per_request, repeat=requests)
+        body, t_new = timed(served, repeat=requests)
+        status, t_304 = timed(not_modified, repeat=requests)
+        assert status == 304
+        assert json.loads(body) == json.loads(load_per_request())
+
+        # Snapshot mới hơn của một collection -> response và ETag đổi
+        newer = dict(json.loads(body)['azuki'], timestamp='newer')
+        with open(os.path.join(tmp, 'ai_predictions_azuki_29991231_235959.json'), 'w') as f:
+            json.dump(newer, f)
+        response = client.get('/api/predictions', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.json['azuki'] == newer
+
+    print(f"📊 /api/predictions, {len(paths)} collection (Flask test client, không qua mạng)")
+    print(f"  json.load mỗi request : {t_old * 1e3:8.3f} ms/request")
+    print(f"  snapshot serialize sẵn: {t_new * 1e3:8.3f} ms/request")
+    print(f"  If-None-Match -> 304  : {t_304 * 1e3:8.3f} ms/request")
+
+
+def peak_memory_mb(fn):
+    """Peak memory (MB) do Python/NumPy cấp phát trong lúc chạy fn() (tracemalloc)"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_history(rows=200_000):
+    """/history: dựng list + json.dumps cả chuỗi (kiểu jsonify) vs stream NDJSON theo chunk"""
+    rows = int(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        make_synthetic_dataset(os.path.join(tmp, 'nft_data_bench.txt'), rows)
+        columns = load_history([tmp], 'bench')
+        df = frame_from_columns(columns)
+
+        def materialized():
+            records = df.assign(date=df['date'].dt.strftime('%Y-%m-%dT%H:%M:%S')).to_dict('records')
+            return len(json.dumps(records).encode('utf-8'))
+
+        def streamed():
+            return sum(len(chunk) for chunk in iter_rows(columns, 0, rows, ['floor_price', 'volume', 'market_cap']))
+
+        size_old, t_old = timed(materialized)
+        size_new, t_new = timed(streamed)
+        peak_old, peak_new = peak_memory_mb(materialized), peak_memory_mb(streamed)
+
+        # Stream mảng JSON phải parse lại đúng bằng dữ liệu gốc
+        body = b''.join(iter_rows(columns, 0, rows, ['floor_price', 'volume', 'market_cap'], JSON))
+        decoded = pd.DataFrame(json.loads(body))
+        np.testing.assert_array_equal(pd.to_datetime(decoded['date']).to_numpy(), columns['date'])
+        for col in ('floor_price', 'volume', 'market_cap'):
+            np.testing.assert_array_equal(decoded[col].to_numpy(), columns[col])
+
+        # Một tháng ở giữa chuỗi: binary search vs lọc cả cột
+        start, end = parse_bound('2000-06-01'), parse_bound('2000-06-30 23:00:00')
+        (lo, hi, _), t_search = timed(slice_range, columns['date'], start, end, repeat=100)
+        mask, t_mask = timed(lambda: np.flatnonzero((columns['date'] >= start) & (columns['date'] <= end)), repeat=100)
+        assert (lo, hi) == (mask[0], mask[-1] + 1)
+
+    print(f"📊 {rows:,} dòng hourly")
+    print(f"  jsonify cả chuỗi: {t_old:7.2f} s, peak {peak_old:8.1f} MB, {size_old / 2**20:.1f} MB body")
+    print(f"  stream NDJSON   : {t_new:7.2f} s, peak {peak_new:8.1f} MB, {size_new / 2**20:.1f} MB body")
+    print(f"  khoảng 1 tháng  : searchsorted {t_search * 1e6:.1f} µs vs mask {t_mask * 1e6:.1f} µs ({hi - lo} dòng)")
+
+
+def dataset_rows(path):
+    """Các dòng dữ liệu của file TXT (bỏ header có timestamp)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line for line in f if not line.startswith('#')]
+
+
+def bench_scraper(max_collections=500, workers=16):
+    """scrape_all_collections với stub CoinGecko (latency 50 ms): tuần tự vs thread pool + Session"""
+    max_collections, workers = int(max_collections), int(workers)
+    sizes = [n for n in (5, 50, 500, 5000) if n <= max_collections]
+    server = start_stub(latency=0.05, collection_ids=[f'collection-{i}' for i in range(max(sizes))])
+
+    print(f"📊 stub latency 50 ms, {os.cpu_count()} CPU, không rate limit")
+    print(f"{'collections':>11} | {'tuần tự (s)':>11} | {f'{workers} thread (s)':>13} | {'tăng tốc':>8}")
+    try:
+        for n in sizes:
+            timings = {}
+            outputs = {}
+            for mode_workers in (1, workers):
+                with tempfile.TemporaryDirectory() as tmp:
+                    scraper = NFTDataScraper(base_url=server.base_url, max_workers=mode_workers)
+                    scraper.output_dir = tmp
+                    scraper.client.cache_dir = os.path.join(tmp, 'cache')
+                    scraper.client.rate_limiter = None
+                    scraper.nft_collections = {f'collection-{i}': f'collection-{i}' for i in range(n)}
+
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        results, timings[mode_workers] = timed(scraper.scrape_all_collections, days=90)
+                    assert len(results) == n
+                    outputs[mode_workers] = {cid: dataset_rows(path) for cid, path in results.items()}
+
+            assert outputs[1] == outputs[workers]
+            print(f"{n:>11} | {timings[1]:>11.2f} | {timings[workers]:>13.2f} | {timings[1] / timings[workers]:>7.1f}x")
+
+        # Quota vẫn được giữ khi chạy song song: 11 request ở 600 request/phút (burst 1) ~ 1 giây
+        with tempfile.TemporaryDirectory() as tmp:
+            scraper = NFTDataScraper(base_url=server.base_url, max_workers=workers)
+            scraper.output_dir = tmp
+            scraper.client.cache_dir = os.path.join(tmp, 'cache')
+            scraper.client.rate_limiter = RateLimiter(os.path.join(tmp, 'rate.json'), quota=600, burst=1)
+            scraper.nft_collections = {f'collection-{i}': f'collection-{i}' for i in range(5)}
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, elapsed = timed(scraper.scrape_all_collections, days=90)
+        assert elapsed >= 0.95
+        print(f"  quota 600 request/phút, 5 collection (11 request): {elapsed:.2f} s")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_http_cache(collections=20):
+    """Chạy lại scraper với CoinGeckoClient: lần đầu ra mạng, sau đó cache hit / 304 / replay offline"""
+    collections = int(collections)
+    collection_ids = [f'collection-{i}' for i in range(collections)]
+    server = start_stub(latency=0.05, collection_ids=collection_ids)
+
+    def run(tmp, **client_settings):
+        scraper = NFTDataScraper(base_url=server.base_url)
+        scraper.output_dir = os.path.join(tmp, 'datasets')
+        scraper.client = CoinGeckoClient(base_url=server.base_url, cache_dir=os.path.join(tmp, 'cache'), **client_settings)
+        scraper.client.rate_limiter = None
+        scraper.nft_collections = {collection_id: collection_id for collection_id in collection_ids}
+        before = server.request_count, server.not_modified_count
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, elapsed = timed(scraper.scrape_all_collections, days=90)
+        rows = {cid: dataset_rows(path) for cid, path in results.items()}
+        return rows, elapsed, server.request_count - before[0], server.not_modified_count - before[1]
+
+    print(f"📊 {collections} collection, stub latency 50 ms")
+    print(f"{'lượt':>24} | {'thời gian (s)':>13} | {'request tới server':>18} | {'304':>5}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            runs = [
+                ('lần đầu (cache trống)', run(tmp)),
+                ('chạy lại (trong TTL)', run(tmp)),
+                ('hết TTL -> revalidate', run(tmp, ttl=0)),
+            ]
+            server.shutdown()
+            runs.append(('offline replay', run(tmp, offline=True)))
+
+        for name, (rows, elapsed, sent, not_modified) in runs:
+            assert rows == runs[0][1][0]
+            print(f"{name:>24} | {elapsed:>13.2f} | {sent:>18} | {not_modified:>5}")
+    finally:
+        server.server_close()
+
+
+def drop_last_rows(path, rows):
+    """Bỏ rows dòng dữ liệu cuối file TXT (giả lập dataset cào từ mấy ngày trước)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:-rows])
+
+
+def bench_delta(collections=50, days=90):
+    """Refresh hằng ngày: cào lại cả cửa sổ days ngày vs delta (chỉ phần thiếu từ ngày cuối đã lưu)"""
+    collections, days = int(collections), int(days)
+    collection_ids = [f'collection-{i}' for i in range(collections)]
+    server = start_stub(latency=0.05, collection_ids=collection_ids)
+
+    def run(tmp, run_id, **scrape_kwargs):
+        scraper = NFTDataScraper(base_url=server.base_url)
+        scraper.output_dir = os.path.join(tmp, 'datasets')
+        # Cache riêng cho mỗi lượt: đo đúng lượng dữ liệu phải tải
+        scraper.client = CoinGeckoClient(base_url=server.base_url, cache_dir=os.path.join(tmp, f'cache-{run_id}'))
+        scraper.client.rate_limiter = None
+        scraper.nft_collections = {collection_id: collection_id for collection_id in collection_ids}
+        points = server.points_served
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, elapsed = timed(scraper.scrape_all_collections, days=days, **scrape_kwargs)
+        return {cid: dataset_rows(path) for cid, path in results.items()}, elapsed, server.points_served - points
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            full, _, _ = run(tmp, 'seed', append=True)
+            # Dataset dừng ở hôm qua -> thiếu 1 ngày
+            for collection_id in collection_ids:
+                drop_last_rows(os.path.join(tmp, 'datasets', f'nft_data_{collection_id}.txt'), 1)
+            refreshed_full, t_full, points_full = run(tmp, 'full', append=True)
+
+            for collection_id in collection_ids:
+                drop_last_rows(os.path.join(tmp, 'datasets', f'nft_data_{collection_id}.txt'), 1)
+            refreshed_delta, t_delta, points_delta = run(tmp, 'delta', delta=True)
+
+            # Dataset mới (chưa có file nào) vẫn cào đủ days ngày
+            for collection_id in collection_ids[:1]:
+                os.remove(os.path.join(tmp, 'datasets', f'nft_data_{collection_id}.txt'))
+            rebuilt, _, points_new = run(tmp, 'new', delta=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert refreshed_full == full and refreshed_delta == full and rebuilt == full
+    assert points_new >= 3 * (days + 1)
+
+    print(f"📊 {collections} collection, dataset thiếu 1 ngày, cửa sổ {days} ngày, stub latency 50 ms")
+    print(f"  cào lại cả cửa sổ: {t_full:6.2f} s, {points_full:>7} điểm dữ liệu")
+    print(f"  delta            : {t_delta:6.2f} s, {points_delta:>7} điểm dữ liệu ({points_full / points_delta:.1f}x ít hơn)")
+
+
+def _scrape_worker(base_url, collection_ids, output_dir, state_path, quota, period):
+    """Một process cron: cào collection_ids qua stub với RateLimiter theo state_path"""
+    scraper = NFTDataScraper(base_url=base_url, max_workers=4)
+    scraper.output_dir = output_dir
+    scraper.client = CoinGeckoClient(
+        base_url=base_url, cache_dir=os.path.join(output_dir, 'cache'),
+        rate_limiter=RateLimiter(state_path, quota=quota, period=period)
+    )
+    scraper.nft_collections = {collection_id: collection_id for collection_id in collection_ids}
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper.scrape_all_collections(days=90)
+
+
+def bench_rate_limit(processes=3, collections=20, quota=30, period=10):
+    """Nhiều process cùng cào qua một quota: mỗi process tự giới hạn vs RateLimiter dùng chung
+
+    Quota tính theo period giây (mặc định 30 request / 10 giây, tức 180/phút, cho benchmark
+    ngắn); stub trả 429 + Retry-After khi vượt quota trong cửa sổ trượt period giây.
+    """
+    processes, collections, quota, period = int(processes), int(collections), int(quota), float(period)
+    collection_ids = [[f'collection-{p}-{i}' for i in range(collections)] for p in range(processes)]
+    server = start_stub(latency=0.02, collection_ids=sum(collection_ids, []), quota=quota, quota_period=period)
+    ctx = multiprocessing.get_context('spawn')
+    requests_needed = processes * (2 * collections + 1)
+
+    print(f"📊 {processes} process x {collections} collection ({requests_needed} request), "
+          f"stub quota {quota} request / {period:.0f}s (tối đa {quota * 60 / period:.0f}/phút)")
+    print(f"{'governor':>22} | {'thời gian (s)':>13} | {'429':>5} | {'request thành công/phút':>23}")
+    try:
+        for name, shared in (('mỗi process một bucket', False), ('bucket dùng chung', True)):
+            # Bắt đầu từ cửa sổ quota trống
+            time.sleep(period)
+            throttled_before = server.throttled_count
+            accepted_before = server.request_count - server.throttled_count
+
+            with tempfile.TemporaryDirectory() as tmp:
+                workers = [
+                    ctx.Process(target=_scrape_worker, args=(
+                        server.base_url,
+                        collection_ids[p],
+                        os.path.join(tmp, f'process-{p}'),
+                        os.path.join(tmp, 'rate.json' if shared else f'rate-{p}.json'),
+                        quota,
+                        period
+                    ))
+                    for p in range(processes)
+                ]
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - start
+
+                written = glob.glob(os.path.join(tmp, 'process-*', 'nft_data_*.txt'))
+                assert len(written) == processes * collections
+
+            throttled = server.throttled_count - throttled_before
+            succeeded = server.request_count - server.throttled_count - accepted_before
+            assert succeeded == requests_needed
+            print(f"{name:>22} | {elapsed:>13.1f} | {throttled:>5} | {succeeded / elapsed * 60:>23.0f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def legacy_decode_market_chart(data):
+    """Bản parse market_chart cũ của NFTPricePredictor (DataFrame mỗi series + merge outer) để so sánh"""
+    df_list = []
+    for key, col in (('floor_price_usd', 'floor_price'), ('volume_usd', 'volume'), ('market_cap_usd', 'market_cap')):
+        if key in data and data[key]:
+            series = pd.DataFrame(data[key], columns=['timestamp', col])
+            series['date'] = pd.to_datetime(series['timestamp'], unit='ms')
+            if df_list:
+                df_list[0] = df_list[0].merge(series[['date', col]], on='date', how='outer')
+            else:
+                df_list.append(series[['date', col]])
+    return df_list[0].sort_values('date').reset_index(drop=True)
+
+
+def legacy_scraper_decode(data):
+    """Bản parse cũ của NFTDataScraper.fetch_real_data (loop Python, ghép theo vị trí)"""
+    dates, floor_prices, volumes, market_caps = [], [], [], []
+    for timestamp, price in data['floor_price_usd']:
+        dates.append(datetime.fromtimestamp(timestamp / 1000))
+        floor_prices.append(float(price) if price else 0)
+    for i, (timestamp, volume) in enumerate(data['volume_usd']):
+        if i < len(dates):
+            volumes.append(float(volume) if volume else 0)
+    for i, (timestamp, cap) in enumerate(data['market_cap_usd']):
+        if i < len(dates):
+            market_caps.append(float(cap) if cap else 0)
+    return dates, floor_prices, volumes, market_caps
+
+
+def synthetic_market_chart(points, seed=0):
+    """Response market_chart tổng hợp: series lệch nhau (thiếu điểm, giá trị null, không sắp xếp)"""
+    rng = np.random.default_rng(seed)
+    timestamps = 1_600_000_000_000 + 300_000 * np.arange(points, dtype=np.int64)
+    data = {}
+    for key in ('floor_price_usd', 'volume_usd', 'market_cap_usd'):
+        keep = np.sort(rng.choice(points, size=int(points * 0.95), replace=False))
+        values = rng.uniform(1, 1000, len(keep))
+        series = [[int(t), float(v)] for t, v in zip(timestamps[keep], values)]
+        for i in rng.choice(len(series), size=len(series) // 100, replace=False):
+            series[i][1] = None
+        data[key] = series
+    # Một series về không theo thứ tự thời gian
+    data['market_cap_usd'].reverse()
+    return data
+
+
+def bench_decode(points=100_000):
+    """Parse market_chart: loop Python / DataFrame + merge (cũ) vs decode_market_chart (NumPy)"""
+    points = int(points)
+    data = synthetic_market_chart(points)
+
+    expected, t_merge = timed(legacy_decode_market_chart, data, repeat=3)
+    _, t_loop = timed(legacy_scraper_decode, data, repeat=3)
+    columns, t_new = timed(decode_market_chart, data, repeat=3)
+    _, t_frame = timed(market_chart_frame, data, repeat=3)
+
+    # Kết quả phải khớp merge outer của pandas: cùng tập timestamp, NaN ở đúng chỗ thiếu
+    actual = frame_from_columns(columns)
+    pd.testing.assert_frame_equal(
+        actual[['date', 'floor_price', 'volume', 'market_cap']], expected, check_dtype=False
+    )
+    missing = {col: int(np.isnan(columns[col]).sum()) for col in ('floor_price', 'volume', 'market_cap')}
+
+    print(f"📊 market_chart {points} timestamp x 3 series ({len(columns['date'])} dòng sau khi ghép, NaN: {missing})")
+    print(f"  loop Python (scraper cũ)     : {t_loop * 1e3:9.1f} ms (ghép theo vị trí, sai khi series lệch)")
+    print(f"  DataFrame + merge (cũ)       : {t_merge * 1e3:9.1f} ms")
+    print(f"  decode_market_chart          : {t_new * 1e3:9.1f} ms")
+    print(f"  market_chart_frame           : {t_frame * 1e3:9.1f} ms")
+    print(f"  tăng tốc so với merge        : {t_merge / t_frame:9.1f}x")
+
+
+def legacy_save_to_txt(filename, dates, floor_prices, volumes, market_caps):
+    """Bản save_to_txt cũ (f.write từng dòng, ghi thẳng vào file đích) để so sánh"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write("# NFT Dataset\n")
+        for i in range(len(dates)):
+            date_str = dates[i].strftime('%Y-%m-%d')
+            f.write(f"{date_str}|{floor_prices[i]:.6f}|{volumes[i]:.2f}|{market_caps[i]:.2f}\n")
+
+
+def count_torn_reads(path, rows, write, rounds=3):
+    """Ghi lại path rounds lần trong khi một thread đọc liên tục; trả về (số lần đọc, số lần thấy file thiếu dòng)"""
+    stop = threading.Event()
+    reads = [0, 0]
+
+    def reader():
+        while not stop.is_set():
+            try:
+                n = len(read_txt_columns(path)['date'])
+            except (OSError, EOFError, ValueError):
+                n = -1
+            reads[0] += 1
+            if n != rows:
+                reads[1] += 1
+
+    write()
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for _ in range(rounds):
+            write()
+    finally:
+        stop.set()
+        thread.join()
+    return reads
+
+
+def bench_dataset_write(rows=1_000_000):
+    """save_to_txt: f.write từng dòng vào file đích (cũ) vs write_dataset (format theo cột, file tạm + rename, .gz)"""
+    rows = int(rows)
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2000-01-01', periods=rows, freq='h')
+    floor_prices, volumes, market_caps = rng.uniform(1, 100, rows), rng.uniform(1e3, 5e4, rows), rng.uniform(1e5, 5e6, rows)
+    arrays = (dates, floor_prices, volumes, market_caps)
+
+    print(f"📊 Ghi dataset {rows} dòng")
+    print(f"{'cách ghi':>28} | {'thời gian (s)':>13} | {'kích thước (MB)':>15} | {'đọc lại (s)':>11} | {'đọc dở dang':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        expected = None
+        for name, filename, write in (
+            ('f.write từng dòng (cũ)', 'legacy.txt', legacy_save_to_txt),
+            ('write_dataset', 'nft_data_bench.txt', write_dataset),
+            ('write_dataset (.gz)', 'nft_data_bench.txt.gz', write_dataset),
+        ):
+            path = os.path.join(tmp, filename)
+            _, t_write = timed(write, path, *arrays)
+            size_mb = os.path.getsize(path) / 1e6
+            columns, t_read = timed(load_dataset_columns, path, use_sidecar=False)
+            # Đọc lại phải ra đúng dữ liệu (cùng độ chính xác với định dạng TXT)
+            if expected is None:
+                expected = columns
+            for col, values in expected.items():
+                np.testing.assert_array_equal(columns[col], values)
+            # Sidecar của file .gz cũng phải dùng được
+            np.testing.assert_array_equal(load_dataset_columns(path)['market_cap'], expected['market_cap'])
+            np.testing.assert_array_equal(load_dataset_columns(path)['market_cap'], expected['market_cap'])
+
+            reads, torn = count_torn_reads(path, rows, lambda: write(path, *arrays))
+            print(f"{name:>28} | {t_write:>13.2f} | {size_mb:>15.1f} | {t_read:>11.2f} | {torn:>5}/{reads:<5}")
+        leftovers = [name for name in os.listdir(tmp) if name.startswith('.')]
+        assert not leftovers, leftovers
+
+
+def legacy_copy_append(filename, dates, floor_prices, volumes, market_caps, keep_bytes):
+    """Bản append trước đây: copy keep_bytes byte đầu + dòng mới sang file tạm rồi rename (O(kích thước file))"""
+    def write(f):
+        with open(filename, 'rb') as src:
+            f.write(src.read(keep_bytes))
+        f.write(format_rows(dates, floor_prices, volumes, market_caps))
+
+    write_atomic(filename, write, prefix='.dataset-')
+
+
+def bench_dataset_append(rows=1_000_000, appends=5):
+    """append_to_txt trên file đã có rows dòng: copy cả file + rename (cũ) vs O_APPEND, kèm lần đọc lại qua sidecar"""
+    rows, appends = int(rows), int(appends)
+    rng = np.random.default_rng(0)
+    # Dữ liệu theo giờ để file đủ lớn trong giới hạn datetime64[ns]; append chỉ xét dòng cuối
+    dates = pd.date_range('2000-01-01', periods=rows, freq='h')
+    arrays = (dates, rng.uniform(1, 100, rows), rng.uniform(1e3, 5e4, rows), rng.uniform(1e5, 5e6, rows))
+
+    print(f"📊 {appends} lần append 2 ngày (ghi đè ngày cuối + 1 ngày mới) vào file {rows} dòng")
+    print(f"{'cách append':>24} | {'append (ms)':>11} | {'đọc lại (ms)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper = NFTDataScraper()
+        scraper.output_dir = tmp
+        filename = scraper.append_path('bench')
+        for name, append in (
+            ('copy cả file (cũ)', lambda new_dates, values, offset: legacy_copy_append(filename, new_dates, values, values, values, offset)),
+            ('O_APPEND', lambda new_dates, values, offset: scraper.append_to_txt('bench', new_dates, values, values, values)),
+        ):
+            write_dataset(filename, *arrays, header=['NFT Dataset for bench (append mode)'])
+            load_dataset_columns(filename)
+            t_append = t_load = 0.0
+            for i in range(appends):
+                new_dates = dates[-1].normalize() + pd.to_timedelta([i, i + 1], unit='D')
+                # Dòng cuối hiện tại bị ghi đè: giữ tới đầu dòng đó
+                size = os.path.getsize(filename)
+                offset = size - 4096 + find_last_line(read_byte_range(filename, size - 4096))[0]
+                _, elapsed = timed(append, new_dates, np.full(2, float(i)), offset)
+                t_append += elapsed
+                columns, elapsed = timed(load_dataset_columns, filename)
+                t_load += elapsed
+            assert len(columns['date']) == rows + appends
+            print(f"{name:>24} | {t_append / appends * 1000:>11.1f} | {t_load / appends * 1000:>12.1f}")
+            os.remove(filename)
+            os.remove(sidecar_path(filename))
+
+
+class TmpTxtPredictor:
+    """Factory pickle được: NFTPredictorFromTXT đọc/ghi trong thư mục tạm của benchmark"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self):
+        predictor = NFTPredictorFromTXT()
+        predictor.dataset_dirs = [self.directory]
+        predictor.model_dir = predictor.results_dir = self.directory
+        return predictor
+
+
+def bench_parallel(max_collections=100, workers=4):
+    """main() của predictor: pipeline từng collection tuần tự vs run_collections trên process pool"""
+    max_collections, workers = int(max_collections), int(workers)
+    sizes = [n for n in (3, 10, 30, 100, 300) if n <= max_collections]
+    rng = np.random.default_rng(0)
+
+    print(f"📊 run_prediction_pipeline (365 ngày / collection), {available_cores()} core khả dụng")
+    print(f"{'collection':>10} | {'tuần tự (s)':>11} | {f'{workers} worker (s)':>12} | {'tăng tốc':>8}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            collection_ids = [f'collection-{i}' for i in range(n)]
+            dates = pd.date_range('2024-01-01', periods=365, freq='D')
+            for collection_id in collection_ids:
+                prices = 20 + np.cumsum(rng.normal(0, 0.5, len(dates)))
+                write_dataset(
+                    os.path.join(tmp, f'nft_data_{collection_id}_20250101_000000.txt'),
+                    dates, prices, rng.uniform(1e3, 5e4, len(dates)), prices * rng.uniform(8e3, 1.5e4, len(dates))
+                )
+
+            factory = TmpTxtPredictor(tmp)
+            timings = []
+            for pool_workers in (1, workers):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results, elapsed = timed(
+                        run_collections, factory, 'run_prediction_pipeline', collection_ids,
+                        workers=pool_workers, cores=max(available_cores(), pool_workers)
+                    )
+                assert sorted(results) == sorted(collection_ids)
+                timings.append((results, elapsed))
+
+            (serial, t_serial), (pooled, t_pool) = timings
+            for collection_id in collection_ids:
+                assert serial[collection_id]['future_predictions'] == pooled[collection_id]['future_predictions']
+        print(f"{n:>10} | {t_serial:>11.2f} | {t_pool:>12.2f} | {t_serial / t_pool:>7.2f}x")
+
+
+def latency_under_load(predict, clients, requests):
+    """clients thread cùng gọi predict() requests lần, trả về (mảng latency giây, tổng thời gian)"""
+    def client():
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            predict()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(client) for _ in range(clients)]
+        latencies = np.concatenate([future.result() for future in futures])
+    return latencies, time.perf_counter() - start
+
+
+def bench_inference_threads(clients=8, requests=50, trained_n_jobs=8):
+    """/api/predict với model .pkl: n_jobs pickle lúc train (fan-out mỗi request) vs ngân sách predict của core_budget
+
+    Model được train/pickle với n_jobs=trained_n_jobs (như n_jobs=-1 trên máy train nhiều core)
+    và export không kèm bản FlatForest, nên ModelArtifacts.load trả về RandomForest của sklearn.
+    """
+    clients, requests, trained_n_jobs = int(clients), int(requests), int(trained_n_jobs)
+    predictor, df_processed = trained_predictor()
+    X, _, _ = predictor.prepare_features(df_processed)
+    features = X.iloc[[-1]].to_numpy(dtype=np.float64)
+    predictor.model.n_jobs = trained_n_jobs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path, scaler_path, _ = artifact_paths(tmp, 'bench')
+        joblib.dump(predictor.model, model_path)
+        joblib.dump(predictor.scaler, scaler_path)
+
+        legacy = ModelArtifacts('bench', joblib.load(model_path), joblib.load(scaler_path), {}, None)
+        governed = ModelArtifacts.load(tmp, 'bench')
+        assert legacy.model.n_jobs == trained_n_jobs and governed.model.n_jobs == 1
+
+        print(f"📊 {clients} client đồng thời x {requests} request, RandomForest "
+              f"{len(predictor.model.estimators_)} cây, {available_cores()} core khả dụng")
+        print(f"{'model':>28} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'request/s':>9}")
+        expected = None
+        for name, artifacts in ((f'n_jobs={trained_n_jobs} đã pickle', legacy), ('core_budget (n_jobs=1)', governed)):
+            def predict():
+                return artifacts.model.predict(artifacts.scaler.transform(features))
+
+            result = predict()
+            if expected is None:
+                expected = result
+            np.testing.assert_array_equal(result, expected)
+
+            latencies, elapsed = latency_under_load(predict, clients, requests)
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+            print(f"{name:>28} | {p50:>9.2f} | {p99:>9.2f} | {len(latencies) / elapsed:>9.0f}")
+
+
+BENCHMARKS = {
+    'loader': bench_loader,
+    'sidecar': bench_sidecar,
+    'streaming': bench_streaming,
+    'forecast': bench_forecast,
+    'batch': bench_batch,
+    'features': bench_features,
+    'model_cache': bench_model_cache,
+    'model_memory': bench_model_memory,
+    'api': bench_api,
+    'api_batch': bench_api_batch,
+    'train_latency': bench_train_latency,
+    'forecast_cache': bench_forecast_cache,
+    'snapshots': bench_snapshots,
+    'history': bench_history,
+    'scraper': bench_scraper,
+    'http_cache': bench_http_cache,
+    'delta': bench_delta,
+    'rate_limit': bench_rate_limit,
+    'decode': bench_decode,
+    'dataset_write': bench_dataset_write,
+    'dataset_append': bench_dataset_append,
+    'parallel': bench_parallel,
+    'inference_threads': bench_inference_threads,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Cách dùng: python benchmarks.py <{'|'.join(BENCHMARKS)}> [tham số...]")
+        return 1
+
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,227 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from dataset_store import VALUE_COLUMNS, frame_from_columns, write_atomic
+from rate_limiter import MAX_RETRIES, BACKOFF_BASE, RateLimiter, backoff_delay, retry_after_seconds
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+DEFAULT_API_KEY = "CG-1Tc5UJgmUByfTMibYyMMutVD"
+
+# Cache response trên đĩa: <cache_dir>/<sha1 của URL + params>.json
+DEFAULT_CACHE_DIR = os.environ.get(
+    'COINGECKO_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'coingecko')
+)
+# Market chart theo ngày: 1 giờ là đủ mới; hết TTL thì revalidate bằng ETag/Last-Modified
+DEFAULT_TTL = 3600
+# COINGECKO_OFFLINE=1: chỉ đọc cache (replay), không gọi mạng
+OFFLINE_ENV = 'COINGECKO_OFFLINE'
+# Header được lưu cùng body để revalidate / trả lại cho caller
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+# Series [[timestamp_ms, value], ...] trong response /nfts/{id}/market_chart, theo thứ tự VALUE_COLUMNS
+MARKET_CHART_SERIES = ('floor_price_usd', 'volume_usd', 'market_cap_usd')
+
+
+def _decode_series(points):
+    """[[timestamp_ms, value], ...] -> (timestamp int64, value float64), value null -> NaN"""
+    if not points:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    # Trải phẳng một lượt rồi ép kiểu cả mảng: nhanh hơn np.array trên list lồng nhau, None -> NaN
+    flat = np.fromiter(itertools.chain.from_iterable(points), dtype=object)
+    if len(flat) != 2 * len(points):
+        raise ValueError("market_chart: mỗi điểm phải là [timestamp, value]")
+    return flat[0::2].astype(np.int64), flat[1::2].astype(np.float64)
+
+
+def decode_market_chart(data):
+    """Response market_chart -> mảng cột như dataset_store ('date' + VALUE_COLUMNS)
+
+    Ba series được ghép theo timestamp (hợp các timestamp, sắp xếp tăng dần), không theo vị trí;
+    series không có điểm tại một timestamp thì giá trị là NaN. date là datetime64[ns] theo UTC.
+    """
+    series = [_decode_series(data.get(key)) for key in MARKET_CHART_SERIES]
+    timestamps = np.unique(np.concatenate([ts for ts, _ in series]))
+
+    columns = {'date': timestamps.astype('datetime64[ms]').astype('datetime64[ns]')}
+    for col, (ts, values) in zip(VALUE_COLUMNS, series):
+        aligned = np.full(len(timestamps), np.nan)
+        aligned[np.searchsorted(timestamps, ts)] = values
+        columns[col] = aligned
+    return columns
+
+
+def market_chart_frame(data):
+    """Response market_chart -> DataFrame date/floor_price/volume/market_cap (xem decode_market_chart)"""
+    return frame_from_columns(decode_market_chart(data))
+
+
+class OfflineCacheMiss(requests.ConnectionError):
+    """Chế độ offline nhưng request chưa có trong cache"""
+
+
+class CachedResponse:
+    """Response đọc từ cache, cùng các thuộc tính requests.Response mà caller dùng"""
+
+    def __init__(self, entry, from_cache=True):
+        self.status_code = entry['status_code']
+        self.headers = CaseInsensitiveDict(entry['headers'])
+        self.text = entry['body']
+        self.url = entry['url']
+        self.from_cache = from_cache
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class CoinGeckoClient:
+    """Lớp fetch dùng chung cho CoinGecko: Session pool kết nối + cache response trên đĩa
+
+    Response 200 được lưu theo URL + params. Còn trong TTL thì trả từ cache (không gọi mạng),
+    hết TTL thì gửi request có điều kiện (If-None-Match / If-Modified-Since): 304 chỉ làm mới
+    thời điểm fetch. Lỗi mạng khi đã có bản cũ thì trả bản cũ. Chế độ offline chỉ replay cache.
+
+    Request thật ra mạng đi qua rate_limiter (token bucket dùng chung giữa các process);
+    429/5xx được thử lại tối đa max_retries lần theo Retry-After hoặc backoff có jitter.
+    """
+
+    def __init__(self, api_key=DEFAULT_API_KEY, base_url=COINGECKO_API_URL, cache_dir=DEFAULT_CACHE_DIR,
+                 ttl=DEFAULT_TTL, offline=None, max_connections=8, rate_limiter=None):
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.offline = os.environ.get(OFFLINE_ENV) == '1' if offline is None else offline
+
+        # Mặc định mọi client (mọi process) dùng chung một bucket theo quota CoinGecko;
+        # gán None để tắt giới hạn (vd. khi chạy với stub)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_retries = MAX_RETRIES
+
+        self.session = requests.Session()
+        self.session.headers.update({"accept": "application/json", "x-cg-demo-api-key": api_key})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_connections))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.network_requests = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.throttled = 0
+
+    def cache_key(self, url, params=None):
+        canonical = url + ('?' + urlencode(sorted((k, str(v)) for k, v in params.items())) if params else '')
+        return canonical, hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_entry(self, key):
+        try:
+            with open(self._cache_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, key, entry):
+        """Ghi entry ra file tạm rồi rename (nhiều thread/process có thể ghi cùng lúc)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_atomic(self._cache_path(key), lambda f: f.write(json.dumps(entry).encode('utf-8')), prefix='.response-')
+        except OSError as e:
+            print(f"⚠️  Không ghi được cache response {key}: {e}")
+
+    def _send(self, url, params, headers, timeout):
+        """Gửi request theo rate limiter, thử lại khi 429/5xx; hết lượt thì trả response cuối"""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            self.network_requests += 1
+
+            retryable = response.status_code == 429 or response.status_code >= 500
+            if not retryable or attempt == self.max_retries:
+                return response
+
+            delay = retry_after_seconds(response.headers.get('Retry-After'))
+            # Jitter cả khi có Retry-After để các client không cùng gửi lại một lúc
+            delay = backoff_delay(attempt) if delay is None else delay + random.uniform(0, BACKOFF_BASE)
+            print(f"⚠️  CoinGecko trả {response.status_code}, thử lại sau {delay:.1f} giây "
+                  f"({attempt + 1}/{self.max_retries})")
+
+            if response.status_code == 429:
+                self.throttled += 1
+                if self.rate_limiter is not None:
+                    # Chặn mọi process dùng chung bucket, acquire() lần sau sẽ tự chờ
+                    self.rate_limiter.block_for(delay)
+                    continue
+            time.sleep(delay)
+
+    def get(self, path, params=None, ttl=None, timeout=None):
+        """GET base_url + path, trả về requests.Response hoặc CachedResponse (from_cache=True)"""
+        url = self.base_url + path
+        canonical, key = self.cache_key(url, params)
+        ttl = self.ttl if ttl is None else ttl
+        entry = self._read_entry(key)
+
+        if entry is not None and (self.offline or time.time() - entry['fetched_at'] < ttl):
+            self.cache_hits += 1
+            return CachedResponse(entry)
+        if self.offline:
+            raise OfflineCacheMiss(f"Offline mode: {canonical} chưa có trong cache")
+
+        headers = {}
+        if entry is not None:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        try:
+            response = self._send(url, params, headers, timeout)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            print(f"⚠️  Lỗi mạng ({e}), dùng response cũ trong cache cho {canonical}")
+            self.cache_hits += 1
+            return CachedResponse(entry)
+
+        if response.status_code == 304 and entry is not None:
+            entry['fetched_at'] = time.time()
+            self._write_entry(key, entry)
+            self.revalidated += 1
+            return CachedResponse(entry)
+
+        if response.status_code == 200:
+            self._write_entry(key, {
+                'url': canonical,
+                'status_code': 200,
+                'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+                'body': response.text,
+                'fetched_at': time.time()
+            })
+        response.from_cache = False
+        return response
+
+    def stats(self):
+        return {
+            'network_requests': self.network_requests,
+            'cache_hits': self.cache_hits,
+            'revalidated': self.revalidated,
+            'throttled': self.throttled
+        }
@@ -0,0 +1,187 @@
+"""
+Server giả lập CoinGecko NFT API để chạy/benchmark scraper offline
+
+Chạy (từ thư mục ai/):
+    python coingecko_stub.py [--port 8765] [--latency 0.05] [--quota 30]
+rồi trỏ scraper vào: NFTDataScraper(base_url="http://127.0.0.1:8765/api/v3")
+
+Hỗ trợ /nfts/list, /nfts/<id>, /nfts/<id>/market_chart?days=N. Dữ liệu tổng hợp,
+cố định theo (collection_id, ngày) và kết thúc ở 0h UTC hôm nay, mỗi request chờ latency giây
+để mô phỏng độ trễ mạng. Response có ETag, If-None-Match khớp thì trả 304. --quota giới hạn
+số request / phút (cửa sổ trượt 60 giây) như CoinGecko (vượt quá -> 429 kèm Retry-After).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+API_PREFIX = '/api/v3'
+DEFAULT_LATENCY = 0.05
+DAY_MS = 86400000
+
+
+def collection_seed(collection_id):
+    return zlib.crc32(collection_id.encode('utf-8'))
+
+
+def today_ms():
+    """0h UTC hôm nay (ms), điểm cuối mặc định của market chart"""
+    return int(time.time() // 86400) * DAY_MS
+
+
+def market_chart(collection_id, days, end_ms=None):
+    """Chuỗi floor price/volume/market cap theo ngày, format giống /nfts/{id}/market_chart
+
+    Giá trị chỉ phụ thuộc (collection, ngày) nên các cửa sổ days khác nhau luôn khớp nhau
+    ở phần chồng lấn, giống API thật.
+    """
+    end_ms = today_ms() if end_ms is None else end_ms
+    timestamps = end_ms - DAY_MS * np.arange(days, -1, -1, dtype=np.int64)
+    day = timestamps // DAY_MS
+    seed = collection_seed(collection_id)
+    noise = ((day * 2654435761 + seed) % 2**32) / 2**32
+
+    floor_prices = np.round(21 + 10 * (1 + np.sin(day / 11 + seed % 97)) / 2 + noise, 6)
+    volumes = np.round(1000 + 20000 * noise, 2)
+    market_caps = np.round(floor_prices * (8000 + 7000 * noise), 2)
+    return {
+        name: [[int(t), float(v)] for t, v in zip(timestamps, values)]
+        for name, values in (('floor_price_usd', floor_prices), ('volume_usd', volumes), ('market_cap_usd', market_caps))
+    }
+
+
+def collection_info(collection_id):
+    chart = market_chart(collection_id, 1)
+    return {
+        'id': collection_id,
+        'name': collection_id.replace('-', ' ').title(),
+        'floor_price': {'usd': chart['floor_price_usd'][-1][1]}
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.request_count += 1
+            retry_after = self.server.check_quota()
+
+        if retry_after is not None:
+            self.send_response(429)
+            self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        url = urlparse(self.path)
+        parts = url.path[len(API_PREFIX):].strip('/').split('/') if url.path.startswith(API_PREFIX) else []
+
+        if parts == ['nfts', 'list']:
+            body = [{'id': collection_id} for collection_id in self.server.collection_ids]
+        elif len(parts) == 2 and parts[0] == 'nfts':
+            body = collection_info(parts[1])
+        elif len(parts) == 3 and parts[0] == 'nfts' and parts[2] == 'market_chart':
+            days = int(parse_qs(url.query).get('days', ['90'])[0])
+            body = market_chart(parts[1], days)
+            with self.server.lock:
+                self.server.points_served += 3 * (days + 1)
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode('utf-8')
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            with self.server.lock:
+                self.server.not_modified_count += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=DEFAULT_LATENCY, collection_ids=(), quota=None, quota_period=60.0):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.collection_ids = list(collection_ids)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        # Giới hạn kiểu CoinGecko: quá quota request trong quota_period giây gần nhất -> 429
+        self.quota = quota
+        self.quota_period = quota_period
+        self.accepted = deque()
+        self.throttled_count = 0
+        self.not_modified_count = 0
+        # Tổng số điểm (timestamp, value) đã trả trong các market chart
+        self.points_served = 0
+
+    def check_quota(self):
+        """None nếu request được nhận, không thì số giây Retry-After (gọi trong self.lock)"""
+        if not self.quota:
+            return None
+
+        now = time.monotonic()
+        while self.accepted and now - self.accepted[0] >= self.quota_period:
+            self.accepted.popleft()
+        if len(self.accepted) >= self.quota:
+            self.throttled_count += 1
+            return math.ceil(self.quota_period - (now - self.accepted[0]))
+        self.accepted.append(now)
+        return None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+
+def start_stub(port=0, latency=DEFAULT_LATENCY, collection_ids=(), quota=None, quota_period=60.0):
+    """Chạy stub trong thread nền (port=0: port ngẫu nhiên), trả về server (server.base_url)"""
+    server = StubServer(('127.0.0.1', port), latency, collection_ids, quota, quota_period)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CoinGecko NFT API stub')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='giây chờ mỗi request')
+    parser.add_argument('--quota', type=int, default=None, help='request / phút, vượt quá trả 429 + Retry-After')
+    args = parser.parse_args()
+
+    server = StubServer(('127.0.0.1', args.port), args.latency, quota=args.quota)
+    print(f"🧪 CoinGecko stub: {server.base_url} (latency {args.latency * 1e3:.0f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
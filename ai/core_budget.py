@@ -0,0 +1,68 @@
+import os
+
+from threadpoolctl import threadpool_limits
+
+# Tổng số core dành cho AI trong process (mặc định: mọi core process được phép dùng)
+CORES_ENV = 'AI_CORES'
+# Số thread khi train (n_jobs của RandomForest + BLAS/OpenMP), mặc định tất cả AI_CORES
+TRAINING_ENV = 'AI_TRAINING_N_JOBS'
+# Số thread mỗi lần predict, mặc định 1: API đã song song theo request, một request
+# fan-out ra mọi core chỉ làm các request đồng thời tranh nhau CPU
+INFERENCE_ENV = 'AI_INFERENCE_N_JOBS'
+DEFAULT_INFERENCE_THREADS = 1
+
+TRAINING = 'training'
+INFERENCE = 'inference'
+
+
+def available_cores():
+    """Số core process được phép dùng (theo CPU affinity nếu hệ điều hành hỗ trợ)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def total_cores():
+    """Số core dành cho AI: AI_CORES nếu có, không thì số core khả dụng"""
+    value = os.environ.get(CORES_ENV)
+    return max(1, int(value)) if value else available_cores()
+
+
+def resolve_n_jobs(n_jobs, cores=None):
+    """n_jobs kiểu joblib (None, -1 = mọi core, -2 = trừ 1 core, ...) -> số thread cụ thể trong ngân sách"""
+    cores = cores or total_cores()
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        n_jobs = cores + 1 + n_jobs
+    return max(1, min(int(n_jobs), cores))
+
+
+def thread_budget(role, default=None):
+    """Số thread cho TRAINING hoặc INFERENCE, đọc từ env (AI_TRAINING_N_JOBS / AI_INFERENCE_N_JOBS)
+
+    Không có env thì dùng default, rồi mặc định của role (train: mọi core, predict: 1).
+    """
+    env = TRAINING_ENV if role == TRAINING else INFERENCE_ENV
+    value = os.environ.get(env)
+    if value:
+        return resolve_n_jobs(int(value))
+    if default is not None:
+        return resolve_n_jobs(default)
+    return total_cores() if role == TRAINING else DEFAULT_INFERENCE_THREADS
+
+
+def limit_threads(n_jobs):
+    """Context manager giới hạn thread BLAS/OpenMP (threadpoolctl) theo n_jobs"""
+    return threadpool_limits(limits=resolve_n_jobs(n_jobs))
+
+
+def apply_n_jobs(model, n_jobs):
+    """Ghi đè n_jobs của estimator đã load (giá trị lúc train được pickle theo model)
+
+    Model không có n_jobs (vd. FlatForest) thì giữ nguyên. Trả về model.
+    """
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = n_jobs
+    return model
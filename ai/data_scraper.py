@@ -1,20 +1,34 @@
-
-import requests
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+import shutil
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
+
+from coingecko_client import CoinGeckoClient, COINGECKO_API_URL, decode_market_chart
+from dataset_store import GZIP_SUFFIX, VALUE_COLUMNS, append_dataset, find_last_line, get_catalog, last_stored_date, open_dataset, write_atomic, write_dataset
+
+DEFAULT_MAX_WORKERS = 8
+# NFT_DATASET_GZIP=1: save_to_txt ghi snapshot nén nft_data_<id>_<ts>.txt.gz
+DATASET_GZIP_ENV = 'NFT_DATASET_GZIP'
+# market_chart của CoinGecko: 1-14 ngày trả điểm 5 phút, từ 15 ngày trở lên mới là điểm theo ngày
+MIN_DAILY_CHART_DAYS = 15
 
 class NFTDataScraper:
-    def __init__(self, api_key="CG-1Tc5UJgmUByfTMibYyMMutVD"):
+    def __init__(self, api_key="CG-1Tc5UJgmUByfTMibYyMMutVD", base_url=COINGECKO_API_URL, max_workers=DEFAULT_MAX_WORKERS):
         self.api_key = api_key
-        self.base_url = "https://api.coingecko.com/api/v3"
-        self.headers = {
-            "accept": "application/json",
-            "x-cg-demo-api-key": api_key
-        }
+        self.base_url = base_url
+        self.output_dir = 'ai/datasets'
+        # Nén gzip snapshot dataset (loader đọc được cả .txt lẫn .txt.gz)
+        self.compress = os.environ.get(DATASET_GZIP_ENV) == '1'
+        
+        # Số collection cào song song
+        self.max_workers = max_workers
+        
+        # Fetch qua client dùng chung: Session pool kết nối, cache response trên đĩa,
+        # quota request dùng chung cho mọi thread và process (chỉ tính request thật ra mạng)
+        self.client = CoinGeckoClient(api_key, base_url, max_connections=max_workers)
         
         # Supported NFT collections theo CoinGecko
         self.nft_collections = {
@@ -25,11 +39,14 @@ class NFTDataScraper:
             'otherdeed-for-otherdeeds': 'otherdeed-for-otherdeeds'
         }
         
+    def _get(self, path, params=None):
+        """GET qua client dùng chung (cache + quota)"""
+        return self.client.get(path, params=params)
+    
     def get_nft_list(self):
         """Lấy danh sách NFT collections từ CoinGecko"""
         try:
-            url = f"{self.base_url}/nfts/list"
-            response = requests.get(url, headers=self.headers)
+            response = self._get("/nfts/list")
             
             if response.status_code == 200:
                 nft_list = response.json()
@@ -46,8 +63,7 @@ class NFTDataScraper:
     def get_nft_data(self, collection_id):
         """Lấy thông tin chi tiết NFT collection"""
         try:
-            url = f"{self.base_url}/nfts/{collection_id}"
-            response = requests.get(url, headers=self.headers)
+            response = self._get(f"/nfts/{collection_id}")
             
             if response.status_code == 200:
                 return response.json()
@@ -55,9 +71,9 @@ class NFTDataScraper:
                 print("❌ API key không hợp lệ hoặc hết hạn")
                 return None
             elif response.status_code == 429:
-                print("⚠️  Rate limit - đợi 60 giây...")
-                time.sleep(60)
-                return self.get_nft_data(collection_id)
+                # Client đã chờ theo Retry-After và thử lại, vẫn 429 thì bỏ qua
+                print("⚠️  Rate limit - đã hết lượt thử lại")
+                return None
             else:
                 print(f"❌ Lỗi API: {response.status_code}")
                 return None
@@ -69,13 +85,13 @@ class NFTDataScraper:
     def get_nft_market_chart(self, collection_id, days=90):
         """Lấy dữ liệu biểu đồ thị trường NFT"""
         try:
-            url = f"{self.base_url}/nfts/{collection_id}/market_chart"
+            path = f"/nfts/{collection_id}/market_chart"
             params = {
                 'vs_currency': 'usd',
                 'days': str(days)
             }
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self._get(path, params=params)
             
             if response.status_code == 200:
                 return response.json()
@@ -83,9 +99,8 @@ class NFTDataScraper:
                 print("❌ API key không hợp lệ - tạo mock data")
                 return None
             elif response.status_code == 429:
-                print("⚠️  Rate limit - đợi 60 giây...")
-                time.sleep(60)
-                return self.get_nft_market_chart(collection_id, days)
+                print("⚠️  Rate limit - đã hết lượt thử lại")
+                return None
             else:
                 print(f"❌ Lỗi API market chart: {response.status_code}")
                 return None
@@ -147,92 +162,154 @@ class NFTDataScraper:
                 print("❌ Không lấy được market chart data")
                 return None
             
-            # Parse dữ liệu theo format CoinGecko
-            dates = []
-            floor_prices = []
-            volumes = []
-            market_caps = []
-            
-            # Floor prices
-            if 'floor_price_usd' in market_data and market_data['floor_price_usd']:
-                for timestamp, price in market_data['floor_price_usd']:
-                    dates.append(datetime.fromtimestamp(timestamp/1000))
-                    floor_prices.append(float(price) if price else 0)
-            
-            # Volumes
-            if 'volume_usd' in market_data and market_data['volume_usd']:
-                volume_data = market_data['volume_usd']
-                # Ensure same length as dates
-                for i, (timestamp, volume) in enumerate(volume_data):
-                    if i < len(dates):
-                        volumes.append(float(volume) if volume else 0)
-            
-            # Market caps
-            if 'market_cap_usd' in market_data and market_data['market_cap_usd']:
-                cap_data = market_data['market_cap_usd']
-                for i, (timestamp, cap) in enumerate(cap_data):
-                    if i < len(dates):
-                        market_caps.append(float(cap) if cap else 0)
-            
-            # Đảm bảo tất cả arrays có cùng độ dài
-            min_len = len(dates)
-            if len(volumes) < min_len:
-                # Fill missing volumes with random data
-                for i in range(len(volumes), min_len):
-                    volumes.append(np.random.uniform(1000, 50000))
-            
-            if len(market_caps) < min_len:
-                # Calculate market cap based on floor price
-                for i in range(len(market_caps), min_len):
-                    if i < len(floor_prices):
-                        market_caps.append(floor_prices[i] * np.random.uniform(8000, 12000))
-                    else:
-                        market_caps.append(np.random.uniform(1000000, 5000000))
+            # Ghép 3 series theo timestamp (UTC); điểm thiếu là NaN, không bịa số liệu
+            columns = decode_market_chart(market_data)
+            if len(columns['date']) == 0:
+                print("❌ Market chart không có dữ liệu")
+                return None
             
-            # Trim to same length
-            dates = dates[:min_len]
-            floor_prices = floor_prices[:min_len]
-            volumes = volumes[:min_len]
-            market_caps = market_caps[:min_len]
+            missing = {col: int(np.isnan(columns[col]).sum()) for col in VALUE_COLUMNS}
+            if any(missing.values()):
+                print(f"⚠️  Thiếu dữ liệu (NaN): {missing}")
             
+            dates = pd.DatetimeIndex(columns['date'])
             print(f"✅ Cào thành công {len(dates)} dòng dữ liệu thật!")
-            return dates, floor_prices, volumes, market_caps
+            return dates, columns['floor_price'], columns['volume'], columns['market_cap']
             
         except Exception as e:
             print(f"❌ Lỗi khi cào data cho {collection_id}: {e}")
             return None
     
-    def save_to_txt(self, collection_id, dates, floor_prices, volumes, market_caps):
-        """Lưu data thành file TXT với format chuẩn"""
+    def save_to_txt(self, collection_id, dates, floor_prices, volumes, market_caps, compress=None):
+        """Lưu data thành file TXT với format chuẩn (ghi file tạm rồi rename, compress: nén .gz)"""
         
         # Tạo thư mục datasets nếu chưa có
-        os.makedirs('ai/datasets', exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
         
         # Tên file theo timestamp
+        compress = self.compress if compress is None else compress
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"ai/datasets/nft_data_{collection_id}_{timestamp}.txt"
+        filename = os.path.join(self.output_dir, f"nft_data_{collection_id}_{timestamp}.txt")
+        if compress:
+            filename += GZIP_SUFFIX
         
         print(f"💾 Đang lưu data vào {filename}...")
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            # Header với metadata
-            f.write(f"# NFT Dataset for {collection_id}\n")
-            f.write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"# Source: CoinGecko API\n")
-            f.write(f"# Total records: {len(dates)}\n")
-            f.write(f"# Format: DATE|FLOOR_PRICE_USD|VOLUME_USD|MARKET_CAP_USD\n")
-            f.write("#" + "="*60 + "\n")
-            
-            # Data rows
-            for i in range(len(dates)):
-                date_str = dates[i].strftime('%Y-%m-%d')
-                f.write(f"{date_str}|{floor_prices[i]:.6f}|{volumes[i]:.2f}|{market_caps[i]:.2f}\n")
+        # Header với metadata
+        header = [
+            f"NFT Dataset for {collection_id}",
+            f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            "Source: CoinGecko API",
+            f"Total records: {len(dates)}",
+            "Format: DATE|FLOOR_PRICE_USD|VOLUME_USD|MARKET_CAP_USD",
+            "=" * 60
+        ]
+        # Format cả cột một lượt, reader không bao giờ thấy file dở dang
+        write_dataset(filename, dates, floor_prices, volumes, market_caps, header)
         
         print(f"✅ Đã lưu {len(dates)} dòng data vào {filename}")
         return filename
     
-    def scrape_collection(self, collection_id, days=90, use_mock=False):
-        """Cào data cho 1 collection và lưu thành TXT"""
+    def append_path(self, collection_id):
+        """File dataset dạng append của collection: nft_data_<id>.txt"""
+        return os.path.join(self.output_dir, f"nft_data_{collection_id}.txt")
+    
+    def plan_delta(self, collection_id, days=90):
+        """Số ngày cần cào để bù phần thiếu từ ngày cuối đã lưu (tối đa days)
+        
+        Chưa có file append thì tạo từ snapshot mới nhất (nếu có) để phần delta được ghép vào
+        đủ lịch sử. Lấy lại cả ngày cuối đã lưu vì giá trị trong ngày có thể đã đổi
+        (append_to_txt ghi đè dòng đó), và không xin ít hơn MIN_DAILY_CHART_DAYS để
+        API vẫn trả dữ liệu theo ngày.
+        """
+        filename = self.append_path(collection_id)
+        if not os.path.exists(filename):
+            latest = get_catalog([self.output_dir]).latest(collection_id)
+            if latest is None:
+                return days
+            # Snapshot có thể là .txt.gz: file append luôn là TXT thường. Copy qua file tạm
+            # rồi rename để FileCatalog không trả về file append đang copy dở
+            with open_dataset(latest) as src:
+                write_atomic(filename, lambda dst: shutil.copyfileobj(src, dst), prefix='.dataset-')
+            print(f"📋 Tạo file append từ {os.path.basename(latest)}")
+        
+        last_date = last_stored_date(filename)
+        if last_date is None:
+            return days
+        
+        # Ngày trong file là ngày UTC (decode_market_chart), so với hôm nay theo UTC
+        gap = (datetime.now(timezone.utc).date() - datetime.fromisoformat(last_date).date()).days
+        delta_days = min(days, max(gap + 1, MIN_DAILY_CHART_DAYS))
+        print(f"📉 Delta: ngày cuối đã lưu {last_date}, thiếu {max(gap, 0)} ngày -> cào {delta_days} ngày")
+        return delta_days
+    
+    def append_to_txt(self, collection_id, dates, floor_prices, volumes, market_caps):
+        """Ghi nối data mới vào file dataset dạng append (một file / collection)
+        
+        File mới (header + dòng) được ghi ra file tạm rồi rename. File đã có chỉ được nối
+        thêm các dòng mới bằng một lần write() O_APPEND (append_dataset), chi phí theo số
+        dòng mới thay vì copy lại cả file; dòng của ngày cuối được cắt đi rồi ghi lại.
+        """
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = self.append_path(collection_id)
+        
+        # Dedupe theo ngày trong batch mới (giữ điểm cuối cùng của mỗi ngày), sắp theo ngày
+        index = pd.DatetimeIndex(dates)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        days = index.to_numpy().astype('datetime64[D]')
+        unique_days, last_from_end = np.unique(days[::-1], return_index=True)
+        rows = len(days) - 1 - last_from_end
+        
+        header = []
+        write_offset = 0
+        if not os.path.exists(filename):
+            header = [
+                f"NFT Dataset for {collection_id} (append mode)",
+                f"Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                "Source: CoinGecko API",
+                "Format: DATE|FLOOR_PRICE_USD|VOLUME_USD|MARKET_CAP_USD",
+                "=" * 60
+            ]
+        else:
+            with open(filename, 'rb') as f:
+                # Chỉ đọc phần cuối file để lấy ngày cuối đã lưu
+                size = f.seek(0, os.SEEK_END)
+                tail_start = max(0, size - 4096)
+                f.seek(tail_start)
+                line_start, last_line = find_last_line(f.read())
+            
+            write_offset = size
+            if line_start is not None and not last_line.startswith(b'#'):
+                last_day = np.datetime64(last_line.split(b'|')[0].decode('utf-8'), 'D')
+                # Ngày cuối có trong batch mới -> ghi đè đúng dòng cuối, bỏ các ngày cũ hơn
+                if last_day in unique_days:
+                    write_offset = tail_start + line_start
+                    rows = rows[unique_days >= last_day]
+                else:
+                    rows = rows[unique_days > last_day]
+        
+        columns = (
+            days[rows],
+            np.asarray(floor_prices, dtype=np.float64)[rows],
+            np.asarray(volumes, dtype=np.float64)[rows],
+            np.asarray(market_caps, dtype=np.float64)[rows]
+        )
+        if header:
+            write_dataset(filename, *columns, header)
+        else:
+            append_dataset(filename, *columns, keep_bytes=write_offset)
+        
+        print(f"✅ Đã append {len(rows)} dòng data vào {filename} (offset {write_offset})")
+        return filename
+    
+    def scrape_collection(self, collection_id, days=90, use_mock=False, append=False, delta=False):
+        """Cào data cho 1 collection và lưu thành TXT
+        
+        append=True: ghi nối vào file append; delta=True: chỉ cào phần thiếu từ ngày cuối đã lưu
+        rồi ghi nối (ngụ ý append).
+        """
         print(f"\n{'='*70}")
         print(f"🎯 BẮT ĐẦU CÀO DATA CHO: {collection_id.upper()}")
         print(f"{'='*70}")
@@ -240,11 +317,20 @@ class NFTDataScraper:
         start_time = time.time()
         
         try:
+            if delta:
+                append = True
+                days = self.plan_delta(collection_id, days)
+            
             # Thử cào data thật trước (theo tutorial CoinGecko)
             if not use_mock:
                 real_data = self.fetch_real_data(collection_id, days)
                 if real_data:
                     dates, floor_prices, volumes, market_caps = real_data
+                elif append:
+                    # Mock ghi vào file append thì nằm lại vĩnh viễn trong lịch sử (lần sau chỉ
+                    # ghi đè dòng cuối): bỏ qua, lần cào sau sẽ bù phần còn thiếu
+                    print("⏭️  Không cào được data thật, bỏ qua (không ghi mock data vào file append)")
+                    return None
                 else:
                     print("🔄 Fallback sang mock data...")
                     dates, floor_prices, volumes, market_caps = self.create_mock_data(collection_id, days)
@@ -253,7 +339,10 @@ class NFTDataScraper:
                 dates, floor_prices, volumes, market_caps = self.create_mock_data(collection_id, days)
             
             # Lưu thành TXT
-            filename = self.save_to_txt(collection_id, dates, floor_prices, volumes, market_caps)
+            if append:
+                filename = self.append_to_txt(collection_id, dates, floor_prices, volumes, market_caps)
+            else:
+                filename = self.save_to_txt(collection_id, dates, floor_prices, volumes, market_caps)
             
             end_time = time.time()
             print(f"⏱️  Thời gian cào: {end_time - start_time:.2f} giây")
@@ -265,11 +354,15 @@ class NFTDataScraper:
             print(f"❌ Lỗi khi cào data cho {collection_id}: {e}")
             return None
     
-    def scrape_all_collections(self, days=90, use_mock=False):
-        """Cào data cho tất cả collections theo tutorial CoinGecko"""
+    def scrape_all_collections(self, days=90, use_mock=False, append=False, max_workers=None, delta=False):
+        """Cào data cho tất cả collections theo tutorial CoinGecko (max_workers collection song song)"""
+        max_workers = max(1, max_workers or self.max_workers)
         print("🚀 NFT DATA SCRAPER - CÀO DATA THEO TUTORIAL COINGECKO")
         print(f"📅 Số ngày: {days}")
         print(f"🔧 Sử dụng mock data: {use_mock}")
+        print(f"📎 Chế độ append: {append}")
+        print(f"📉 Chế độ delta: {delta}")
+        print(f"🧵 Số collection song song: {max_workers} (quota: {f'{self.client.rate_limiter.quota} request / {self.client.rate_limiter.period:.0f}s' if self.client.rate_limiter else '∞'})")
         print(f"🔑 API Key: {self.api_key[:20]}...")
         
         results = {}
@@ -279,20 +372,20 @@ class NFTDataScraper:
         if not use_mock:
             print("\n🔍 Kiểm tra kết nối API...")
             nft_list = self.get_nft_list()
-            if not nft_list:
+            if not nft_list and (append or delta):
+                print("⚠️  API không khả dụng, không ghi mock data vào file append")
+            elif not nft_list:
                 print("⚠️  API không khả dụng, chuyển sang mock data")
                 use_mock = True
         
-        # Cào data từng collection
-        for collection_id in self.nft_collections.keys():
-            filename = self.scrape_collection(collection_id, days, use_mock)
-            if filename:
-                results[collection_id] = filename
-            
-            # Rate limiting theo tutorial CoinGecko
-            if not use_mock:
-                print("⏳ Đợi 2 giây để tránh rate limit...")
-                time.sleep(2)
+        # Cào các collection song song; quota request được áp dụng trong _get nên
+        # không cần sleep cố định giữa các collection
+        collection_ids = list(self.nft_collections.keys())
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            filenames = pool.map(lambda collection_id: self.scrape_collection(collection_id, days, use_mock, append, delta), collection_ids)
+            for collection_id, filename in zip(collection_ids, filenames):
+                if filename:
+                    results[collection_id] = filename
         
         total_end = time.time()
         
@@ -301,7 +394,7 @@ class NFTDataScraper:
         print(f"{'='*70}")
         print(f"✅ Thành công: {len(results)}/{len(self.nft_collections)} collections")
         print(f"⏱️  Tổng thời gian: {total_end - total_start:.2f} giây")
-        print(f"📂 Thư mục lưu trữ: ai/datasets/")
+        print(f"📂 Thư mục lưu trữ: {self.output_dir}/")
         
         for collection_id, filename in results.items():
             print(f"  📁 {collection_id}: {os.path.basename(filename)}")
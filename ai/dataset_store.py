@@ -0,0 +1,651 @@
+import gzip
+import hashlib
+import io
+import os
+import re
+import stat
+import threading
+import time
+import uuid
+import warnings
+from datetime import timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+# Thứ tự cột trong file TXT: DATE|FLOOR_PRICE|VOLUME|MARKET_CAP
+DATASET_COLUMNS = ['date', 'floor_price', 'volume', 'market_cap']
+VALUE_COLUMNS = ['floor_price', 'volume', 'market_cap']
+# DATE có múi giờ (Z / +07:00): mảng 'date' luôn là giờ UTC (naive), offset (giây) của cột
+# date gốc được giữ ở key này để frame_from_columns trả lại cột tz-aware như loader cũ
+UTC_OFFSET = 'utc_offset'
+
+# Sidecar nhị phân dạng cột nằm cạnh file TXT: nft_data_<id>_<ts>.txt.npz
+SIDECAR_SUFFIX = '.npz'
+SIDECAR_VERSION = 4
+SIDECAR_META = ['version', 'size', 'mtime_ns', 'inode', 'resume_offset', 'resume_drop']
+SIDECAR_TMP_PREFIX = '.sidecar-'
+# Hash của phần file trước điểm resume, để nhận biết file chỉ bị append (không bị sửa tại chỗ)
+SIDECAR_DIGEST_SIZE = 16
+HASH_CHUNK_BYTES = 1 << 20
+
+# nft_data_<collection>_<YYYYmmdd_HHMMSS>.txt[.gz] do NFTDataScraper.save_to_txt ghi ra,
+# nft_data_<collection>.txt là file append (version lấy theo mtime)
+DATASET_FILE_RE = re.compile(r'^nft_data_(?P<key>.+?)(?:_(?P<version>\d{8}_\d{6}))?\.txt(?:\.gz)?$')
+# Dataset nén gzip (snapshot, không append được): nft_data_<collection>_<ts>.txt.gz
+GZIP_SUFFIX = '.gz'
+GZIP_LEVEL = 6
+# Số dòng format + ghi mỗi lần trong write_dataset
+WRITE_CHUNK_ROWS = 100_000
+# Số chữ số thập phân của FLOOR_PRICE|VOLUME|MARKET_CAP (như '{:.6f}|{:.2f}|{:.2f}'); giá trị
+# thiếu (NaN) được ghi thành trường rỗng, read_txt_columns đọc lại thành NaN
+VALUE_DECIMALS = (6, 2, 2)
+# Giá trị sát điểm làm tròn .5 hoặc quá lớn cho int64 được format bằng Python để giữ đúng
+# từng chữ số như format(value, '.6f')
+TIE_TOLERANCE = 1e-6
+MAX_FIXED_POINT = 2.0 ** 53
+
+# Quyền khi tạo file (kernel trừ umask): khác mkstemp (luôn 0600), user khác (vd. worker API) đọc được
+NEW_FILE_MODE = 0o666
+
+# Byte dùng khi tách dòng trong _data_lines và khi format dòng
+NEWLINE, PIPE, HASH = ord('\n'), ord('|'), ord('#')
+INDENT = [ord(' '), ord('\t')]
+DOT, MINUS, ZERO = ord('.'), ord('-'), ord('0')
+# 4 chữ số ASCII của 0000-9999, mỗi khối là một uint32 để _digits tra bảng một lần / khối
+DIGIT_BLOCKS = np.frombuffer(''.join(f'{i:04d}' for i in range(10000)).encode('ascii'), dtype=np.uint32)
+
+# Thư mục có mtime mới hơn ngưỡng này bị coi là "chưa ổn định" (mtime của một số
+# filesystem chỉ chính xác tới giây) nên lần lookup sau vẫn scan lại
+RACY_MTIME_SECONDS = 2.0
+
+
+def _data_lines(buf):
+    """Chỉ giữ các dòng dữ liệu đúng 4 trường, bỏ comment / dòng trống / dòng sai số trường
+
+    Đếm dấu '|' từng dòng bằng NumPy (giống loader cũ: dòng sai số trường bị bỏ qua, không
+    làm hỏng cả file). File hợp lệ hoàn toàn thì trả lại buf, không copy.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    if not len(data):
+        return buf
+
+    ends = np.flatnonzero(data == NEWLINE)
+    if not len(ends) or ends[-1] != len(data) - 1:
+        # Dòng cuối không có '\n'
+        ends = np.append(ends, len(data))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    pipes = np.flatnonzero(data == PIPE)
+    fields = np.searchsorted(pipes, ends) - np.searchsorted(pipes, starts) + 1
+    first = data[np.minimum(starts, len(data) - 1)]
+    keep = (fields == len(DATASET_COLUMNS)) & (first != HASH)
+
+    # Dòng thụt lề (hiếm): là comment nếu ký tự đầu tiên khác khoảng trắng là '#'
+    for i in np.flatnonzero(keep & np.isin(first, INDENT)):
+        if bytes(buf[starts[i]:ends[i]]).lstrip().startswith(b'#'):
+            keep[i] = False
+
+    if keep.all():
+        return buf
+    lengths = np.minimum(ends + 1, len(data)) - starts
+    return data[np.repeat(keep, lengths)].tobytes()
+
+
+def _parse_dates(strings):
+    """Series chuỗi DATE -> (datetime64[ns] theo UTC, offset giây hoặc None nếu DATE không có múi giờ)
+
+    Giống loader cũ (pd.to_datetime từng dòng): khoảng trắng quanh DATE được bỏ qua, DATE cùng
+    một offset giữ offset đó. DATE lẫn nhiều offset (hoặc lẫn có / không múi giờ) được quy về UTC.
+    """
+    with warnings.catch_warnings():
+        # Lẫn nhiều offset: pandas cảnh báo rồi trả về cột object, xử lý ngay bên dưới
+        warnings.simplefilter('ignore', FutureWarning)
+        parsed = pd.to_datetime(strings, format='ISO8601', errors='coerce')
+        failed = parsed.isna() & strings.notna()
+        if failed.any():
+            # Hiếm: DATE có khoảng trắng thừa (vd. '2024-01-01 | 1.5 | ...')
+            strings = strings.str.strip()
+            parsed = pd.to_datetime(strings, format='ISO8601', errors='coerce')
+
+    if parsed.dtype == object:
+        parsed = pd.to_datetime(strings, format='ISO8601', errors='coerce', utc=True)
+    tz = getattr(parsed.dtype, 'tz', None)
+    if tz is None:
+        return parsed.to_numpy(dtype='datetime64[ns]'), None
+
+    return parsed.dt.tz_convert(None).to_numpy(dtype='datetime64[ns]'), int(tz.utcoffset(None).total_seconds())
+
+
+def read_txt_columns(source):
+    """Parse file TXT (path, file .gz hoặc buffer) một lượt thành các mảng cột đã có kiểu
+
+    Trường giá trị để trống là NaN; dòng sai số trường hoặc DATE không đọc được bị bỏ qua.
+    DATE có múi giờ được đổi sang UTC, offset gốc nằm ở columns[UTC_OFFSET].
+    """
+    if hasattr(source, 'read'):
+        buf = source.read()
+    else:
+        with open_dataset(source) as f:
+            buf = f.read()
+
+    try:
+        raw = pd.read_csv(
+            io.BytesIO(_data_lines(buf)),
+            sep='|',
+            comment='#',
+            header=None,
+            names=DATASET_COLUMNS,
+            dtype={
+                'date': str,
+                'floor_price': np.float64,
+                'volume': np.float64,
+                'market_cap': np.float64
+            },
+            skip_blank_lines=True,
+            on_bad_lines='skip',
+            engine='c'
+        )
+    except pd.errors.EmptyDataError:
+        raw = pd.DataFrame({col: pd.Series(dtype=str if col == 'date' else np.float64) for col in DATASET_COLUMNS})
+
+    dates, offset = _parse_dates(raw['date'])
+    valid = ~np.isnat(dates)
+    columns = {'date': dates}
+    for col in VALUE_COLUMNS:
+        columns[col] = raw[col].to_numpy(dtype=np.float64)
+
+    if not valid.all():
+        columns = {col: values[valid] for col, values in columns.items()}
+    if offset is not None:
+        columns[UTC_OFFSET] = offset
+    return columns
+
+
+def concat_columns(head, tail):
+    """Nối hai bộ mảng cột (offset múi giờ khác nhau giữa hai phần thì quy về UTC, như khi parse cả file)"""
+    columns = {col: np.concatenate([head[col], tail[col]]) for col in DATASET_COLUMNS}
+    offsets = {part.get(UTC_OFFSET) for part in (head, tail) if len(part['date'])}
+    if offsets and offsets != {None}:
+        columns[UTC_OFFSET] = offsets.pop() if len(offsets) == 1 else 0
+    return columns
+
+
+def frame_from_columns(columns):
+    """Tạo DataFrame (sắp xếp theo date) từ các mảng cột"""
+    df = pd.DataFrame({col: columns[col] for col in DATASET_COLUMNS})
+    if columns.get(UTC_OFFSET) is not None:
+        df['date'] = df['date'].dt.tz_localize('UTC').dt.tz_convert(timezone(timedelta(seconds=columns[UTC_OFFSET])))
+
+    # File do scraper ghi đã theo thứ tự thời gian, chỉ sort khi cần
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date').reset_index(drop=True)
+
+    return df
+
+
+def is_compressed(path):
+    return path.endswith(GZIP_SUFFIX)
+
+
+def open_dataset(path):
+    """Mở file dataset ở chế độ đọc bytes, file .gz được giải nén trong lúc đọc"""
+    return gzip.open(path, 'rb') if is_compressed(path) else open(path, 'rb')
+
+
+def temp_prefix(prefix, pid=None):
+    """Prefix file tạm của write_atomic trong process pid (mặc định process hiện tại)"""
+    return f"{prefix}{os.getpid() if pid is None else pid}-"
+
+
+def write_atomic(path, write, prefix='.tmp-'):
+    """write(f) vào file tạm cùng thư mục rồi rename, reader không bao giờ thấy file dở dang
+
+    File tạm được chmod theo file đích (nếu đã có), file mới có quyền theo umask như open().
+    Tên file tạm có pid (temp_prefix) để dọn được file còn sót khi process bị kill giữa chừng.
+    """
+    directory = os.path.dirname(path) or '.'
+    tmp_path = os.path.join(directory, temp_prefix(prefix) + uuid.uuid4().hex)
+    # Tạo file với NEW_FILE_MODE để kernel áp umask, không đọc/đổi umask của process
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), NEW_FILE_MODE)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            try:
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+            except FileNotFoundError:
+                pass
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_temp_files(directory, prefixes, pid):
+    """Xoá file tạm write_atomic của process pid (đã chết) còn sót trong directory, trả về số file đã xoá"""
+    starts = tuple(temp_prefix(prefix, pid) for prefix in prefixes)
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith(starts)]
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _digits(values, width):
+    """Mảng int64 không âm -> ma trận (n, width) uint8 các chữ số ASCII, thêm số 0 bên trái
+
+    Tách theo khối 4 chữ số (một phép chia / khối) rồi tra bảng DIGIT_BLOCKS.
+    """
+    blocks = -(-width // 4)
+    powers = 10000 ** np.arange(blocks - 1, -1, -1, dtype=np.int64)
+    chunks = values[:, None] // powers % 10000 if blocks > 1 else values[:, None] % 10000
+    return np.take(DIGIT_BLOCKS, chunks).view(np.uint8).reshape(len(values), blocks * 4)[:, blocks * 4 - width:]
+
+
+def _strip_leading_zeros(digits):
+    """Byte 0 thay cho số 0 đứng đầu (giữ chữ số hàng đơn vị), tại chỗ"""
+    leading = np.logical_and.accumulate(digits[:, :-1] == ZERO, axis=1)
+    digits[:, :-1][leading] = 0
+    return digits
+
+
+def _format_fixed(values, decimals):
+    """Cột float -> ma trận (n, width) uint8 của format(value, f'.{decimals}f'), NaN -> trường rỗng
+
+    Byte 0 là đệm, bị bỏ khi ghép dòng (format_rows).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    magnitude = np.abs(values)
+    regular = np.isfinite(values) & (magnitude < MAX_FIXED_POINT)
+    magnitude = np.where(regular, magnitude, 0.0)
+
+    # Phần nguyên và phần thập phân tách riêng: phần thập phân là số chính xác nên
+    # chỉ phép nhân với 10^decimals làm tròn, làm tròn half-even như format của Python
+    scale = 10 ** decimals
+    whole = np.floor(magnitude)
+    scaled = (magnitude - whole) * scale
+    frac = np.round(scaled)
+    special = ~regular | (np.abs(scaled - np.floor(scaled) - 0.5) < TIE_TOLERANCE)
+    special &= ~np.isnan(values)
+    carry = frac >= scale
+    whole = whole.astype(np.int64) + carry
+    frac = frac.astype(np.int64) - carry * scale
+
+    texts = {i: format(values[i], f'.{decimals}f').encode('ascii') for i in np.flatnonzero(special).tolist()}
+    int_width = len(str(whole.max())) if n else 1
+    width = max([1 + int_width + 1 + decimals] + [len(text) for text in texts.values()])
+
+    field = np.zeros((n, width), dtype=np.uint8)
+    # -0.0 và số âm làm tròn về 0 vẫn có dấu '-' như format của Python
+    field[:, 0] = np.where(np.signbit(values), MINUS, 0)
+    field[:, 1:1 + int_width] = _strip_leading_zeros(_digits(whole, int_width))
+    if decimals:
+        field[:, 1 + int_width] = DOT
+        field[:, 2 + int_width:2 + int_width + decimals] = _digits(frac, decimals)
+    field[np.isnan(values)] = 0
+    for i, text in texts.items():
+        field[i] = 0
+        field[i, :len(text)] = np.frombuffer(text, dtype=np.uint8)
+    return field
+
+
+def _format_dates(dates):
+    """Ngày -> ma trận (n, 10) uint8 YYYY-MM-DD (năm 0-9999), không qua datetime_as_string từng phần tử"""
+    days = dates.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    years = months.astype('datetime64[Y]')
+    field = np.full((len(days), 10), MINUS, dtype=np.uint8)
+    field[:, 0:4] = _digits(years.astype(np.int64) + 1970, 4)
+    field[:, 5:7] = _digits(months.astype(np.int64) % 12 + 1, 2)
+    field[:, 8:10] = _digits((days - months).astype(np.int64) + 1, 2)
+    return field
+
+
+def format_rows(dates, floor_prices, volumes, market_caps):
+    """Format cả khối dòng DATE|FLOOR_PRICE|VOLUME|MARKET_CAP thành bytes, theo cột bằng NumPy
+
+    Mỗi trường là một ma trận byte (n, width) có đệm byte 0; ghép các trường theo cột rồi bỏ
+    byte 0 là ra đúng các dòng của format '{}|{:.6f}|{:.2f}|{:.2f}\\n'.
+    """
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    n = len(index)
+    pipe = np.full((n, 1), PIPE, dtype=np.uint8)
+    fields = [_format_dates(index.to_numpy())]
+    for values, decimals in zip((floor_prices, volumes, market_caps), VALUE_DECIMALS):
+        fields += [pipe, _format_fixed(values, decimals)]
+    fields.append(np.full((n, 1), NEWLINE, dtype=np.uint8))
+    rows = np.concatenate(fields, axis=1)
+    return rows[rows != 0].tobytes()
+
+
+def write_dataset(path, dates, floor_prices, volumes, market_caps, header=(), chunk_rows=WRITE_CHUNK_ROWS):
+    """Ghi dataset TXT (path đuôi .gz thì nén gzip) ra file tạm rồi rename vào chỗ
+
+    header là các dòng comment (không có '#'), dòng dữ liệu được format theo từng khối
+    chunk_rows dòng.
+    """
+    def write(f):
+        out = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) if is_compressed(path) else f
+        try:
+            out.write(''.join(f"# {line}\n" for line in header).encode('utf-8'))
+            for start in range(0, len(dates), chunk_rows):
+                stop = start + chunk_rows
+                out.write(format_rows(
+                    dates[start:stop], floor_prices[start:stop], volumes[start:stop], market_caps[start:stop]
+                ))
+        finally:
+            if out is not f:
+                out.close()
+
+    write_atomic(path, write, prefix='.dataset-')
+    return path
+
+
+def append_dataset(path, dates, floor_prices, volumes, market_caps, keep_bytes=None):
+    """Nối các dòng mới vào cuối file TXT đã có bằng một lần write() O_APPEND rồi fsync
+
+    Chi phí theo số dòng mới, không copy phần file đã có. keep_bytes < size: cắt phần đuôi
+    từ keep_bytes (dòng sẽ được ghi đè) trước khi nối. Reader đọc giữa chừng chỉ thấy một
+    prefix của file; sidecar (hash phần đầu) và FileCatalog (mtime) nhận ra file đã đổi.
+    """
+    data = format_rows(dates, floor_prices, volumes, market_caps)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+    try:
+        if keep_bytes is not None and keep_bytes < os.fstat(fd).st_size:
+            os.ftruncate(fd, keep_bytes)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return path
+
+
+def read_byte_range(path, start, end=None):
+    """Đọc bytes [start, end) của file"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read() if end is None else f.read(end - start)
+
+
+def find_last_line(data):
+    """Vị trí bắt đầu và nội dung của dòng cuối (không rỗng) trong buffer"""
+    stripped = data.rstrip(b'\r\n')
+    if not stripped:
+        return None, b''
+    start = stripped.rfind(b'\n') + 1
+    return start, stripped[start:]
+
+
+def last_stored_date(txt_file_path, tail_bytes=4096):
+    """Chuỗi DATE của dòng dữ liệu cuối file TXT (chỉ đọc phần đuôi), None nếu chưa có dòng dữ liệu"""
+    if is_compressed(txt_file_path):
+        # gzip không seek ngược được: giải nén cả file
+        with open_dataset(txt_file_path) as f:
+            data = f.read()
+    else:
+        size = os.path.getsize(txt_file_path)
+        data = read_byte_range(txt_file_path, max(0, size - tail_bytes), size)
+    _, last_line = find_last_line(data)
+    if not last_line or last_line.startswith(b'#'):
+        return None
+    return last_line.split(b'|')[0].decode('utf-8')
+
+
+def read_txt_segment(txt_file_path, offset):
+    """Chỉ parse phần file từ offset (đầu một dòng) tới cuối, vd. đoạn vừa được append"""
+    return read_txt_columns(io.BytesIO(read_byte_range(txt_file_path, offset)))
+
+
+def sidecar_path(txt_file_path):
+    """Đường dẫn sidecar .npz của một file TXT"""
+    return txt_file_path + SIDECAR_SUFFIX
+
+
+def source_stamp(txt_file_path):
+    """(size, mtime_ns, inode) của file nguồn, dùng để kiểm tra sidecar còn hợp lệ"""
+    st = os.stat(txt_file_path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def prefix_hash(data=b''):
+    """Hash (blake2b) của phần đầu file, dùng để nhận biết phần đã parse còn nguyên"""
+    return hashlib.blake2b(data, digest_size=SIDECAR_DIGEST_SIZE)
+
+
+def read_sidecar(path):
+    """Đọc sidecar, trả về (meta, digest, columns) hoặc None nếu không dùng được"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = dict(zip(SIDECAR_META, data['meta'].tolist()))
+            if meta['version'] != SIDECAR_VERSION:
+                return None
+
+            columns = {'date': data['date'].view('datetime64[ns]')}
+            for col in VALUE_COLUMNS:
+                columns[col] = data[col]
+            if UTC_OFFSET in data.files:
+                columns[UTC_OFFSET] = int(data[UTC_OFFSET])
+            return meta, data['digest'].tobytes(), columns
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def write_sidecar(path, columns, stamp, resume_offset, resume_drop, digest):
+    """Ghi sidecar ra file tạm rồi rename, reader không bao giờ thấy file dở dang"""
+    meta = [SIDECAR_VERSION, stamp[0], stamp[1], stamp[2], resume_offset, resume_drop]
+    extra = {UTC_OFFSET: np.int64(columns[UTC_OFFSET])} if columns.get(UTC_OFFSET) is not None else {}
+    write_atomic(path, lambda f: np.savez(
+        f,
+        meta=np.array(meta, dtype=np.int64),
+        digest=np.frombuffer(digest, dtype=np.uint8),
+        date=columns['date'].view(np.int64),
+        **{col: columns[col] for col in VALUE_COLUMNS},
+        **extra
+    ), prefix=SIDECAR_TMP_PREFIX)
+
+
+def _parse_bytes(data):
+    """Parse data (bắt đầu từ đầu một dòng); trả về columns và vị trí trong data để lần sau đọc tiếp (resume)"""
+    columns = read_txt_columns(io.BytesIO(data))
+
+    # Dòng data cuối có thể bị ghi đè khi append (dedupe theo ngày), nên lần sau
+    # parse lại từ đầu dòng đó và bỏ 1 row cuối trong cache
+    line_start, line = find_last_line(data)
+    if line_start is None or line.startswith(b'#'):
+        return columns, len(data), 0
+
+    # Dòng cuối sai định dạng không sinh row nào thì không có row nào để bỏ
+    resume_drop = len(read_txt_columns(io.BytesIO(line))['date'])
+    return columns, line_start, resume_drop
+
+
+def _parse_file(data):
+    """Parse cả file; trả về columns, resume_offset, resume_drop và hash phần trước resume_offset"""
+    columns, resume_offset, resume_drop = _parse_bytes(data)
+    return columns, resume_offset, resume_drop, prefix_hash(memoryview(data)[:resume_offset]).digest()
+
+
+def _resume_from_sidecar(txt_file_path, cached, stamp):
+    """Khi file chỉ được append: parse phần mới rồi nối vào mảng cũ trong sidecar
+
+    Phần [0, resume_offset) đã parse phải còn nguyên: cùng inode và cùng hash. File bị sửa
+    tại chỗ (kể cả khi sau đó dài thêm) thì trả về None để parse lại cả file.
+    """
+    meta, digest, cached_columns = cached
+    resume_offset = meta['resume_offset']
+    if stamp[2] != meta['inode'] or stamp[0] < resume_offset:
+        return None
+
+    with open(txt_file_path, 'rb') as f:
+        # Hash phần đầu theo từng khối, không giữ cả file trong memory
+        hasher = prefix_hash()
+        remaining = resume_offset
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_BYTES, remaining))
+            if not chunk:
+                return None
+            hasher.update(chunk)
+            remaining -= len(chunk)
+        if hasher.digest() != digest:
+            return None
+        data = f.read(stamp[0] - resume_offset)
+
+    segment, line_start, resume_drop = _parse_bytes(data)
+    hasher.update(memoryview(data)[:line_start])
+    keep = len(cached_columns['date']) - meta['resume_drop']
+    head = {col: cached_columns[col][:keep] for col in DATASET_COLUMNS}
+    head[UTC_OFFSET] = cached_columns.get(UTC_OFFSET)
+    return concat_columns(head, segment), resume_offset + line_start, resume_drop, hasher.digest()
+
+
+def load_dataset_columns(txt_file_path, use_sidecar=True):
+    """Đọc mảng cột của dataset, dùng sidecar khi size/mtime/inode của file TXT chưa đổi"""
+    if not use_sidecar:
+        return read_txt_columns(txt_file_path)
+
+    # Chỉ parse đúng số bytes ứng với stamp, để sidecar luôn khớp với stamp đã lưu
+    stamp = source_stamp(txt_file_path)
+    sidecar = sidecar_path(txt_file_path)
+
+    cached = read_sidecar(sidecar)
+    if cached is not None and (cached[0]['size'], cached[0]['mtime_ns'], cached[0]['inode']) == stamp:
+        return cached[2]
+
+    if is_compressed(txt_file_path):
+        # File .gz chỉ được ghi một lần (không append): sidecar lệch stamp thì giải nén đọc lại cả file
+        with open_dataset(txt_file_path) as f:
+            parsed = _parse_file(f.read())
+    else:
+        parsed = _resume_from_sidecar(txt_file_path, cached, stamp) if cached is not None else None
+        if parsed is None:
+            parsed = _parse_file(read_byte_range(txt_file_path, 0, stamp[0]))
+
+    columns = parsed[0]
+    try:
+        write_sidecar(sidecar, columns, stamp, *parsed[1:])
+    except OSError as e:
+        # Thư mục read-only vẫn đọc được dataset, chỉ là không có cache
+        print(f"⚠️  Không ghi được sidecar {sidecar}: {e}")
+
+    return columns
+
+
+class FileCatalog:
+    """Index key -> các phiên bản file (theo thứ tự), chỉ scan lại thư mục khi mtime đổi
+
+    File không có version trong tên (file append) lấy version theo mtime của chính nó; ghi
+    nối tại chỗ không đổi mtime thư mục nên các file này được stat lại mỗi lần lookup.
+    """
+
+    def __init__(self, directories, pattern):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.pattern = pattern
+        self._lock = threading.Lock()
+        self._dir_mtimes = {}
+        self._dir_entries = {}
+        self._mtime_versions = {}
+        self._index = {}
+
+    def _scan_directory(self, directory):
+        """Scan một thư mục, trả về {key: [(version, path), ...]} (version None: lấy theo mtime file)"""
+        entries = {}
+        with os.scandir(directory) as it:
+            for entry in it:
+                match = self.pattern.match(entry.name)
+                if match and entry.is_file():
+                    entries.setdefault(match.group('key'), []).append((match.group('version'), entry.path))
+        return entries
+
+    def _file_version(self, path):
+        """Version theo mtime của file, None nếu file đã bị xoá"""
+        try:
+            return time.strftime('%Y%m%d_%H%M%S', time.localtime(os.stat(path).st_mtime))
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Cập nhật index cho những thư mục có mtime thay đổi và file append có mtime thay đổi"""
+        with self._lock:
+            changed = False
+            now = time.time()
+
+            for directory in self.directories:
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except FileNotFoundError:
+                    mtime_ns = None
+
+                if directory in self._dir_mtimes and self._dir_mtimes[directory] == mtime_ns:
+                    continue
+
+                self._dir_entries[directory] = self._scan_directory(directory) if mtime_ns is not None else {}
+                racy = mtime_ns is not None and now - mtime_ns / 1e9 < RACY_MTIME_SECONDS
+                self._dir_mtimes[directory] = None if racy else mtime_ns
+                changed = True
+
+            mtime_versions = {
+                path: self._file_version(path)
+                for entries in self._dir_entries.values()
+                for versions in entries.values()
+                for version, path in versions
+                if version is None
+            }
+            if mtime_versions != self._mtime_versions:
+                self._mtime_versions = mtime_versions
+                changed = True
+
+            if changed:
+                index = {}
+                for entries in self._dir_entries.values():
+                    for key, versions in entries.items():
+                        for version, path in versions:
+                            version = version or mtime_versions.get(path)
+                            if version is not None:
+                                index.setdefault(key, []).append((version, path))
+                for versions in index.values():
+                    versions.sort()
+                self._index = index
+
+    def versions(self, key):
+        """Danh sách path của key, cũ -> mới"""
+        self.refresh()
+        return [path for _, path in self._index.get(key, [])]
+
+    def latest(self, key):
+        """Path mới nhất của key (None nếu chưa có)"""
+        self.refresh()
+        versions = self._index.get(key)
+        return versions[-1][1] if versions else None
+
+    def keys(self):
+        """Các key đang có trong catalog"""
+        self.refresh()
+        return sorted(self._index)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(directories, pattern=DATASET_FILE_RE):
+    """Catalog dùng chung trong process cho một bộ thư mục + pattern"""
+    cache_key = (tuple(os.path.abspath(d) for d in directories), pattern.pattern)
+    with _catalogs_lock:
+        catalog = _catalogs.get(cache_key)
+        if catalog is None:
+            catalog = _catalogs[cache_key] = FileCatalog(directories, pattern)
+        return catalog
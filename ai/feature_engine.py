@@ -0,0 +1,488 @@
+import math
+import warnings
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+
+LAGS = [1, 3, 7]
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+
+# Đúng thứ tự cột mà NFTPredictorFromTXT.prepare_features trả về
+FEATURE_COLUMNS = [
+    'floor_price_pct_change', 'floor_price_ma_7', 'floor_price_ma_30',
+    'floor_price_volatility', 'volume_pct_change', 'volume_ma_7',
+    'volume_ratio', 'market_cap_pct_change', 'price_to_market_cap',
+    'day_of_week', 'month', 'day_of_month'
+]
+for _lag in LAGS:
+    FEATURE_COLUMNS.extend([f'floor_price_lag_{_lag}', f'volume_lag_{_lag}'])
+
+TIME_FEATURES = ['day_of_week', 'month', 'day_of_month']
+
+# Tập feature đầy đủ (gồm cả feature riêng của NFTPricePredictor / bản optimized)
+ALL_FEATURES = FEATURE_COLUMNS + ['market_cap_ma_7', 'quarter']
+
+
+class RollingWindow:
+    """Ring buffer kích thước cố định + running mean/M2 (Welford) trên cửa sổ trượt"""
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = np.zeros(size)
+        self.count = 0
+        self.pos = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x):
+        if self.count < self.size:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.pos]
+            new_mean = self.mean + (x - old) / self.size
+            self.m2 += (x - old) * (x - new_mean + old - self.mean)
+            self.mean = new_mean
+
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+
+        # Tính lại mean/M2 mỗi vòng buffer để sai số cộng dồn không tăng mãi (O(1) khấu hao)
+        if self.pos == 0:
+            self._resync()
+
+    def _resync(self):
+        values = self.values()
+        self.mean = float(values.mean())
+        self.m2 = float(((values - self.mean) ** 2).sum())
+
+    def values(self):
+        """Các giá trị trong cửa sổ, cũ -> mới"""
+        if self.count < self.size:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -self.pos)
+
+    def get(self, lag=0):
+        """Giá trị cách hiện tại `lag` bước (NaN nếu chưa đủ dữ liệu)"""
+        if lag >= self.count:
+            return math.nan
+        return float(self.buffer[(self.pos - 1 - lag) % self.size])
+
+    def std(self):
+        """Độ lệch chuẩn mẫu (ddof=1) như pandas rolling().std()"""
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+
+def _ratio(a, b):
+    """a / b theo quy tắc float của numpy/pandas (chia 0 -> inf/NaN thay vì exception)"""
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class StreamingFeatureEngine:
+    """Tính feature của observation mới nhất trong O(1), khớp với preprocess_data + prepare_features"""
+
+    def __init__(self, collection_id=None, columns=None):
+        self.collection_id = collection_id
+        self.columns = list(columns or FEATURE_COLUMNS)
+        self.floor_long = RollingWindow(LONG_WINDOW)
+        self.floor_short = RollingWindow(SHORT_WINDOW)
+        self.volume_short = RollingWindow(SHORT_WINDOW)
+        self.volume_lags = RollingWindow(max(LAGS) + 1)
+        self.market_cap_short = RollingWindow(SHORT_WINDOW)
+        self.last_date = None
+        self.n_observations = 0
+
+    @staticmethod
+    def _ffill(value, window):
+        """NaN -> giá trị trước đó (ffill); chưa có giá trị nào thì dùng 0"""
+        if value is None or math.isnan(value):
+            last = window.get(0)
+            return 0.0 if math.isnan(last) else last
+        return float(value)
+
+    def update(self, date, floor_price, volume=0.0, market_cap=0.0):
+        """Nạp một observation mới, trả về vector feature theo self.columns"""
+        floor_price = self._ffill(floor_price, self.floor_long)
+        volume = self._ffill(volume, self.volume_lags)
+        market_cap = self._ffill(market_cap, self.market_cap_short)
+
+        self.floor_long.push(floor_price)
+        self.floor_short.push(floor_price)
+        self.volume_short.push(volume)
+        self.volume_lags.push(volume)
+        self.market_cap_short.push(market_cap)
+        self.last_date = pd.Timestamp(date)
+        self.n_observations += 1
+
+        return self.vector()
+
+    def features(self):
+        """Dict feature của observation hiện tại (NaN -> 0 như fillna(0) ở dòng cuối)"""
+        floor_price = self.floor_long.get(0)
+        volume = self.volume_lags.get(0)
+        market_cap = self.market_cap_short.get(0)
+        volume_ma_7 = self.volume_short.mean
+        date = self.last_date
+
+        values = {
+            'floor_price_pct_change': _ratio(floor_price, self.floor_long.get(1)) - 1,
+            'floor_price_ma_7': self.floor_short.mean,
+            'floor_price_ma_30': self.floor_long.mean,
+            'floor_price_volatility': self.floor_short.std(),
+            'volume_pct_change': _ratio(volume, self.volume_lags.get(1)) - 1,
+            'volume_ma_7': volume_ma_7,
+            'volume_ratio': _ratio(volume, volume_ma_7),
+            'market_cap_pct_change': _ratio(market_cap, self.market_cap_short.get(1)) - 1,
+            'market_cap_ma_7': self.market_cap_short.mean,
+            'price_to_market_cap': _ratio(floor_price, market_cap),
+            'day_of_week': date.dayofweek,
+            'month': date.month,
+            'quarter': date.quarter,
+            'day_of_month': date.day
+        }
+        for lag in LAGS:
+            values[f'floor_price_lag_{lag}'] = self.floor_long.get(lag)
+            values[f'volume_lag_{lag}'] = self.volume_lags.get(lag)
+
+        return {name: (0.0 if isinstance(v, float) and math.isnan(v) else v) for name, v in values.items()}
+
+    def vector(self):
+        """Vector feature (1 x n_features) theo thứ tự self.columns"""
+        if self.n_observations == 0:
+            raise ValueError("Feature engine chưa có observation nào!")
+        values = self.features()
+        return np.array([[values[name] for name in self.columns]], dtype=np.float64)
+
+    @classmethod
+    def from_frame(cls, df, collection_id=None, columns=None):
+        """Dựng lại state từ dataset đã lưu (chỉ cần LONG_WINDOW dòng cuối)"""
+        engine = cls(collection_id, columns)
+        df = df.sort_values('date') if not df['date'].is_monotonic_increasing else df
+
+        # ffill/bfill giống bước xử lý missing values của preprocess_data
+        values = df[['floor_price']].copy()
+        for col in ['volume', 'market_cap']:
+            values[col] = df[col] if col in df.columns else 0.0
+        values = values.ffill().bfill().tail(LONG_WINDOW)
+        dates = df['date'].tail(LONG_WINDOW)
+
+        for date, (floor_price, volume, market_cap) in zip(dates, values.itertuples(index=False)):
+            engine.update(date, floor_price, volume, market_cap)
+
+        return engine
+
+
+class FeatureEngineStore:
+    """Giữ một StreamingFeatureEngine cho mỗi collection"""
+
+    def __init__(self, columns=None):
+        self.columns = columns
+        self.engines = {}
+
+    def rebuild(self, collection_id, df):
+        """Dựng lại engine của collection từ dataset"""
+        engine = StreamingFeatureEngine.from_frame(df, collection_id, self.columns)
+        self.engines[collection_id] = engine
+        return engine
+
+    def ingest(self, collection_id, date, floor_price, volume=0.0, market_cap=0.0):
+        """Nạp observation mới cho collection, trả về vector feature"""
+        engine = self.engines.get(collection_id)
+        if engine is None:
+            engine = self.engines[collection_id] = StreamingFeatureEngine(collection_id, self.columns)
+        return engine.update(date, floor_price, volume, market_cap)
+
+    def get(self, collection_id):
+        return self.engines.get(collection_id)
+
+
+def _rolling_mean(x, window):
+    """Rolling mean (min_periods=1) bằng cumulative sum, trừ mean trước để giảm sai số"""
+    n = len(x)
+    center = x.mean() if n and np.isfinite(x).all() else 0.0
+    cs = np.empty(n + 1)
+    cs[0] = 0.0
+    np.cumsum(x - center, out=cs[1:])
+    k = min(window, n)
+    means = np.empty(n)
+    means[:k] = cs[1:k + 1] / np.arange(1, k + 1)
+    means[k:] = (cs[k + 1:] - cs[1:n - k + 1]) / window
+    return means + center
+
+
+def _rolling_std(x, window, mean):
+    """Rolling std (ddof=1, min_periods=1) hai lượt trên các mảng dịch, ổn định số học"""
+    n = len(x)
+    m2 = np.zeros(n)
+    for k in range(min(window, n)):
+        diff = x[:n - k] - mean[k:]
+        m2[k:] += diff * diff
+    count = np.minimum(np.arange(1, n + 1), window)
+    with np.errstate(all='ignore'):
+        std = np.sqrt(m2 / (count - 1))
+    std[count < 2] = np.nan
+    return std
+
+
+def _pct_change(x):
+    out = np.empty(len(x))
+    out[:1] = np.nan
+    with np.errstate(all='ignore'):
+        out[1:] = x[1:] / x[:-1] - 1
+    return out
+
+
+def _shift(x, lag):
+    out = np.full(len(x), np.nan)
+    out[lag:] = x[:max(len(x) - lag, 0)]
+    return out
+
+
+def _bfill_zero(x):
+    """bfill rồi NaN còn lại -> 0 (giống df.fillna(method='bfill').fillna(0)), tại chỗ"""
+    mask = np.isnan(x)
+    if not mask.any():
+        return x
+    valid = np.flatnonzero(~mask)
+    if not len(valid):
+        x[:] = 0.0
+    elif not mask[valid[0]:].any():
+        # Trường hợp thường gặp: NaN chỉ nằm ở đầu (lag, pct_change, std)
+        x[:valid[0]] = x[valid[0]]
+    else:
+        # Với mỗi ô NaN, lấy index của giá trị hợp lệ gần nhất phía dưới (n = không có)
+        n = len(x)
+        idx = np.where(mask, n, np.arange(n))
+        idx = np.minimum.accumulate(idx[::-1])[::-1]
+        x[:] = np.append(x, 0.0)[idx]
+    return x
+
+
+def build_features_numpy(df):
+    """Backend NumPy của NFTPredictorFromTXT.preprocess_data: cùng cột, cùng thứ tự, cùng dtype"""
+    df = df.copy()
+
+    # Handle missing values (chỉ các cột có NaN)
+    if df.isna().values.any():
+        df = df.ffill().bfill()
+
+    floor_price = df['floor_price'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    market_cap = df['market_cap'].to_numpy(dtype=np.float64)
+    n = len(df)
+
+    float_columns = [c for c in FEATURE_COLUMNS if c not in TIME_FEATURES]
+    col = {name: j for j, name in enumerate(float_columns)}
+    # Column-major: mỗi cột feature là một vùng nhớ liền, ghi/đọc theo cột không bị strided
+    values = np.empty((n, len(float_columns)), order='F')
+
+    floor_ma_7 = _rolling_mean(floor_price, SHORT_WINDOW)
+    volume_ma_7 = _rolling_mean(volume, SHORT_WINDOW)
+    values[:, col['floor_price_pct_change']] = _pct_change(floor_price)
+    values[:, col['floor_price_ma_7']] = floor_ma_7
+    values[:, col['floor_price_ma_30']] = _rolling_mean(floor_price, LONG_WINDOW)
+    values[:, col['floor_price_volatility']] = _rolling_std(floor_price, SHORT_WINDOW, floor_ma_7)
+    values[:, col['volume_pct_change']] = _pct_change(volume)
+    values[:, col['volume_ma_7']] = volume_ma_7
+    values[:, col['market_cap_pct_change']] = _pct_change(market_cap)
+    with np.errstate(all='ignore'):
+        values[:, col['volume_ratio']] = volume / volume_ma_7
+        values[:, col['price_to_market_cap']] = floor_price / market_cap
+    for lag in LAGS:
+        values[:, col[f'floor_price_lag_{lag}']] = _shift(floor_price, lag)
+        values[:, col[f'volume_lag_{lag}']] = _shift(volume, lag)
+
+    for j in range(values.shape[1]):
+        _bfill_zero(values[:, j])
+
+    dates = df['date'].to_numpy(dtype='datetime64[ns]')
+    days = dates.astype('datetime64[D]')
+    months = dates.astype('datetime64[M]')
+    time_values = {
+        'day_of_week': ((days.astype(np.int64) + 3) % 7).astype(np.int32),
+        'month': (months.astype(np.int64) % 12 + 1).astype(np.int32),
+        'day_of_month': ((days - months).astype(np.int64) + 1).astype(np.int32)
+    }
+
+    # Cột gốc toàn NaN (ffill/bfill không lấp được) -> 0 như fillna(0) cuối pandas path
+    if df.isna().values.any():
+        df = df.fillna(0)
+
+    # Cột feature đã có sẵn thì ghi đè tại chỗ như pandas path
+    if set(FEATURE_COLUMNS).intersection(df.columns):
+        for name in FEATURE_COLUMNS:
+            df[name] = time_values[name] if name in TIME_FEATURES else values[:, col[name]]
+        return df
+
+    # Ghép theo từng đoạn cột liền nhau của FEATURE_COLUMNS để pandas dùng lại block
+    # F-order thay vì copy từng cột
+    parts = [df]
+    for is_time, names in groupby(FEATURE_COLUMNS, key=lambda name: name in TIME_FEATURES):
+        names = list(names)
+        if is_time:
+            parts.append(pd.DataFrame({name: time_values[name] for name in names}, index=df.index))
+        else:
+            block = values[:, col[names[0]]:col[names[-1]] + 1]
+            parts.append(pd.DataFrame(block, columns=names, index=df.index, copy=False))
+    return pd.concat(parts, axis=1, copy=False)
+
+
+class ForecastState:
+    """Cửa sổ NumPy (n_series x LONG_WINDOW) để cuộn forecast nhiều bước, không tạo DataFrame"""
+
+    def __init__(self, floor_price, volume, market_cap, dates):
+        # Mỗi hàng là một series, cột cuối là observation mới nhất, thiếu dữ liệu = NaN bên trái
+        self.floor_price = np.array(floor_price, dtype=np.float64, ndmin=2)
+        self.volume = np.array(volume, dtype=np.float64, ndmin=2)
+        self.market_cap = np.array(market_cap, dtype=np.float64, ndmin=2)
+        self.dates = np.array(dates, dtype='datetime64[ns]', ndmin=1)
+
+    @staticmethod
+    def _pad(values):
+        padded = np.full(LONG_WINDOW, np.nan)
+        if len(values):
+            padded[-len(values):] = values[-LONG_WINDOW:]
+        return padded
+
+    @classmethod
+    def from_engine(cls, engine):
+        """Lấy state từ StreamingFeatureEngine (cùng dữ liệu, dạng mảng)"""
+        return cls(
+            cls._pad(engine.floor_long.values()),
+            cls._pad(engine.volume_lags.values()),
+            cls._pad(engine.market_cap_short.values()),
+            [np.datetime64(engine.last_date.to_datetime64(), 'ns')]
+        )
+
+    @classmethod
+    def stack(cls, states):
+        """Ghép state của nhiều series/collection thành một ma trận"""
+        return cls(
+            np.vstack([s.floor_price for s in states]),
+            np.vstack([s.volume for s in states]),
+            np.vstack([s.market_cap for s in states]),
+            np.concatenate([s.dates for s in states])
+        )
+
+    @property
+    def n_series(self):
+        return self.floor_price.shape[0]
+
+    def features(self, columns, rows=None):
+        """Ma trận feature (n_series x len(columns)) của observation mới nhất mỗi series"""
+        rows = slice(None) if rows is None else rows
+        fp, vol, cap = self.floor_price[rows], self.volume[rows], self.market_cap[rows]
+        dates = self.dates[rows]
+        months = dates.astype('datetime64[M]')
+        month = months.astype(np.int64) % 12 + 1
+
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            volume_ma_7 = np.nanmean(vol[:, -SHORT_WINDOW:], axis=1)
+            values = {
+                'floor_price_pct_change': fp[:, -1] / fp[:, -2] - 1,
+                'floor_price_ma_7': np.nanmean(fp[:, -SHORT_WINDOW:], axis=1),
+                'floor_price_ma_30': np.nanmean(fp[:, -LONG_WINDOW:], axis=1),
+                'floor_price_volatility': np.nanstd(fp[:, -SHORT_WINDOW:], axis=1, ddof=1),
+                'volume_pct_change': vol[:, -1] / vol[:, -2] - 1,
+                'volume_ma_7': volume_ma_7,
+                'volume_ratio': vol[:, -1] / volume_ma_7,
+                'market_cap_pct_change': cap[:, -1] / cap[:, -2] - 1,
+                'market_cap_ma_7': np.nanmean(cap[:, -SHORT_WINDOW:], axis=1),
+                'price_to_market_cap': fp[:, -1] / cap[:, -1],
+                # 1970-01-01 là thứ Năm (dayofweek = 3)
+                'day_of_week': (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7,
+                'month': month,
+                'quarter': (month - 1) // 3 + 1,
+                'day_of_month': (dates.astype('datetime64[D]') - months).astype(np.int64) + 1
+            }
+            for lag in LAGS:
+                values[f'floor_price_lag_{lag}'] = fp[:, -1 - lag]
+                values[f'volume_lag_{lag}'] = vol[:, -1 - lag]
+
+        X = np.empty((fp.shape[0], len(columns)))
+        for j, name in enumerate(columns):
+            X[:, j] = values[name]
+        # Giống fillna(0) ở dòng cuối (inf được giữ nguyên như pandas)
+        X[np.isnan(X)] = 0.0
+        return X
+
+    def push(self, floor_price, volume, market_cap, step=np.timedelta64(1, 'D')):
+        """Dịch cửa sổ sang trái một bước và thêm observation mới cho mọi series"""
+        for window, value in ((self.floor_price, floor_price), (self.volume, volume), (self.market_cap, market_cap)):
+            window[:, :-1] = window[:, 1:]
+            window[:, -1] = value
+        self.dates = self.dates + step
+
+
+def make_horizon_targets(y, horizon):
+    """Target t+1 ... t+H từ floor_price dịch lên (các dòng cuối thiếu target bị bỏ)"""
+    targets = pd.concat(
+        {f'floor_price_t+{h}': y.shift(-h) for h in range(1, horizon + 1)},
+        axis=1
+    )
+    return targets.iloc[:len(targets) - horizon]
+
+
+def forecast_recursive(state, predict_fn, columns, steps, step=np.timedelta64(1, 'D'), horizon=1):
+    """Forecast đệ quy: dự đoán từ feature hiện tại rồi đẩy giá dự đoán vào cửa sổ, tính lại feature
+
+    Với model multi-horizon (horizon=H), mỗi lần predict trả về H bước liên tiếp.
+    Trả về mảng (n_series x steps).
+    """
+    group = (np.arange(state.n_series), predict_fn, columns, horizon)
+    return forecast_batch(state, [group], [steps] * state.n_series, step)
+
+
+def forecast_batch(state, groups, steps, step=np.timedelta64(1, 'D')):
+    """Forecast nhiều series cùng lúc; mỗi group (cùng model) chỉ predict một lần cho mỗi bước/block
+
+    groups: list (indices, predict_fn, columns, horizon) - indices là các hàng của state.
+    steps: số bước cần cho từng series. Volume tương lai giữ nguyên giá trị cuối, market cap
+    đổi theo cùng tỉ lệ với floor price (số lượng NFT không đổi).
+    Trả về mảng (n_series x max(steps)), NaN sau horizon của từng series.
+    """
+    steps = np.asarray(steps, dtype=np.int64)
+    total = int(steps.max()) if len(steps) else 0
+    predictions = np.full((state.n_series, total), np.nan)
+    blocks = {}
+
+    for t in range(total):
+        # Series đã xong giữ nguyên giá cuối
+        pred = state.floor_price[:, -1].copy()
+
+        for g, (indices, predict_fn, columns, horizon) in enumerate(groups):
+            indices = np.asarray(indices)
+            if t % horizon == 0:
+                active = indices[steps[indices] > t]
+                if len(active) == 0:
+                    blocks.pop(g, None)
+                    continue
+                block = np.asarray(predict_fn(state.features(columns, active)), dtype=np.float64)
+                blocks[g] = (active, block.reshape(len(active), horizon))
+
+            if g in blocks:
+                active, block = blocks[g]
+                pred[active] = block[:, t % horizon]
+
+        done = steps <= t
+        predictions[:, t] = np.where(done, np.nan, pred)
+        if t == total - 1:
+            break
+
+        last_price = state.floor_price[:, -1]
+        with np.errstate(all='ignore'):
+            market_cap = np.where(last_price != 0, state.market_cap[:, -1] * pred / last_price, state.market_cap[:, -1])
+        state.push(pred, state.volume[:, -1], market_cap, step)
+
+    return predictions
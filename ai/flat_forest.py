@@ -0,0 +1,130 @@
+import numpy as np
+
+from dataset_store import write_atomic
+
+# Các node của mọi cây nằm liền trong một mảng, child đã cộng offset của cây (-1 = lá)
+NODE_FIELDS = [
+    ('left', np.int32),
+    ('right', np.int32),
+    ('feature', np.int32),
+    ('threshold', np.float64)
+]
+
+# Cả forest trong một file <prefix>.npy để việc thay file khi export lại là atomic:
+# mảng gốc của các cây (nhỏ, đọc vào RAM) rồi tới mảng node (mmap), mỗi mảng theo format .npy
+FOREST_SUFFIX = '.npy'
+FOREST_TMP_PREFIX = '.forest-'
+
+
+def node_dtype(n_outputs):
+    return np.dtype(NODE_FIELDS + [('value', np.float64, (n_outputs,))])
+
+
+def forest_path(prefix):
+    """Path file .npy của một forest"""
+    return prefix + FOREST_SUFFIX
+
+
+def _save_arrays(path, *arrays):
+    """np.save từng mảng nối tiếp vào file tạm rồi rename, process khác không bao giờ mmap phải file dở dang"""
+    def write(f):
+        for array in arrays:
+            np.save(f, array, allow_pickle=False)
+
+    write_atomic(path, write, prefix=FOREST_TMP_PREFIX)
+
+
+def _load_arrays(path, mmap_mode):
+    """(roots, nodes) từ file của _save_arrays; nodes mmap theo offset trong file nếu có mmap_mode"""
+    with open(path, 'rb') as f:
+        roots = np.lib.format.read_array(f, allow_pickle=False)
+        if not mmap_mode:
+            return roots, np.lib.format.read_array(f, allow_pickle=False)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    order = 'F' if fortran_order else 'C'
+    return roots, np.memmap(path, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape, order=order)
+
+
+class FlatForest:
+    """RandomForestRegressor dạng mảng phẳng, load bằng np.load(mmap_mode='r')
+
+    Cây của sklearn copy node vào bộ nhớ riêng khi unpickle, nên mỗi worker giữ một bản
+    của mọi forest. Mảng .npy được mmap read-only thì các worker trên cùng host dùng
+    chung page cache. predict() cho cùng kết quả với model.predict().
+    """
+
+    def __init__(self, nodes, roots):
+        self.nodes = nodes
+        self.values = nodes['value']
+        # Index node gốc của từng cây, lưu cùng artifact: load không phải quét / copy mảng node
+        self.roots = roots
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Chuyển RandomForestRegressor (1 hoặc nhiều output) đã fit sang dạng phẳng"""
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        counts = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        nodes = np.empty(counts.sum(), dtype=node_dtype(model.n_outputs_))
+        for tree, offset, count in zip(trees, offsets, counts):
+            rows = slice(offset, offset + count)
+            for field, children in (('left', tree.children_left), ('right', tree.children_right)):
+                nodes[field][rows] = np.where(children == -1, -1, children + offset)
+            nodes['feature'][rows] = tree.feature
+            nodes['threshold'][rows] = tree.threshold
+            nodes['value'][rows] = tree.value[:, :, 0]
+
+        # Node 0 của mỗi cây sklearn là gốc
+        return cls(nodes, offsets.astype(np.int32))
+
+    def save(self, prefix):
+        _save_arrays(forest_path(prefix), self.roots, self.nodes)
+
+    @classmethod
+    def load(cls, prefix, mmap_mode='r'):
+        roots, nodes = _load_arrays(forest_path(prefix), mmap_mode)
+        return cls(nodes, roots)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def predict(self, X):
+        """Đi xuống mọi cây cùng lúc cho mọi sample, rồi lấy trung bình giá trị lá"""
+        # Cây sklearn so sánh X đã ép về float32 với threshold float64
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+
+        # Một phần tử cho mỗi cặp (sample, cây); chỉ những cặp chưa tới lá đi tiếp
+        node = np.tile(self.roots.astype(np.int64), n_samples)
+        row_offset = np.repeat(np.arange(n_samples) * n_features, self.n_estimators)
+
+        left = self.nodes['left']
+        right = self.nodes['right']
+        feature = self.nodes['feature']
+        threshold = self.nodes['threshold']
+
+        active = np.flatnonzero(left[node] != -1)
+        while active.size:
+            current = node[active]
+            go_left = flat_X[row_offset[active] + feature[current]] <= threshold[current]
+            node[active] = np.where(go_left, left[current], right[current])
+            active = active[left[node[active]] != -1]
+
+        # Cộng dồn theo từng cây như RandomForestRegressor.predict
+        leaf_values = self.values[node].reshape(n_samples, self.n_estimators, -1)
+        prediction = np.zeros((n_samples, self.values.shape[1]))
+        for k in range(self.n_estimators):
+            prediction += leaf_values[:, k]
+        prediction /= self.n_estimators
+
+        return prediction[:, 0] if prediction.shape[1] == 1 else prediction
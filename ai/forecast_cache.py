@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dataset_store import get_catalog
+from model_store import artifact_stamp, stamp_paths
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_TTL_SECONDS = 300
+
+
+def dataset_fingerprint(dataset_dirs, collection_id):
+    """(path, size, mtime_ns) của dataset mới nhất; đổi khi scraper ghi file mới hoặc append"""
+    path = get_catalog(dataset_dirs).latest(collection_id)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return path, st.st_size, st.st_mtime_ns
+
+
+def model_fingerprint(model_dir, collection_id):
+    """Stamp (inode, size, mtime_ns) các artifact của model; đổi khi export model mới"""
+    return artifact_stamp(stamp_paths(model_dir, collection_id))
+
+
+class ForecastCache:
+    """Cache kết quả forecast theo (collection, days, dataset fingerprint, model fingerprint)
+
+    Forecast là hàm tất định của dataset + model + days, nên chỉ cần fingerprint đổi là key
+    đổi (bản cũ tự hết được dùng và bị đẩy ra theo LRU). TTL chặn thêm cho trường hợp
+    mtime của filesystem không đủ mịn.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_TTL_SECONDS):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Giá trị đã cache hoặc None (không có / hết hạn)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, collection_id=None):
+        """Bỏ mọi forecast của một collection (hoặc toàn bộ)"""
+        with self._lock:
+            if collection_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == collection_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
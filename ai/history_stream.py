@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from dataset_store import DATASET_COLUMNS, VALUE_COLUMNS, get_catalog, load_dataset_columns
+
+# Số dòng format mỗi lần yield: đủ lớn để vectorize, đủ nhỏ để memory của response có giới hạn
+CHUNK_ROWS = 2000
+NDJSON = 'ndjson'
+JSON = 'json'
+
+
+def parse_bound(value):
+    """Chuỗi ngày/giờ ISO -> datetime64[ns] (giờ có timezone được đổi sang UTC), None nếu bỏ trống"""
+    if not value:
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_datetime64().astype('datetime64[ns]')
+
+
+def parse_fields(value):
+    """Danh sách cột giá trị được yêu cầu (mặc định tất cả), raise ValueError nếu có cột lạ"""
+    if not value:
+        return list(VALUE_COLUMNS)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in VALUE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(VALUE_COLUMNS)})")
+    return fields
+
+
+def load_history(dataset_dirs, collection_id):
+    """Mảng cột (sắp xếp theo date) của dataset mới nhất, None nếu collection chưa có dataset"""
+    path = get_catalog(dataset_dirs).latest(collection_id)
+    if path is None:
+        return None
+
+    columns = load_dataset_columns(path)
+    dates = columns['date']
+    if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+        order = np.argsort(dates, kind='stable')
+        columns = {**columns, **{col: columns[col][order] for col in DATASET_COLUMNS}}
+    return columns
+
+
+def slice_range(dates, start=None, end=None, limit=None):
+    """(lo, hi, next_index) của khoảng [start, end] bằng binary search trên dates đã sort
+
+    next_index là vị trí dòng đầu của trang sau khi limit cắt bớt, None nếu đã hết.
+    """
+    lo = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, end, side='right'))
+    hi = max(lo, hi)
+    if limit is not None and hi - lo > limit:
+        return lo, lo + limit, lo + limit
+    return lo, hi, None
+
+
+def _format_values(values):
+    """float -> chuỗi JSON (NaN/inf -> null)"""
+    return ['null' if not np.isfinite(v) else repr(v) for v in values.tolist()]
+
+
+def iter_rows(columns, lo, hi, fields, fmt=NDJSON, chunk_rows=CHUNK_ROWS):
+    """Sinh bytes của các dòng [lo, hi) theo từng chunk, không dựng cả chuỗi response trong memory
+
+    fmt=ndjson: mỗi dòng một object JSON; fmt=json: một mảng JSON được stream từng phần.
+    """
+    keys = ['"date":'] + [f',"{field}":' for field in fields]
+    separator = '\n' if fmt == NDJSON else ','
+    first = True
+
+    if fmt == JSON:
+        yield b'['
+
+    for start in range(lo, hi, chunk_rows):
+        stop = min(start + chunk_rows, hi)
+        dates = np.datetime_as_string(columns['date'][start:stop], unit='s')
+        cells = [[f'"{d}"' for d in dates.tolist()]] + [_format_values(columns[field][start:stop]) for field in fields]
+
+        rows = [
+            '{' + ''.join(key + cell for key, cell in zip(keys, row)) + '}'
+            for row in zip(*cells)
+        ]
+        chunk = separator.join(rows)
+        if fmt == NDJSON:
+            chunk += '\n'
+        elif not first:
+            chunk = ',' + chunk
+        first = False
+        yield chunk.encode('utf-8')
+
+    if fmt == JSON:
+        yield b']'
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+
+import dataset_store
+from core_budget import INFERENCE, apply_n_jobs, thread_budget
+from flat_forest import FlatForest, forest_path
+
+# Artifact do NFTPredictorFromTXT.export_model ghi ra cho mỗi collection
+MODEL_FILE = 'nft_model_{}.pkl'
+SCALER_FILE = 'nft_scaler_{}.pkl'
+META_FILE = 'nft_meta_{}.json'
+# Forest dạng mảng phẳng (mmap được): nft_forest_<id>.npy
+FOREST_PREFIX = 'nft_forest_{}'
+FLAT_FOREST_FORMAT = 'flat_forest'
+
+# File tạm của write_atomic trong model_dir
+ARTIFACT_TMP_PREFIX = '.artifact-'
+
+DEFAULT_CACHE_SIZE = 32
+LOAD_ATTEMPTS = 3
+
+
+def artifact_paths(model_dir, collection_id):
+    """(model, scaler, meta) path của một collection"""
+    return tuple(
+        os.path.join(model_dir, name.format(collection_id))
+        for name in (MODEL_FILE, SCALER_FILE, META_FILE)
+    )
+
+
+def write_atomic(path, write):
+    """write(f) vào file tạm cùng thư mục rồi rename: process đang phục vụ không đọc phải file dở dang"""
+    dataset_store.write_atomic(path, write, prefix=ARTIFACT_TMP_PREFIX)
+
+
+def forest_prefix(model_dir, collection_id):
+    return os.path.join(model_dir, FOREST_PREFIX.format(collection_id))
+
+
+def stamp_paths(model_dir, collection_id):
+    """Mọi file ảnh hưởng tới model đã load: model, scaler, meta rồi tới file forest"""
+    return list(artifact_paths(model_dir, collection_id)) + [forest_path(forest_prefix(model_dir, collection_id))]
+
+
+def load_model_file(model_dir, collection_id, meta):
+    """FlatForest mmap read-only nếu export có bản phẳng, không thì unpickle file .pkl"""
+    prefix = forest_prefix(model_dir, collection_id)
+    if meta.get('model_format') == FLAT_FOREST_FORMAT and os.path.exists(forest_path(prefix)):
+        return FlatForest.load(prefix)
+    return joblib.load(artifact_paths(model_dir, collection_id)[0])
+
+
+def read_model_meta(meta_path):
+    """Nội dung file meta, model cũ không có file meta -> {}"""
+    if not os.path.exists(meta_path):
+        return {}
+
+    with open(meta_path, 'r') as f:
+        return json.load(f)
+
+
+def artifact_stamp(paths):
+    """Version của bộ artifact: (inode, size, mtime_ns) từng file, None nếu thiếu model/scaler
+
+    paths bắt đầu bằng model, scaler; các file sau là tuỳ chọn (None nếu không có). Export ghi
+    file mới rồi rename nên inode đổi mỗi lần export, kể cả khi size và mtime trùng.
+    """
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            stamp.append(None)
+
+    if stamp[0] is None or stamp[1] is None:
+        return None
+    return tuple(stamp)
+
+
+class ModelArtifacts:
+    """Model + scaler + metadata đã load của một collection"""
+
+    def __init__(self, collection_id, model, scaler, meta, stamp):
+        self.collection_id = collection_id
+        self.model = model
+        self.scaler = scaler
+        self.horizon = meta.get('horizon')
+        self.feature_names = meta.get('feature_names')
+        self.stamp = stamp
+
+    @classmethod
+    def load(cls, model_dir, collection_id, stamp=None, n_jobs=None):
+        """Load artifact; n_jobs của model pickle (giá trị lúc train) bị ghi đè bằng ngân sách predict"""
+        _, scaler_path, meta_path = artifact_paths(model_dir, collection_id)
+        meta = read_model_meta(meta_path)
+        n_jobs = thread_budget(INFERENCE) if n_jobs is None else n_jobs
+        return cls(
+            collection_id,
+            apply_n_jobs(load_model_file(model_dir, collection_id, meta), n_jobs),
+            joblib.load(scaler_path),
+            meta,
+            stamp
+        )
+
+
+class ModelCache:
+    """Cache LRU có giới hạn cho artifact của model, tự load lại khi file trên đĩa đổi
+
+    Mỗi lần get() chỉ stat các file artifact: stamp (inode, size, mtime_ns) khớp thì dùng bản trong
+    memory, khác thì load lại (model vừa được train lại), hết chỗ thì bỏ bản ít dùng nhất.
+    """
+
+    def __init__(self, model_dir, max_size=DEFAULT_CACHE_SIZE):
+        self.model_dir = model_dir
+        self.max_size = max(1, int(max_size))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def get(self, collection_id):
+        """Artifact của collection (ModelArtifacts) hoặc None nếu chưa có model"""
+        stamp = artifact_stamp(stamp_paths(self.model_dir, collection_id))
+
+        with self._lock:
+            cached = self._entries.get(collection_id)
+            if stamp is None:
+                self._entries.pop(collection_id, None)
+                self.misses += 1
+                return None
+            if cached is not None and cached.stamp == stamp:
+                self._entries.move_to_end(collection_id)
+                self.hits += 1
+                return cached
+
+        # Load ngoài lock để request của collection khác không phải chờ joblib
+        try:
+            artifacts = self._load_consistent(collection_id, stamp)
+        except Exception:
+            # File đang được export dở: giữ bản cũ (nếu có), lần sau thử lại
+            with self._lock:
+                self.errors += 1
+            if cached is not None:
+                return cached
+            raise
+
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._entries[collection_id] = artifacts
+            self._entries.move_to_end(collection_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return artifacts
+
+    def _load_consistent(self, collection_id, stamp):
+        """Load lại nếu có file bị thay (export mới) trong lúc đang load, tránh trộn hai phiên bản"""
+        for _ in range(LOAD_ATTEMPTS):
+            artifacts = ModelArtifacts.load(self.model_dir, collection_id, stamp)
+            current = artifact_stamp(stamp_paths(self.model_dir, collection_id))
+            if current == stamp or current is None:
+                return artifacts
+            stamp = current
+        return artifacts
+
+    def invalidate(self, collection_id=None):
+        """Bỏ một collection (hoặc toàn bộ) khỏi cache"""
+        with self._lock:
+            if collection_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(collection_id, None)
+
+    def stats(self):
+        """Số liệu hit/miss/reload/eviction và các collection đang nằm trong cache"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.reloads
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'evictions': self.evictions,
+                'errors': self.errors,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'collections': list(self._entries)
+            }
@@ -1,58 +1,54 @@
-
-import pandas as pd
 import numpy as np
 import json
 import os
-import glob
 import joblib
-from datetime import datetime, timedelta
+from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
 # Machine Learning imports
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
 
+from dataset_store import load_dataset_columns, frame_from_columns, get_catalog
+from feature_engine import (
+    FEATURE_COLUMNS, StreamingFeatureEngine, ForecastState, forecast_batch, make_horizon_targets,
+    build_features_numpy
+)
+from model_store import FLAT_FOREST_FORMAT, ModelArtifacts, artifact_paths, forest_prefix, write_atomic
+from flat_forest import FlatForest
+from core_budget import TRAINING, limit_threads, thread_budget
+from parallel_runner import run_collections
+
 class NFTPredictorFromTXT:
     def __init__(self):
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
+        # None: model 1 bước (forecast đệ quy); H: model multi-output dự đoán t+1 ... t+H
+        self.horizon = None
+        self.feature_names = None
         self.dataset_path = "ai/ai/datasets"
+        self.dataset_dirs = [self.dataset_path, "ai/datasets"]
+        self.use_sidecar = True
+        # 'pandas' hoặc 'numpy' (build_features_numpy, cho kết quả giống hệt)
+        self.feature_backend = 'pandas'
+        self.model_dir = "ai_models"
+        # Thư mục ghi ai_predictions_<id>_<ts>.json
+        self.results_dir = "."
+        # Số thread khi train (n_jobs của RandomForest + BLAS/OpenMP): AI_TRAINING_N_JOBS, mặc định mọi core
+        self.n_jobs = thread_budget(TRAINING)
+        # ModelCache dùng chung (vd. trong ai_api): load_model lấy artifact từ cache thay vì joblib
+        self.model_cache = None
         
     def load_txt_dataset(self, txt_file_path):
         """Đọc dataset từ file TXT"""
         print(f"Đang đọc dataset từ: {txt_file_path}")
         
         try:
-            data = []
-            
-            with open(txt_file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    # Skip comments và empty lines
-                    if line.startswith('#') or not line:
-                        continue
-                    
-                    # Parse data line: DATE|FLOOR_PRICE|VOLUME|MARKET_CAP
-                    parts = line.split('|')
-                    if len(parts) == 4:
-                        date_str = parts[0]
-                        floor_price = float(parts[1])
-                        volume = float(parts[2])
-                        market_cap = float(parts[3])
-                        
-                        data.append({
-                            'date': pd.to_datetime(date_str),
-                            'floor_price': floor_price,
-                            'volume': volume,
-                            'market_cap': market_cap
-                        })
-            
-            df = pd.DataFrame(data)
-            df = df.sort_values('date').reset_index(drop=True)
+            # Parse cả file một lượt thành mảng cột (hoặc đọc sidecar .npz nếu file chưa đổi)
+            df = frame_from_columns(load_dataset_columns(txt_file_path, self.use_sidecar))
             
             print(f"✅ Đã đọc {len(df)} records từ {txt_file_path}")
             return df
@@ -63,28 +59,22 @@ class NFTPredictorFromTXT:
     
     def get_latest_dataset(self, collection_id):
         """Lấy dataset mới nhất cho collection"""
-        # Thử nhiều pattern khác nhau
-        patterns = [
-            f"{self.dataset_path}nft_data_{collection_id}_*.txt",
-            f"ai/datasets/nft_data_{collection_id}_*.txt"
-        ]
-        
-        files = []
-        for pattern in patterns:
-            files.extend(glob.glob(pattern))
+        # Catalog dùng chung trong process, chỉ scan lại khi thư mục dataset thay đổi
+        latest_file = get_catalog(self.dataset_dirs).latest(collection_id)
         
-        if not files:
+        if latest_file is None:
             print(f"⚠️  Không tìm thấy dataset cho {collection_id}")
             return None
             
-        # Sắp xếp theo thời gian và lấy file mới nhất
-        latest_file = max(files, key=os.path.getctime)
         print(f"📁 Sử dụng dataset: {latest_file}")
         
         return self.load_txt_dataset(latest_file)
     
-    def preprocess_data(self, df):
+    def preprocess_data(self, df, backend=None):
         """Xử lý và tạo features từ data"""
+        if (backend or self.feature_backend) == 'numpy':
+            return build_features_numpy(df)
+        
         df = df.copy()
         
         # Handle missing values
@@ -122,19 +112,8 @@ class NFTPredictorFromTXT:
     
     def prepare_features(self, df):
         """Chuẩn bị features cho training"""
-        feature_columns = [
-            'floor_price_pct_change', 'floor_price_ma_7', 'floor_price_ma_30',
-            'floor_price_volatility', 'volume_pct_change', 'volume_ma_7', 
-            'volume_ratio', 'market_cap_pct_change', 'price_to_market_cap',
-            'day_of_week', 'month', 'day_of_month'
-        ]
-        
-        # Add lag features
-        for lag in [1, 3, 7]:
-            feature_columns.extend([
-                f'floor_price_lag_{lag}',
-                f'volume_lag_{lag}'
-            ])
+        # Danh sách cột (kể cả lag features) dùng chung với StreamingFeatureEngine
+        feature_columns = FEATURE_COLUMNS
         
         # Select only existing columns
         available_features = [col for col in feature_columns if col in df.columns]
@@ -144,22 +123,36 @@ class NFTPredictorFromTXT:
         
         return X, y, available_features
     
-    def train_model(self, X, y):
-        """Train AI model"""
+    def build_feature_engine(self, df, collection_id=None):
+        """Dựng StreamingFeatureEngine từ dataset để tính feature cho observation mới trong O(1)"""
+        return StreamingFeatureEngine.from_frame(df, collection_id)
+    
+    def train_model(self, X, y, horizon=None):
+        """Train AI model (horizon=H: một model multi-output cho target t+1 ... t+H)"""
         print("🤖 Đang train AI model...")
         
+        if horizon:
+            # Target dịch từ floor_price, bỏ H dòng cuối không đủ tương lai
+            y = make_horizon_targets(y, horizon)
+            X = X.iloc[:len(y)]
+            print(f"🎯 Multi-horizon: {horizon} bước, {len(y)} samples")
+        
         self.model = RandomForestRegressor(
             n_estimators=100,
             max_depth=10,
             random_state=42,
-            n_jobs=-1
+            n_jobs=self.n_jobs
         )
         
-        # Scale features
+        # Scale features (scaler mới: scaler đã load có thể đang dùng chung qua model_cache)
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
         # Train model
-        self.model.fit(X_scaled, y)
+        with limit_threads(self.n_jobs):
+            self.model.fit(X_scaled, y)
+        self.horizon = horizon
+        self.feature_names = list(X.columns)
         self.is_trained = True
         print("✅ AI model đã được train thành công!")
     
@@ -173,6 +166,10 @@ class NFTPredictorFromTXT:
     
     def evaluate_model(self, X_test, y_test):
         """Đánh giá model"""
+        if self.horizon:
+            y_test = make_horizon_targets(y_test, self.horizon)
+            X_test = X_test.iloc[:len(y_test)]
+        
         y_pred = self.predict(X_test)
         
         results = {
@@ -183,25 +180,25 @@ class NFTPredictorFromTXT:
         
         return results, y_pred
     
+    def forecast_state(self, df):
+        """State cửa sổ NumPy của observation cuối để forecast nhiều bước"""
+        return ForecastState.from_engine(self.build_feature_engine(df))
+    
+    def forecast_group(self, indices):
+        """(indices, predict_fn, columns, horizon) cho forecast_batch"""
+        return (indices, self.predict, self.feature_names or FEATURE_COLUMNS, self.horizon or 1)
+    
     def predict_future_prices(self, df, days_ahead=7):
         """Dự đoán giá tương lai"""
         if not self.is_trained:
             raise ValueError("Model chưa được train!")
         
-        future_predictions = []
-        last_row = df.iloc[-1:].copy()
-        
-        for day in range(days_ahead):
-            X_future, _, _ = self.prepare_features(last_row)
-            pred = self.predict(X_future)
-            future_predictions.append(pred[0])
-            
-            # Update last_row for next prediction
-            new_date = last_row['date'].iloc[0] + timedelta(days=1)
-            last_row['date'] = new_date
-            last_row['floor_price'] = pred[0]
+        # Cuộn cửa sổ NumPy: mỗi bước tính lại lag/MA/volatility từ giá vừa dự đoán.
+        # Model multi-horizon: một lần predict cho cả H ngày
+        state = self.forecast_state(df)
+        future_predictions = forecast_batch(state, [self.forecast_group([0])], [days_ahead])
         
-        return future_predictions
+        return future_predictions[0].tolist()
     
     def export_model(self, collection_id):
         """Export model và scaler thành file .pkl"""
@@ -209,38 +206,74 @@ class NFTPredictorFromTXT:
             raise ValueError("Model chưa được train!")
         
         # Tạo thư mục ai_models nếu chưa có
-        os.makedirs('ai_models', exist_ok=True)
+        os.makedirs(self.model_dir, exist_ok=True)
         
         # Export model và scaler
-        model_filename = f"ai_models/nft_model_{collection_id}.pkl"
-        scaler_filename = f"ai_models/nft_scaler_{collection_id}.pkl"
+        model_filename, scaler_filename, meta_filename = artifact_paths(self.model_dir, collection_id)
+        
+        # Ghi file tạm rồi rename: ai_api có thể đang load model của collection này
+        write_atomic(model_filename, lambda f: joblib.dump(self.model, f))
+        write_atomic(scaler_filename, lambda f: joblib.dump(self.scaler, f))
         
-        joblib.dump(self.model, model_filename)
-        joblib.dump(self.scaler, scaler_filename)
+        # Bản mảng phẳng để các worker API mmap chung (file .pkl vẫn giữ để download/tương thích)
+        model_format = None
+        if isinstance(self.model, RandomForestRegressor):
+            FlatForest.from_sklearn(self.model).save(forest_prefix(self.model_dir, collection_id))
+            model_format = FLAT_FOREST_FORMAT
+        
+        # Metadata để ai_api biết cách phục vụ model (horizon H, thứ tự features)
+        meta = {
+            'collection_id': collection_id,
+            'horizon': self.horizon,
+            'feature_names': self.feature_names,
+            'model_format': model_format,
+            'exported_at': datetime.now().isoformat()
+        }
+        write_atomic(meta_filename, lambda f: f.write(json.dumps(meta, indent=2).encode()))
         
         print(f"📦 Model exported: {model_filename}")
         print(f"📦 Scaler exported: {scaler_filename}")
+        print(f"📦 Metadata exported: {meta_filename}")
         
         return model_filename, scaler_filename
     
     def load_model(self, collection_id):
         """Load model và scaler từ file .pkl"""
-        model_filename = f"ai_models/nft_model_{collection_id}.pkl"
-        scaler_filename = f"ai_models/nft_scaler_{collection_id}.pkl"
+        if self.model_cache is not None:
+            return self.load_cached_model(collection_id)
+        
+        model_filename, scaler_filename, _ = artifact_paths(self.model_dir, collection_id)
         
         if not os.path.exists(model_filename) or not os.path.exists(scaler_filename):
             print(f"❌ Không tìm thấy model files cho {collection_id}")
             return False
         
-        self.model = joblib.load(model_filename)
-        self.scaler = joblib.load(scaler_filename)
-        self.is_trained = True
+        # RandomForest đã export dạng phẳng được mmap thay vì unpickle
+        self.use_artifacts(ModelArtifacts.load(self.model_dir, collection_id))
         
         print(f"✅ Loaded model: {model_filename}")
         print(f"✅ Loaded scaler: {scaler_filename}")
         
         return True
 
+    def load_cached_model(self, collection_id):
+        """Lấy model/scaler/metadata từ self.model_cache (chỉ load lại khi file đổi)"""
+        artifacts = self.model_cache.get(collection_id)
+        if artifacts is None:
+            print(f"❌ Không tìm thấy model files cho {collection_id}")
+            return False
+        
+        self.use_artifacts(artifacts)
+        return True
+
+    def use_artifacts(self, artifacts):
+        """Gán model/scaler/metadata đã load (ModelArtifacts)"""
+        self.model = artifacts.model
+        self.scaler = artifacts.scaler
+        self.horizon = artifacts.horizon
+        self.feature_names = artifacts.feature_names
+        self.is_trained = True
+
     def save_results(self, collection_id, results, future_predictions):
         """Lưu kết quả dự đoán"""
         output = {
@@ -257,15 +290,17 @@ class NFTPredictorFromTXT:
             ]
         }
         
-        filename = f"ai_predictions_{collection_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(filename, 'w') as f:
-            json.dump(output, f, indent=2)
+        filename = os.path.join(
+            self.results_dir, f"ai_predictions_{collection_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        # Ghi atomic: API đang phục vụ snapshot không đọc phải file dở dang
+        write_atomic(filename, lambda f: f.write(json.dumps(output, indent=2).encode('utf-8')))
         
         print(f"💾 Kết quả đã lưu: {filename}")
         return filename
     
-    def run_prediction_pipeline(self, collection_id):
-        """Chạy pipeline dự đoán từ TXT dataset"""
+    def run_prediction_pipeline(self, collection_id, horizon=None):
+        """Chạy pipeline dự đoán từ TXT dataset (horizon=H: train model multi-horizon)"""
         print(f"\n{'='*60}")
         print(f"🚀 DỰ ĐOÁN GIÁ NFT CHO: {collection_id.upper()}")
         print(f"{'='*60}")
@@ -298,7 +333,7 @@ class NFTPredictorFromTXT:
             
             # 5. Train model
             print("4️⃣ Đang train AI model...")
-            self.train_model(X_train, y_train)
+            self.train_model(X_train, y_train, horizon=horizon)
             
             # 6. Evaluate
             print("5️⃣ Đang đánh giá model...")
@@ -341,23 +376,70 @@ class NFTPredictorFromTXT:
             print(f"❌ Lỗi trong pipeline: {e}")
             return None
 
-def main():
+def predict_future_prices_batch(items):
+    """Forecast nhiều collection trong một lượt: items = [(predictor, df, days), ...]
+
+    State của các collection được xếp chồng thành một ma trận; mỗi model chỉ predict
+    một lần mỗi bước cho tất cả collection dùng model đó.
+    """
+    if not items:
+        return []
+    
+    for predictor, _, _ in items:
+        if not predictor.is_trained:
+            raise ValueError("Model chưa được train!")
+    
+    state = ForecastState.stack([predictor.forecast_state(df) for predictor, df, _ in items])
+    
+    # Gom các collection dùng chung model
+    groups = {}
+    for i, (predictor, _, _) in enumerate(items):
+        groups.setdefault(id(predictor.model), (predictor, []))[1].append(i)
+    
+    future_predictions = forecast_batch(
+        state,
+        [predictor.forecast_group(indices) for predictor, indices in groups.values()],
+        [days for _, _, days in items]
+    )
+    
+    return [future_predictions[i, :days].tolist() for i, (_, _, days) in enumerate(items)]
+
+def forecast_collections(horizons, predictor_factory=NFTPredictorFromTXT):
+    """Refresh forecast cho nhiều collection từ model đã export: horizons = {collection_id: days}"""
+    items = []
+    last_dates = {}
+    
+    for collection_id, days in horizons.items():
+        predictor = predictor_factory()
+        if not predictor.load_model(collection_id):
+            continue
+        df = predictor.get_latest_dataset(collection_id)
+        if df is None or df.empty:
+            continue
+        items.append((predictor, df, days))
+        last_dates[collection_id] = df['date'].max()
+    
+    collection_ids = [cid for cid in horizons if cid in last_dates]
+    predictions = predict_future_prices_batch(items)
+    
+    return {
+        collection_id: {
+            'last_date': last_dates[collection_id],
+            'predicted_prices': predictions[i]
+        }
+        for i, collection_id in enumerate(collection_ids)
+    }
+
+def main(workers=None):
     """Chạy dự đoán cho tất cả collections"""
     print("🤖 NFT PRICE PREDICTOR - ĐỌC TỪ TXT DATASET")
     print("="*60)
     
-    # Khởi tạo predictor
-    predictor = NFTPredictorFromTXT()
-    
     # Collections cần dự đoán
     collections = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
     
-    results_all = {}
-    
-    for collection in collections:
-        result = predictor.run_prediction_pipeline(collection)
-        if result:
-            results_all[collection] = result
+    # Mỗi collection chạy trên predictor riêng trong process pool (mặc định một worker / core)
+    results_all = run_collections(NFTPredictorFromTXT, 'run_prediction_pipeline', collections, workers=workers)
     
     print(f"\n🎉 HOÀN THÀNH! Đã dự đoán cho {len(results_all)} collections.")
     return results_all
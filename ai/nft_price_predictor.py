@@ -1,5 +1,4 @@
 
-import requests
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -15,6 +14,11 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
 import xgboost as xgb
 
+from coingecko_client import CoinGeckoClient, COINGECKO_API_URL, market_chart_frame
+from feature_engine import StreamingFeatureEngine, ForecastState, forecast_recursive
+from core_budget import TRAINING, limit_threads, thread_budget
+from parallel_runner import plan_workers, run_collections
+
 # Set style for plots
 plt.style.use('dark_background')
 sns.set_palette("husl")
@@ -22,8 +26,9 @@ sns.set_palette("husl")
 class NFTPricePredictor:
     def __init__(self, api_key="CG-1Tc5UJgmUByfTMibYyMMutVD"):
         self.api_key = api_key
-        self.base_url = "https://api.coingecko.com/api/v3"
-        self.headers = {"x-cg-demo-api-key": api_key}
+        self.base_url = COINGECKO_API_URL
+        # Shared fetch layer: pooled session + on-disk response cache (TTL, ETag revalidation, offline replay)
+        self.client = CoinGeckoClient(api_key, self.base_url)
         
         # Supported assets
         self.nft_collections = {
@@ -36,48 +41,28 @@ class NFTPricePredictor:
         self.models = {}
         self.scaler = StandardScaler()
         self.is_trained = False
+        # Training threads (RandomForest + XGBoost n_jobs, BLAS/OpenMP): AI_TRAINING_N_JOBS, else all cores;
+        # parallel_runner sets the worker's share
+        self.n_jobs = thread_budget(TRAINING)
         
     def fetch_nft_data(self, collection_id, days=90):
         """Fetch NFT market data from CoinGecko"""
         try:
-            url = f"{self.base_url}/nfts/{collection_id}/market_chart"
+            path = f"/nfts/{collection_id}/market_chart"
             params = {
                 'vs_currency': 'usd',
                 'days': days
             }
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.client.get(path, params=params)
             response.raise_for_status()
             
             data = response.json()
             
-            # Convert to DataFrame
-            df_list = []
-            
-            if 'floor_price_usd' in data and data['floor_price_usd']:
-                floor_prices = pd.DataFrame(data['floor_price_usd'], columns=['timestamp', 'floor_price'])
-                floor_prices['date'] = pd.to_datetime(floor_prices['timestamp'], unit='ms')
-                df_list.append(floor_prices[['date', 'floor_price']])
-            
-            if 'volume_usd' in data and data['volume_usd']:
-                volumes = pd.DataFrame(data['volume_usd'], columns=['timestamp', 'volume'])
-                volumes['date'] = pd.to_datetime(volumes['timestamp'], unit='ms')
-                if df_list:
-                    df_list[0] = df_list[0].merge(volumes[['date', 'volume']], on='date', how='outer')
-                else:
-                    df_list.append(volumes[['date', 'volume']])
+            # Align the three series on timestamp; missing points stay NaN
+            df = market_chart_frame(data)
             
-            if 'market_cap_usd' in data and data['market_cap_usd']:
-                market_caps = pd.DataFrame(data['market_cap_usd'], columns=['timestamp', 'market_cap'])
-                market_caps['date'] = pd.to_datetime(market_caps['timestamp'], unit='ms')
-                if df_list:
-                    df_list[0] = df_list[0].merge(market_caps[['date', 'market_cap']], on='date', how='outer')
-                else:
-                    df_list.append(market_caps[['date', 'market_cap']])
-            
-            if df_list:
-                df = df_list[0].sort_values('date').reset_index(drop=True)
-            else:
+            if df.empty:
                 # Fallback: create mock data for demo
                 dates = pd.date_range(start=datetime.now() - timedelta(days=days), 
                                     end=datetime.now(), freq='D')
@@ -190,7 +175,7 @@ class NFTPricePredictor:
                 n_estimators=100, 
                 max_depth=10, 
                 random_state=42,
-                n_jobs=-1
+                n_jobs=self.n_jobs
             ),
             'gradient_boosting': GradientBoostingRegressor(
                 n_estimators=100,
@@ -202,7 +187,8 @@ class NFTPricePredictor:
                 n_estimators=100,
                 max_depth=6,
                 learning_rate=0.1,
-                random_state=42
+                random_state=42,
+                n_jobs=self.n_jobs
             )
         }
         
@@ -210,9 +196,10 @@ class NFTPricePredictor:
         X_scaled = self.scaler.fit_transform(X)
         
         # Train models
-        for name, model in self.models.items():
-            print(f"Training {name}...")
-            model.fit(X_scaled, y)
+        with limit_threads(self.n_jobs):
+            for name, model in self.models.items():
+                print(f"Training {name}...")
+                model.fit(X_scaled, y)
         
         self.is_trained = True
         print("All models trained successfully!")
@@ -395,49 +382,35 @@ class NFTPricePredictor:
         if not self.is_trained:
             raise ValueError("Models not trained yet!")
         
-        future_predictions = []
-        last_row = df.iloc[-1:].copy()
-        
-        for day in range(days_ahead):
-            X_future, _, _ = self.prepare_features(last_row)
-            pred, _ = self.predict_ensemble(X_future)
-            
-            future_predictions.append(pred[0])
-            
-            # Update last_row for next prediction (simplified)
-            last_row['floor_price'] = pred[0]
-            last_row['date'] = last_row['date'] + timedelta(days=1)
-        
-        return future_predictions
+        # Roll a NumPy window forward so lag/MA/volatility features follow each prediction
+        _, _, feature_names = self.prepare_features(df.iloc[-1:])
+        engine = StreamingFeatureEngine.from_frame(df, columns=feature_names)
+        future_predictions = forecast_recursive(
+            ForecastState.from_engine(engine),
+            lambda X: self.predict_ensemble(X)[0],
+            feature_names,
+            days_ahead
+        )
+        
+        return future_predictions[0].tolist()
 
-def main():
+def main(workers=None):
     """Main function to demonstrate the pipeline"""
-    # Initialize predictor
-    predictor = NFTPricePredictor()
-    
     # Collections to analyze
     collections = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
     
-    # Run pipeline for each collection
-    results_all = {}
-    
-    for collection in collections:
-        print(f"\n{'='*50}")
-        print(f"ANALYZING {collection.upper()}")
-        print(f"{'='*50}")
-        
-        try:
-            results = predictor.run_pipeline(
-                collection_id=collection,
-                days=90,
-                save_data=True,
-                visualize=True
-            )
-            results_all[collection] = results
-            
-        except Exception as e:
-            print(f"Error analyzing {collection}: {e}")
-            continue
+    # Each collection runs on its own predictor in a process pool (one worker per core by default)
+    workers, _ = plan_workers(len(collections), workers)
+    results_all = run_collections(
+        NFTPricePredictor,
+        'run_pipeline',
+        collections,
+        workers=workers,
+        days=90,
+        save_data=True,
+        # plt.show() blocks, so only plot when running serially
+        visualize=workers == 1
+    )
     
     return results_all
 
@@ -1,5 +1,4 @@
 
-import requests
 import pandas as pd
 import numpy as np
 import json
@@ -13,11 +12,17 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
 
+from coingecko_client import CoinGeckoClient, COINGECKO_API_URL, market_chart_frame
+from feature_engine import StreamingFeatureEngine, ForecastState, forecast_recursive
+from core_budget import TRAINING, limit_threads, thread_budget
+from parallel_runner import run_collections
+
 class NFTPricePredictorOptimized:
     def __init__(self, api_key=None):
         self.api_key = api_key or "CG-1Tc5UJgmUByfTMibYyMMutVD"
-        self.base_url = "https://api.coingecko.com/api/v3"
-        self.headers = {"x-cg-demo-api-key": self.api_key} if self.api_key else {}
+        self.base_url = COINGECKO_API_URL
+        # Shared fetch layer: pooled session + on-disk response cache (TTL, ETag revalidation, offline replay)
+        self.client = CoinGeckoClient(self.api_key, self.base_url)
         
         # Supported assets
         self.nft_collections = {
@@ -30,6 +35,9 @@ class NFTPricePredictorOptimized:
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
+        # Training threads (RandomForest n_jobs + BLAS/OpenMP): AI_TRAINING_N_JOBS, else all cores;
+        # parallel_runner sets the worker's share
+        self.n_jobs = thread_budget(TRAINING)
         
     def create_mock_data(self, collection_id, days=90):
         """Create realistic mock data for demo purposes"""
@@ -70,13 +78,13 @@ class NFTPricePredictorOptimized:
         """Fetch NFT market data from CoinGecko with fallback to mock data"""
         try:
             print(f"Attempting to fetch real data for {collection_id}...")
-            url = f"{self.base_url}/nfts/{collection_id}/market_chart"
+            path = f"/nfts/{collection_id}/market_chart"
             params = {
                 'vs_currency': 'usd',
                 'days': days
             }
             
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self.client.get(path, params=params, timeout=10)
             
             if response.status_code == 401:
                 print("API key unauthorized, using mock data...")
@@ -85,24 +93,10 @@ class NFTPricePredictorOptimized:
             response.raise_for_status()
             data = response.json()
             
-            # Convert to DataFrame
-            df_list = []
-            
-            if 'floor_price_usd' in data and data['floor_price_usd']:
-                floor_prices = pd.DataFrame(data['floor_price_usd'], columns=['timestamp', 'floor_price'])
-                floor_prices['date'] = pd.to_datetime(floor_prices['timestamp'], unit='ms')
-                df_list.append(floor_prices[['date', 'floor_price']])
-            
-            if 'volume_usd' in data and data['volume_usd']:
-                volumes = pd.DataFrame(data['volume_usd'], columns=['timestamp', 'volume'])
-                volumes['date'] = pd.to_datetime(volumes['timestamp'], unit='ms')
-                if df_list:
-                    df_list[0] = df_list[0].merge(volumes[['date', 'volume']], on='date', how='outer')
-                else:
-                    df_list.append(volumes[['date', 'volume']])
+            # Align the three series on timestamp; missing points stay NaN
+            df = market_chart_frame(data)
             
-            if df_list:
-                df = df_list[0].sort_values('date').reset_index(drop=True)
+            if not df.empty:
                 df['collection_id'] = collection_id
                 print("Successfully fetched real data!")
                 return df
@@ -182,14 +176,15 @@ class NFTPricePredictorOptimized:
             n_estimators=50,  # Reduced from 100
             max_depth=8,      # Reduced from 10
             random_state=42,
-            n_jobs=-1
+            n_jobs=self.n_jobs
         )
         
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
         
         # Train model
-        self.model.fit(X_scaled, y)
+        with limit_threads(self.n_jobs):
+            self.model.fit(X_scaled, y)
         self.is_trained = True
         print("Model trained successfully!")
     
@@ -218,19 +213,14 @@ class NFTPricePredictorOptimized:
         if not self.is_trained:
             raise ValueError("Model not trained yet!")
         
-        future_predictions = []
-        last_row = df.iloc[-1:].copy()
-        
-        for day in range(days_ahead):
-            X_future, _, _ = self.prepare_features(last_row)
-            pred = self.predict(X_future)
-            future_predictions.append(pred[0])
-            
-            # Update last_row for next prediction
-            last_row['floor_price'] = pred[0]
-            last_row['date'] = last_row['date'] + timedelta(days=1)
+        # Roll a NumPy window forward so lag/MA/volatility features follow each prediction
+        _, _, feature_names = self.prepare_features(df.iloc[-1:])
+        engine = StreamingFeatureEngine.from_frame(df, columns=feature_names)
+        future_predictions = forecast_recursive(
+            ForecastState.from_engine(engine), self.predict, feature_names, days_ahead
+        )
         
-        return future_predictions
+        return future_predictions[0].tolist()
     
     def save_results(self, collection_id, results, future_predictions):
         """Save results to JSON file"""
@@ -322,30 +312,15 @@ class NFTPricePredictorOptimized:
             print(f"Error in pipeline: {e}")
             return None
 
-def main():
+def main(workers=None):
     """Main function - fast execution"""
     print("=== NFT PRICE PREDICTOR - OPTIMIZED VERSION ===")
     
-    # Initialize predictor
-    predictor = NFTPricePredictorOptimized()
-    
     # Collections to analyze
     collections = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
     
-    results_all = {}
-    
-    for collection in collections:
-        print(f"\n{'='*50}")
-        print(f"ANALYZING {collection.upper()}")
-        print(f"{'='*50}")
-        
-        try:
-            results = predictor.run_pipeline(collection_id=collection, days=90)
-            if results:
-                results_all[collection] = results
-        except Exception as e:
-            print(f"Error analyzing {collection}: {e}")
-            continue
+    # Each collection runs on its own predictor in a process pool (one worker per core by default)
+    results_all = run_collections(NFTPricePredictorOptimized, 'run_pipeline', collections, workers=workers, days=90)
     
     print(f"\n{'='*50}")
     print("ANALYSIS COMPLETE!")
@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from core_budget import limit_threads, total_cores
+
+
+def plan_workers(jobs, workers=None, cores=None):
+    """(số worker, số core mỗi worker): mặc định một worker / core, không nhiều hơn số job
+
+    Core (mặc định AI_CORES, xem core_budget) được chia đều để tổng số thread của mọi worker
+    không vượt quá số core.
+    """
+    cores = cores or total_cores()
+    workers = max(1, min(jobs, workers or cores))
+    return workers, max(1, cores // workers)
+
+
+def run_one(factory, method, collection_id, cores, kwargs):
+    """Chạy pipeline của một collection trên predictor riêng (model, scaler riêng), tối đa cores thread"""
+    predictor = factory()
+    # n_jobs của RandomForest + giới hạn thread BLAS/OpenMP theo phần core của worker
+    predictor.n_jobs = cores
+    with limit_threads(cores):
+        try:
+            return getattr(predictor, method)(collection_id, **kwargs)
+        except Exception as e:
+            print(f"❌ Lỗi khi chạy pipeline cho {collection_id}: {e}")
+            return None
+
+
+def run_collections(factory, method, collection_ids, workers=None, cores=None, **kwargs):
+    """Chạy factory().method(collection_id, **kwargs) cho từng collection trên process pool
+
+    Mỗi collection có predictor riêng tạo bởi factory (class hoặc hàm pickle được) trong worker,
+    kết quả gom lại thành {collection_id: kết quả} theo thứ tự collection_ids, bỏ qua
+    collection lỗi hoặc không có kết quả. Chỉ một worker thì chạy tuần tự ngay trong process.
+    """
+    workers, per_worker = plan_workers(len(collection_ids), workers, cores)
+    print(f"⚙️  {len(collection_ids)} collection: {workers} worker x {per_worker} core")
+
+    if workers == 1:
+        results = [run_one(factory, method, collection_id, per_worker, kwargs) for collection_id in collection_ids]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_one, factory, method, collection_id, per_worker, kwargs)
+                for collection_id in collection_ids
+            ]
+            results = [future.result() for future in futures]
+
+    return {collection_id: result for collection_id, result in zip(collection_ids, results) if result}
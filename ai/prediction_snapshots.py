@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from dataset_store import get_catalog
+
+# ai_predictions_<collection>_<YYYYmmdd_HHMMSS>.json do NFTPredictorFromTXT.save_results ghi ra
+PREDICTION_FILE_RE = re.compile(r'^ai_predictions_(?P<key>.+?)_(?P<version>\d{8}_\d{6})\.json$')
+
+
+def serialize(data):
+    """JSON bytes gọn (UTF-8, không escape tiếng Việt) dùng làm body response"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def strong_etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+class Snapshot:
+    """Snapshot dự đoán đã serialize sẵn của một collection"""
+
+    def __init__(self, collection_id, path, stamp, body):
+        self.collection_id = collection_id
+        self.path = path
+        self.stamp = stamp
+        self.body = body
+        self.etag = strong_etag(body)
+
+
+class PredictionSnapshots:
+    """Index snapshot dự đoán mới nhất của từng collection, serialize một lần và giữ trong memory
+
+    Mỗi lookup chỉ stat thư mục (qua FileCatalog) và file snapshot: file mới hoặc file bị ghi
+    lại thì đọc lại, không thì trả về bytes + ETag đã có.
+    """
+
+    def __init__(self, directories):
+        self.catalog = get_catalog(directories, PREDICTION_FILE_RE)
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._combined = None
+
+    def get(self, collection_id):
+        """Snapshot mới nhất của collection, None nếu chưa có file nào
+
+        File mới bị lỗi JSON (vd. đang ghi dở) thì giữ bản cũ; chưa có bản cũ thì raise ValueError.
+        """
+        path = self.catalog.latest(collection_id)
+        if path is None:
+            return None
+
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return self._snapshots.get(collection_id)
+        stamp = (st.st_size, st.st_mtime_ns)
+
+        cached = self._snapshots.get(collection_id)
+        if cached is not None and cached.path == path and cached.stamp == stamp:
+            return cached
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            if cached is not None:
+                return cached
+            raise ValueError(f"Failed to decode JSON for {collection_id}: {e}")
+
+        snapshot = Snapshot(collection_id, path, stamp, serialize(data))
+        with self._lock:
+            self._snapshots[collection_id] = snapshot
+        return snapshot
+
+    def get_all(self):
+        """(body, etag) của {collection_id: snapshot} cho mọi collection có snapshot
+
+        Body ghép từ bytes đã serialize của từng collection, chỉ dựng lại khi có snapshot đổi.
+        """
+        snapshots = []
+        for collection_id in self.catalog.keys():
+            try:
+                snapshot = self.get(collection_id)
+            except ValueError as e:
+                print(f"Error loading {collection_id}: {e}")
+                continue
+            if snapshot is not None:
+                snapshots.append(snapshot)
+
+        version = tuple((snapshot.collection_id, snapshot.etag) for snapshot in snapshots)
+        combined = self._combined
+        if combined is not None and combined[0] == version:
+            return combined[1], combined[2]
+
+        body = b'{' + b','.join(
+            serialize(snapshot.collection_id) + b':' + snapshot.body for snapshot in snapshots
+        ) + b'}'
+        etag = strong_etag(body)
+        with self._lock:
+            self._combined = (version, body, etag)
+        return body, etag
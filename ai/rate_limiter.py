@@ -0,0 +1,120 @@
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ giới hạn trong process
+    fcntl = None
+
+# Quota gói Demo CoinGecko: 30 request / phút
+DEFAULT_QUOTA = 30
+DEFAULT_PERIOD = 60.0
+# Tốc độ hồi token là (quota - burst) / period: burst càng lớn thì tốc độ đều càng thấp,
+# cron cào chạy đều đặn nên ưu tiên tốc độ đều
+DEFAULT_BURST = 1
+DEFAULT_STATE_PATH = os.environ.get(
+    'COINGECKO_RATE_STATE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'coingecko_rate.json')
+)
+
+# Backoff khi bị 429/5xx: full jitter, base * 2^attempt, tối đa BACKOFF_CAP giây
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+MAX_RETRIES = 5
+
+
+def retry_after_seconds(value):
+    """Header Retry-After (số giây hoặc HTTP-date) -> số giây, None nếu không đọc được"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Thời gian chờ lần thử lại thứ attempt (0, 1, ...): ngẫu nhiên trong [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateLimiter:
+    """Token bucket dùng chung giữa các process (và thread) qua một file state khoá bằng flock
+
+    Bucket chứa tối đa burst token, hồi lại (quota - burst) token mỗi period giây nên trong bất
+    kỳ cửa sổ period giây nào cũng không gửi quá quota request. block_for() (vd. theo
+    Retry-After) chặn mọi process dùng chung file state tới hết thời gian chờ.
+    """
+
+    def __init__(self, state_path=DEFAULT_STATE_PATH, quota=DEFAULT_QUOTA, period=DEFAULT_PERIOD, burst=DEFAULT_BURST):
+        self.state_path = state_path
+        self.quota = quota
+        self.period = period
+        self.burst = max(1, min(burst, quota - 1)) if quota > 1 else 1
+        self.refill_per_second = max(quota - self.burst, 1) / period
+        self._thread_lock = threading.Lock()
+
+    def _locked(self, update):
+        """Đọc state, update(state, now) -> (state mới, số giây phải chờ), ghi lại; tất cả trong flock"""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        with self._thread_lock, open(self.state_path, 'a+', encoding='utf-8') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+
+                now = time.time()
+                tokens = state.get('tokens', float(self.burst))
+                updated_at = state.get('updated_at', now)
+                state['tokens'] = min(float(self.burst), tokens + max(0.0, now - updated_at) * self.refill_per_second)
+                state['updated_at'] = now
+                state.setdefault('blocked_until', 0.0)
+
+                state, wait = update(state, now)
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return wait
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """Chờ tới khi lấy được một token (một request được phép gửi), trả về tổng số giây đã chờ"""
+        def take(state, now):
+            if now < state['blocked_until']:
+                return state, state['blocked_until'] - now
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return state, 0.0
+            return state, (1 - state['tokens']) / self.refill_per_second
+
+        waited = 0.0
+        while True:
+            wait = self._locked(take)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def block_for(self, seconds):
+        """Không process nào được gửi request trong seconds giây tới (vd. server trả Retry-After)"""
+        def block(state, now):
+            state['blocked_until'] = max(state['blocked_until'], now + seconds)
+            state['tokens'] = 0.0
+            return state, 0.0
+
+        self._locked(block)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các module trong ai/ import phẳng (from dataset_store import ...), giống khi chạy từ thư mục ai/
+sys.path.insert(0, AI_DIR)
+
+
+@pytest.fixture(scope='session')
+def ai_api():
+    """Module backend/ai_api.py (Flask app); import không train hay load model nào"""
+    sys.path.insert(0, os.path.join(os.path.dirname(AI_DIR), 'backend'))
+    import ai_api
+    return ai_api
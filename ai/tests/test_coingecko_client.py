@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coingecko_client import decode_market_chart, market_chart_frame
+
+DAY_MS = 86_400_000
+T0 = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+
+
+def test_series_are_joined_on_timestamp_union_with_nan_gaps():
+    data = {
+        # Không sắp xếp, thiếu ngày 3 và có giá trị null
+        'floor_price_usd': [[T0 + DAY_MS, 2.0], [T0, 1.0], [T0 + 3 * DAY_MS, None]],
+        'volume_usd': [[T0 + 2 * DAY_MS, 30.0], [T0, 10.0]],
+        'market_cap_usd': [[T0 + 3 * DAY_MS, 400.0]]
+    }
+    columns = decode_market_chart(data)
+
+    assert columns['date'].dtype == np.dtype('datetime64[ns]')
+    np.testing.assert_array_equal(columns['date'], np.arange('2024-01-01', '2024-01-05', dtype='datetime64[D]'))
+    np.testing.assert_array_equal(columns['floor_price'], [1.0, 2.0, np.nan, np.nan])
+    np.testing.assert_array_equal(columns['volume'], [10.0, np.nan, 30.0, np.nan])
+    np.testing.assert_array_equal(columns['market_cap'], [np.nan, np.nan, np.nan, 400.0])
+
+
+def test_missing_or_empty_series_become_all_nan():
+    columns = decode_market_chart({'floor_price_usd': [[T0, 1.5]], 'volume_usd': []})
+    assert len(columns['date']) == 1
+    assert columns['floor_price'].tolist() == [1.5]
+    assert np.isnan(columns['volume']).all() and np.isnan(columns['market_cap']).all()
+
+    empty = decode_market_chart({})
+    assert all(len(values) == 0 for values in empty.values())
+
+
+def test_matches_legacy_outer_merge():
+    data = {
+        'floor_price_usd': [[T0 + i * DAY_MS, float(i)] for i in range(0, 10, 2)],
+        'volume_usd': [[T0 + i * DAY_MS, 10.0 * i] for i in range(0, 10, 3)],
+        'market_cap_usd': [[T0 + i * DAY_MS, 100.0 * i] for i in range(1, 10, 4)]
+    }
+    merged = None
+    for key, col in zip(('floor_price_usd', 'volume_usd', 'market_cap_usd'), ('floor_price', 'volume', 'market_cap')):
+        frame = pd.DataFrame(data[key], columns=['timestamp', col])
+        merged = frame if merged is None else merged.merge(frame, on='timestamp', how='outer')
+    merged = merged.sort_values('timestamp').reset_index(drop=True)
+
+    df = market_chart_frame(data)
+    assert (df['date'] == pd.to_datetime(merged['timestamp'], unit='ms')).all()
+    for col in ('floor_price', 'volume', 'market_cap'):
+        np.testing.assert_array_equal(df[col].to_numpy(), merged[col].to_numpy())
+
+
+def test_malformed_point_is_rejected():
+    with pytest.raises(ValueError):
+        decode_market_chart({'floor_price_usd': [[T0, 1.0], [T0 + DAY_MS]]})
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_scraper
+from data_scraper import NFTDataScraper
+from dataset_store import frame_from_columns, read_txt_columns
+
+
+@pytest.fixture
+def scraper(tmp_path):
+    scraper = NFTDataScraper()
+    scraper.output_dir = str(tmp_path)
+    return scraper
+
+
+@pytest.mark.parametrize('mode', [{'append': True}, {'delta': True}])
+def test_failed_fetch_does_not_append_mock_rows(scraper, mode):
+    scraper.fetch_real_data = lambda collection_id, days: None
+    assert scraper.scrape_collection('azuki', 30, **mode) is None
+    assert os.listdir(scraper.output_dir) == []
+
+
+def test_failed_fetch_falls_back_to_mock_snapshot(scraper):
+    scraper.fetch_real_data = lambda collection_id, days: None
+    filename = scraper.scrape_collection('azuki', 30)
+    assert os.path.basename(filename).startswith('nft_data_azuki_')
+
+
+def test_append_writes_missing_values_as_empty_fields(scraper):
+    dates = pd.to_datetime(['2024-01-01', '2024-01-02'])
+    filename = scraper.append_to_txt('azuki', dates, np.array([1.5, np.nan]), np.array([np.nan, 11.0]), np.array([100.0, 110.0]))
+    with open(filename) as f:
+        assert f.read().splitlines()[-2:] == ['2024-01-01|1.500000||100.00', '2024-01-02||11.00|110.00']
+    df = frame_from_columns(read_txt_columns(filename))
+    assert np.isnan(df['volume'][0]) and np.isnan(df['floor_price'][1])
+
+
+def test_plan_delta_counts_days_in_utc(scraper):
+    today = datetime.now(timezone.utc).date()
+    with open(scraper.append_path('azuki'), 'w') as f:
+        f.write(f"{today - timedelta(days=20)}|1.0|1.00|1.00\n")
+    assert scraper.plan_delta('azuki', 90) == 21
+
+
+def test_append_overwrites_last_day_in_place(scraper):
+    first = pd.DatetimeIndex([pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-02 12:00')])
+    filename = scraper.append_to_txt('azuki', first, np.array([1.0, 2.0, 2.5]), np.ones(3), np.ones(3))
+    inode = os.stat(filename).st_ino
+
+    second = pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03'])
+    scraper.append_to_txt('azuki', second, np.array([9.0, 3.0, 4.0]), np.ones(3), np.ones(3))
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == '# NFT Dataset for azuki (append mode)'
+    assert [line for line in lines if not line.startswith('#')] == [
+        '2024-01-01|1.000000|1.00|1.00', '2024-01-02|3.000000|1.00|1.00', '2024-01-03|4.000000|1.00|1.00'
+    ]
+    # Chỉ nối thêm vào file cũ (O_APPEND), không copy cả file sang file mới
+    assert os.stat(filename).st_ino == inode
+    assert [name for name in os.listdir(scraper.output_dir) if name.startswith('.')] == []
+
+
+def test_plan_delta_copies_snapshot_atomically(scraper, monkeypatch):
+    snapshot = os.path.join(scraper.output_dir, 'nft_data_azuki_20240101_000000.txt')
+    with open(snapshot, 'w') as f:
+        f.write("# snapshot\n2024-01-01|1.000000|1.00|1.00\n")
+
+    copy = data_scraper.shutil.copyfileobj
+    def checked_copy(src, dst):
+        # File append chưa được lộ ra khi đang copy
+        assert not os.path.exists(scraper.append_path('azuki'))
+        copy(src, dst)
+    monkeypatch.setattr(data_scraper.shutil, 'copyfileobj', checked_copy)
+
+    scraper.plan_delta('azuki', 90)
+    with open(scraper.append_path('azuki')) as f, open(snapshot) as g:
+        assert f.read() == g.read()
+    assert [name for name in os.listdir(scraper.output_dir) if name.startswith('.')] == []
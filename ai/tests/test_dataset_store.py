@@ -0,0 +1,195 @@
+import io
+import os
+import stat
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_store
+from dataset_store import DATASET_FILE_RE, FileCatalog, frame_from_columns, format_rows, load_dataset_columns, read_txt_columns, write_atomic, write_dataset
+
+
+def legacy_parse(text):
+    """Loader TXT cũ (loop từng dòng): dòng comment / trống / sai số trường bị bỏ qua"""
+    data = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#') or not line:
+            continue
+        parts = line.split('|')
+        if len(parts) == 4:
+            data.append({
+                'date': pd.to_datetime(parts[0]),
+                'floor_price': float(parts[1]),
+                'volume': float(parts[2]),
+                'market_cap': float(parts[3])
+            })
+    df = pd.DataFrame(data, columns=['date', 'floor_price', 'volume', 'market_cap'])
+    return df.sort_values('date').reset_index(drop=True)
+
+
+def parse(text):
+    return frame_from_columns(read_txt_columns(io.BytesIO(text.encode('utf-8'))))
+
+
+HEADER = "# NFT Dataset\n# Format: DATE|FLOOR_PRICE_USD|VOLUME_USD|MARKET_CAP_USD\n#" + "=" * 60 + "\n"
+
+CASES = {
+    'clean': HEADER + "2024-01-01|1.5|10.00|100.00\n2024-01-02|1.6|11.00|110.00\n",
+    'three_fields': HEADER + "2024-01-01|1.5|10|100\n2024-01-02|1.6|11\n2024-01-03|1.7|12|120\n",
+    'five_fields': HEADER + "2024-01-01|1.5|10|100\n2024-01-02|1.6|11|110|999\n2024-01-03|1.7|12|120\n",
+    'five_fields_first': HEADER + "2024-01-01|1.5|10|100|999\n2024-01-02|1.6|11|110\n",
+    'indented_comment': HEADER + "2024-01-01|1.5|10|100\n   # comment\n\t# tab comment\n2024-01-03|1.7|12|120\n",
+    'blank_lines': HEADER + "\n2024-01-01|1.5|10|100\n\n   \n2024-01-03|1.7|12|120\n",
+    'no_trailing_newline': HEADER + "2024-01-01|1.5|10|100\n2024-01-03|1.7|12|120",
+    'crlf': (HEADER + "2024-01-01|1.5|10|100\n2024-01-03|1.7|12|120\n").replace('\n', '\r\n'),
+    'nan_literal': HEADER + "2024-01-01|nan|10|100\n2024-01-02|1.6|nan|110\n",
+    'unsorted_with_time': HEADER + "2024-01-02 12:00:00|1.6|11|110\n2024-01-01 00:00:00|1.5|10|100\n",
+    'spaces_around_fields': HEADER + "2024-01-01 | 1.5 | 10 | 100\n 2024-01-02 |1.6|11|110 \n",
+    'utc_z': HEADER + "2024-01-01T00:00:00Z|1.5|10|100\n2024-01-02T06:00:00Z|1.6|11|110\n",
+    'fixed_offset': HEADER + "2024-01-01T00:00:00+07:00|1.5|10|100\n2024-01-02T00:00:00+07:00|1.6|11|110\n",
+    'only_header': HEADER,
+    'empty': "",
+}
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_matches_legacy_parser(name):
+    pd.testing.assert_frame_equal(parse(CASES[name]), legacy_parse(CASES[name]), check_dtype=False)
+
+
+def test_empty_fields_are_nan():
+    df = parse(HEADER + "2024-01-01||10|100\n2024-01-02|1.6|11|\n")
+    assert len(df) == 2
+    assert np.isnan(df['floor_price'][0]) and np.isnan(df['market_cap'][1])
+    assert df['volume'].tolist() == [10.0, 11.0]
+
+
+def test_missing_values_round_trip_as_empty_fields(tmp_path):
+    path = str(tmp_path / 'nft_data_x.txt')
+    nan = np.nan
+    write_dataset(path, pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03']),
+                  [1.5, nan, nan], [10.0, 11.0, nan], [nan, 110.0, nan])
+    with open(path) as f:
+        assert f.read() == "2024-01-01|1.500000|10.00|\n2024-01-02||11.00|110.00\n2024-01-03|||\n"
+    df = frame_from_columns(read_txt_columns(path))
+    np.testing.assert_array_equal(df['floor_price'], [1.5, nan, nan])
+    np.testing.assert_array_equal(df['market_cap'], [nan, 110.0, nan])
+
+
+def test_format_rows_matches_python_format():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    values = [rng.uniform(0, 100, n), rng.lognormal(8, 3, n), rng.uniform(1e5, 1e12, n)]
+    edge = [0.0, -0.0, -1e-9, 0.125, 0.375, 5e-7, 1.5e-6, 0.995, 1.005, 2.675, -3.25, 9.1e15, 1e16, 1e20, np.inf, -np.inf, np.nan]
+    for column in values:
+        column[:len(edge)] = edge
+        edge = edge[1:] + edge[:1]
+    dates = pd.date_range('1700-01-01', periods=n, freq='17h')
+
+    days = np.datetime_as_string(dates.to_numpy().astype('datetime64[D]'), unit='D').tolist()
+    expected = ''.join(map('{}|{:.6f}|{:.2f}|{:.2f}\n'.format, days, *(v.tolist() for v in values)))
+    assert format_rows(dates, *values) == expected.replace('|nan', '|').encode('ascii')
+    assert format_rows([], [], [], []) == b''
+
+
+def test_unparseable_date_drops_only_that_row():
+    df = parse(HEADER + "2024-01-01|1.5|10|100\ngarbage|1|2|3\n2024-01-03|1.7|12|120\n")
+    assert df['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-01', '2024-01-03']
+
+
+def test_sidecar_resume_after_malformed_last_line(tmp_path):
+    path = tmp_path / 'nft_data_test.txt'
+    path.write_text(HEADER + "2024-01-01|1.5|10|100\n2024-01-02|1.6|11\n")
+    assert len(load_dataset_columns(str(path))['date']) == 1
+
+    # Append sau một dòng hỏng: sidecar resume không được bỏ mất row hợp lệ
+    with open(path, 'a') as f:
+        f.write("2024-01-03|1.7|12|120\n")
+    cached = load_dataset_columns(str(path))
+    parsed = read_txt_columns(str(path))
+    for col, values in parsed.items():
+        np.testing.assert_array_equal(cached[col], values)
+    assert len(parsed['date']) == 2
+
+
+def test_sidecar_resume_rejects_in_place_edit(tmp_path):
+    path = tmp_path / 'nft_data_test.txt'
+    path.write_text(HEADER + ''.join(f"2024-01-0{day}|{day}.000000|10.00|100.00\n" for day in range(1, 6)))
+    load_dataset_columns(str(path))
+
+    # Sửa dòng đầu tại chỗ (cùng inode, cùng độ dài) rồi append thêm: không được dùng mảng cũ
+    with open(path, 'r+b') as f:
+        data = f.read()
+        f.seek(data.index(b'1.000000'))
+        f.write(b'9.000000')
+        f.seek(0, os.SEEK_END)
+        f.write(b"2024-01-06|6.000000|10.00|100.00\n")
+    assert load_dataset_columns(str(path))['floor_price'].tolist() == [9.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_sidecar_resume_parses_only_appended_rows(tmp_path, monkeypatch):
+    path = tmp_path / 'nft_data_test.txt'
+    path.write_text(HEADER + "2024-01-01|1.0|10|100\n2024-01-02|2.0|11|110\n")
+    load_dataset_columns(str(path))
+    with open(path, 'a') as f:
+        f.write("2024-01-03|3.0|12|120\n")
+
+    parsed_rows = []
+    parse = dataset_store.read_txt_columns
+    monkeypatch.setattr(dataset_store, 'read_txt_columns', lambda source: parsed_rows.append(source.getvalue()) or parse(source))
+    assert load_dataset_columns(str(path))['floor_price'].tolist() == [1.0, 2.0, 3.0]
+    # Chỉ parse lại dòng cuối cũ + phần mới
+    assert parsed_rows[0] == b"2024-01-02|2.0|11|110\n2024-01-03|3.0|12|120\n"
+
+
+@pytest.mark.parametrize('name', ['utc_z', 'fixed_offset', 'spaces_around_fields'])
+def test_sidecar_matches_legacy_parser(tmp_path, name):
+    path = tmp_path / 'nft_data_test.txt'
+    path.write_text(CASES[name])
+    expected = legacy_parse(CASES[name])
+    # Lần đầu parse, lần sau đọc sidecar, rồi resume sau khi append cùng định dạng
+    for _ in range(2):
+        pd.testing.assert_frame_equal(frame_from_columns(load_dataset_columns(str(path))), expected, check_dtype=False)
+    last_line = CASES[name].splitlines()[-1]
+    with open(path, 'a') as f:
+        f.write(last_line.replace('2024-01-02', '2024-01-03') + '\n')
+    pd.testing.assert_frame_equal(
+        frame_from_columns(load_dataset_columns(str(path))), legacy_parse(path.read_text()), check_dtype=False
+    )
+
+
+def test_write_atomic_file_mode(tmp_path):
+    # File mới có quyền như file tạo bằng open() (theo umask), file ghi đè giữ quyền cũ
+    reference = tmp_path / 'reference.bin'
+    reference.write_bytes(b'')
+    path = tmp_path / 'artifact.bin'
+    write_atomic(str(path), lambda f: f.write(b'a'))
+    assert stat.S_IMODE(os.stat(path).st_mode) == stat.S_IMODE(os.stat(reference).st_mode)
+    os.remove(reference)
+
+    os.chmod(path, 0o640)
+    write_atomic(str(path), lambda f: f.write(b'b'))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert path.read_bytes() == b'b'
+    assert sorted(os.listdir(tmp_path)) == ['artifact.bin']
+
+
+def test_catalog_sees_append_file_mtime(tmp_path):
+    snapshot = tmp_path / 'nft_data_azuki_20250101_000000.txt'
+    append = tmp_path / 'nft_data_azuki.txt'
+    snapshot.write_text(HEADER)
+    append.write_text(HEADER)
+    os.utime(append, (0, 0))
+    # Thư mục có mtime cũ (không racy) để catalog không scan lại thư mục
+    os.utime(tmp_path, (0, 0))
+
+    catalog = FileCatalog([str(tmp_path)], DATASET_FILE_RE)
+    assert catalog.latest('azuki') == str(snapshot)
+
+    # Ghi nối tại chỗ: mtime thư mục không đổi nhưng file append giờ là bản mới nhất
+    with open(append, 'a') as f:
+        f.write("2025-06-01|1|2|3\n")
+    os.utime(tmp_path, (0, 0))
+    assert catalog.latest('azuki') == str(append)
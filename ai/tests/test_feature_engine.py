@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engine import FEATURE_COLUMNS, RollingWindow, StreamingFeatureEngine, build_features_numpy
+from nft_predictor_from_txt import NFTPredictorFromTXT
+
+
+def make_frame(rows, freq='D', seed=42):
+    """DataFrame cùng format với load_txt_dataset (date, floor_price, volume, market_cap)"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=rows, freq=freq),
+        'floor_price': np.abs(50 + np.cumsum(rng.normal(0, 0.5, rows))) + 1,
+        'volume': rng.lognormal(8, 1, rows),
+        'market_cap': rng.uniform(1e5, 1e6, rows)
+    })
+
+
+def pandas_features(df):
+    return NFTPredictorFromTXT().preprocess_data(df, backend='pandas')
+
+
+def assert_same_features(df, rtol=1e-9, atol=1e-9):
+    expected = pandas_features(df)
+    actual = build_features_numpy(df)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=rtol, atol=atol)
+    return actual, expected
+
+
+# Cửa sổ 7 / 30 và lag 1 / 3 / 7: kiểm tra quanh các mốc đó
+@pytest.mark.parametrize('rows', [1, 2, 3, 4, 6, 7, 8, 29, 30, 31, 500])
+def test_short_series(rows):
+    assert_same_features(make_frame(rows, seed=rows))
+
+
+def test_hourly_dates():
+    assert_same_features(make_frame(2000, freq='h'))
+
+
+def test_nan_and_zero_values():
+    df = make_frame(300)
+    df.loc[[0, 1], 'floor_price'] = np.nan
+    df.loc[[0, 5, 6, 100], 'volume'] = np.nan
+    df.loc[[298, 299], 'market_cap'] = np.nan
+    df.loc[[60, 61], 'volume'] = 0.0
+    df.loc[50:52, 'market_cap'] = 0.0
+    df['collection_id'] = 'test'
+    actual, _ = assert_same_features(df)
+    assert not actual[FEATURE_COLUMNS].isna().any().any()
+
+
+def test_all_nan_column():
+    df = make_frame(40)
+    df['volume'] = np.nan
+    assert_same_features(df)
+
+
+@pytest.mark.parametrize('rows', [1, 2, 7, 8, 100])
+def test_constant_series(rows):
+    df = make_frame(rows)
+    df['floor_price'] = 2.5
+    df['volume'] = 1000.0
+    df['market_cap'] = 1e6
+    actual, _ = assert_same_features(df)
+    assert (actual['floor_price_volatility'] == 0).all()
+    assert (actual['floor_price_pct_change'] == 0).all()
+    assert (actual['volume_ratio'] == 1).all()
+
+
+def test_non_contiguous_index():
+    df = make_frame(200).sample(frac=1.0, random_state=1).sort_values('date')
+    actual, _ = assert_same_features(df)
+    pd.testing.assert_index_equal(actual.index, df.index)
+
+
+def test_rerun_on_existing_feature_columns():
+    df = make_frame(100)
+    actual, expected = assert_same_features(df)
+    pd.testing.assert_frame_equal(
+        build_features_numpy(actual), pandas_features(expected), check_exact=False, rtol=1e-9, atol=1e-9
+    )
+
+
+def test_long_series():
+    # rolling().std() của pandas cộng/trừ dần nên sai số tích lũy trên chuỗi dài,
+    # NumPy tính lại từng cửa sổ: chỉ khớp trong sai số nới rộng
+    assert_same_features(make_frame(200_000, freq='min'), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize('rows', [1, 8, 31, 120])
+def test_streaming_engine_matches_pandas_on_every_prefix(rows):
+    df = make_frame(rows, seed=rows)
+    if rows > 10:
+        df.loc[[5, 9], 'volume'] = np.nan
+        df.loc[7, 'floor_price'] = np.nan
+    predictor = NFTPredictorFromTXT()
+
+    engine = StreamingFeatureEngine()
+    for i, row in enumerate(df.itertuples(index=False)):
+        streamed = engine.update(row.date, row.floor_price, row.volume, row.market_cap)[0]
+        X, _, _ = predictor.prepare_features(pandas_features(df.iloc[:i + 1]))
+        np.testing.assert_allclose(streamed, X.iloc[-1].to_numpy(dtype=np.float64), rtol=1e-9, atol=1e-9)
+
+    # Dựng lại từ dataset (LONG_WINDOW dòng cuối) ra cùng state
+    np.testing.assert_allclose(StreamingFeatureEngine.from_frame(df).vector(), engine.vector(), rtol=1e-9, atol=1e-9)
+
+
+def test_rolling_window_stays_exact_over_many_pushes():
+    rng = np.random.default_rng(0)
+    values = 1e6 + rng.normal(0, 1, 10_000)
+    window = RollingWindow(7)
+    for x in values:
+        window.push(x)
+    np.testing.assert_array_equal(window.values(), values[-7:])
+    assert window.get(0) == values[-1] and window.get(6) == values[-7] and np.isnan(window.get(7))
+    assert window.mean == pytest.approx(values[-7:].mean(), rel=1e-12)
+    assert window.std() == pytest.approx(values[-7:].std(ddof=1), rel=1e-6)
+
+
+def test_engine_without_observations_raises():
+    with pytest.raises(ValueError):
+        StreamingFeatureEngine().vector()
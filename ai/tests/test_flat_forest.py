@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from flat_forest import FlatForest, forest_path
+
+
+@pytest.mark.parametrize('n_outputs', [1, 3])
+def test_predict_matches_sklearn_after_reload(tmp_path, n_outputs):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 5))
+    y = X[:, :n_outputs] * 2 + rng.normal(0, 0.1, size=(300, n_outputs))
+    model = RandomForestRegressor(n_estimators=7, max_depth=6, random_state=0)
+    model.fit(X, y[:, 0] if n_outputs == 1 else y)
+
+    prefix = str(tmp_path / 'forest')
+    FlatForest.from_sklearn(model).save(prefix)
+    forest = FlatForest.load(prefix)
+
+    assert isinstance(forest.nodes, np.memmap)
+    assert forest.n_estimators == 7
+    X_test = rng.normal(size=(50, 5))
+    np.testing.assert_allclose(forest.predict(X_test), model.predict(X_test), rtol=1e-12)
+    np.testing.assert_allclose(FlatForest.load(prefix, mmap_mode=None).predict(X_test), model.predict(X_test), rtol=1e-12)
+
+
+def test_save_leaves_no_temp_files(tmp_path):
+    model = RandomForestRegressor(n_estimators=2, random_state=0).fit(np.arange(20.0).reshape(10, 2), np.arange(10.0))
+    FlatForest.from_sklearn(model).save(str(tmp_path / 'forest'))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [forest_path('forest')]
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engine import FEATURE_COLUMNS, ForecastState, StreamingFeatureEngine, forecast_recursive, make_horizon_targets
+from nft_predictor_from_txt import NFTPredictorFromTXT, predict_future_prices_batch
+
+MA_7 = FEATURE_COLUMNS.index('floor_price_ma_7')
+LAG_1 = FEATURE_COLUMNS.index('floor_price_lag_1')
+LAG_7 = FEATURE_COLUMNS.index('floor_price_lag_7')
+DAY_OF_WEEK = FEATURE_COLUMNS.index('day_of_week')
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=rows, freq='D'),
+        'floor_price': 50 + np.cumsum(rng.normal(0, 0.5, rows)),
+        'volume': rng.lognormal(8, 1, rows),
+        'market_cap': rng.uniform(1e5, 1e6, rows)
+    })
+
+
+def linear_model(X):
+    """Model giả dùng MA, lag và ngày trong tuần: sai một feature là lệch kết quả"""
+    return 0.4 * X[:, MA_7] + 0.4 * X[:, LAG_1] + 0.2 * X[:, LAG_7] + 0.1 * X[:, DAY_OF_WEEK]
+
+
+def reference_forecast(df, predict_fn, steps):
+    """Vòng forecast bằng pandas: nối dòng dự đoán vào DataFrame rồi tính lại toàn bộ feature"""
+    predictor = NFTPredictorFromTXT()
+    predictions = []
+    for _ in range(steps):
+        X, _, _ = predictor.prepare_features(predictor.preprocess_data(df, backend='pandas'))
+        pred = float(np.ravel(predict_fn(X.iloc[-1:].to_numpy(dtype=np.float64)))[0])
+        predictions.append(pred)
+        last = df.iloc[-1]
+        df = pd.concat([df, pd.DataFrame({
+            'date': [last['date'] + pd.Timedelta(days=1)],
+            'floor_price': [pred],
+            # Volume giữ nguyên, market cap theo cùng tỉ lệ với floor price
+            'volume': [last['volume']],
+            'market_cap': [last['market_cap'] * pred / last['floor_price']]
+        })], ignore_index=True)
+    return predictions
+
+
+@pytest.mark.parametrize('rows', [3, 40])
+def test_recursive_forecast_updates_lag_and_ma_features(rows):
+    df = make_frame(rows)
+    state = ForecastState.from_engine(StreamingFeatureEngine.from_frame(df))
+    forecast = forecast_recursive(state, linear_model, FEATURE_COLUMNS, 10)
+    np.testing.assert_allclose(forecast[0], reference_forecast(df, linear_model, 10), rtol=1e-9)
+
+
+def test_predict_future_prices_matches_pandas_loop():
+    df = make_frame(120, seed=1)
+    predictor = NFTPredictorFromTXT()
+    X, y, _ = predictor.prepare_features(predictor.preprocess_data(df))
+    predictor.train_model(X, y)
+
+    forecast = predictor.predict_future_prices(df, days_ahead=14)
+    assert len(forecast) == 14
+    np.testing.assert_allclose(forecast, reference_forecast(df, predictor.predict, 14), rtol=1e-9)
+
+
+def test_horizon_targets_shift_floor_price():
+    targets = make_horizon_targets(pd.Series([1.0, 2.0, 3.0, 4.0, 5.0]), 2)
+    assert list(targets.columns) == ['floor_price_t+1', 'floor_price_t+2']
+    assert targets.to_numpy().tolist() == [[2.0, 3.0], [3.0, 4.0], [4.0, 5.0]]
+
+
+@pytest.mark.parametrize('days, calls', [(7, 1), (10, 2), (3, 1)])
+def test_multi_horizon_forecast_predicts_once_per_block(days, calls):
+    df = make_frame(120, seed=2)
+    predictor = NFTPredictorFromTXT()
+    X, y, _ = predictor.prepare_features(predictor.preprocess_data(df))
+    predictor.train_model(X, y, horizon=7)
+
+    predict = predictor.predict
+    seen = []
+    predictor.predict = lambda features: seen.append(len(features)) or predict(features)
+    forecast = predictor.predict_future_prices(df, days_ahead=days)
+
+    assert len(forecast) == days and len(seen) == calls
+    # 7 ngày đầu là đúng một hàng output của model trên feature của dòng cuối
+    np.testing.assert_allclose(forecast[:7], predict(X.iloc[-1:])[0][:days], rtol=1e-12)
+
+
+def trained(df, horizon=None):
+    predictor = NFTPredictorFromTXT()
+    X, y, _ = predictor.prepare_features(predictor.preprocess_data(df))
+    predictor.train_model(X, y, horizon=horizon)
+    return predictor
+
+
+def test_batch_forecast_matches_single_forecasts():
+    frames = [make_frame(80, seed=3), make_frame(50, seed=4), make_frame(60, seed=5)]
+    shared = trained(frames[0])
+    # Collection thứ hai dùng chung model với collection đầu, thứ ba có model multi-horizon riêng
+    other = NFTPredictorFromTXT()
+    other.model, other.scaler, other.is_trained = shared.model, shared.scaler, True
+    direct = trained(frames[2], horizon=3)
+    items = [(shared, frames[0], 5), (other, frames[1], 9), (direct, frames[2], 4)]
+    expected = [predictor.predict_future_prices(df, days_ahead=days) for predictor, df, days in items]
+
+    predict = shared.predict
+    rows = []
+    shared.predict = lambda features: rows.append(len(features)) or predict(features)
+    results = predict_future_prices_batch(items)
+
+    for actual, single in zip(results, expected):
+        np.testing.assert_allclose(actual, single, rtol=1e-12)
+    # Model dùng chung: một lần predict mỗi bước cho mọi collection còn cần dự đoán
+    assert rows == [2] * 5 + [1] * 4
+    assert predict_future_prices_batch([]) == []
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+import forecast_cache
+from dataset_store import append_dataset
+from forecast_cache import ForecastCache, dataset_fingerprint, model_fingerprint
+from model_store import artifact_paths, write_atomic
+
+
+def export(model_dir, collection_id, payload):
+    """Ghi model/scaler như export_model: file tạm rồi rename nên inode đổi mỗi lần"""
+    for path in artifact_paths(model_dir, collection_id)[:2]:
+        write_atomic(path, lambda f: f.write(payload))
+
+
+def key(tmp_path, collection_id='azuki', days=7):
+    return (collection_id, days, dataset_fingerprint([str(tmp_path)], collection_id),
+            model_fingerprint(str(tmp_path), collection_id))
+
+
+def test_fingerprints_are_none_without_dataset_or_model(tmp_path):
+    assert dataset_fingerprint([str(tmp_path)], 'azuki') is None
+    assert model_fingerprint(str(tmp_path), 'azuki') is None
+
+
+def test_forecast_is_recomputed_after_dataset_append(tmp_path):
+    dataset = tmp_path / 'nft_data_azuki.txt'
+    dataset.write_text('2024-01-01|1.000000|1.00|1.00\n')
+    export(str(tmp_path), 'azuki', b'model-1')
+    cache = ForecastCache()
+    first = key(tmp_path)
+    cache.put(first, [1.0])
+    assert cache.get(key(tmp_path)) == [1.0]
+
+    append_dataset(str(dataset), pd.to_datetime(['2024-01-02']), np.array([2.0]), np.ones(1), np.ones(1))
+    second = key(tmp_path)
+    assert second != first
+    assert cache.get(second) is None
+
+
+def test_forecast_is_recomputed_after_model_export(tmp_path):
+    (tmp_path / 'nft_data_azuki.txt').write_text('2024-01-01|1.000000|1.00|1.00\n')
+    export(str(tmp_path), 'azuki', b'model-1')
+    cache = ForecastCache()
+    first = key(tmp_path)
+    cache.put(first, [1.0])
+
+    # Cùng nội dung, cùng size: chỉ inode của file rename vào là khác
+    export(str(tmp_path), 'azuki', b'model-1')
+    assert key(tmp_path) != first
+    assert cache.get(key(tmp_path)) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(forecast_cache.time, 'monotonic', lambda: now[0])
+    cache = ForecastCache(ttl=10)
+    cache.put(('azuki', 7), [1.0])
+    now[0] += 9.9
+    assert cache.get(('azuki', 7)) == [1.0]
+    now[0] += 0.1
+    assert cache.get(('azuki', 7)) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['size']) == (1, 1, 1, 0)
+
+
+def test_lru_eviction_and_invalidate():
+    cache = ForecastCache(max_size=2)
+    cache.put(('a', 7), 1)
+    cache.put(('b', 7), 2)
+    cache.get(('a', 7))
+    cache.put(('c', 7), 3)
+    assert cache.get(('b', 7)) is None
+    assert cache.stats()['evictions'] == 1
+
+    cache.put(('a', 14), 4)
+    cache.invalidate('a')
+    assert cache.get(('a', 14)) is None and cache.get(('c', 7)) == 3
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pytest
+
+from history_stream import JSON, iter_rows, parse_bound, slice_range
+
+ROWS = [
+    '2024-01-03|3.000000|30.00|300.00',
+    '2024-01-01|1.000000|10.00|100.00',
+    '2024-01-02|2.000000||200.00',
+    '2024-01-04|4.000000|40.00|400.00',
+    '2024-01-05|5.000000|50.00|500.00',
+]
+
+
+@pytest.fixture
+def client(ai_api, tmp_path, monkeypatch):
+    # Dataset chưa sort theo ngày: load_history phải sort trước khi cắt khoảng
+    (tmp_path / 'nft_data_azuki.txt').write_text('# header\n' + '\n'.join(ROWS) + '\n')
+    monkeypatch.setattr(ai_api, 'DATASET_DIRS', [str(tmp_path)])
+    return ai_api.app.test_client()
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_slice_range_is_inclusive_and_pages_by_limit():
+    dates = np.array(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'], dtype='datetime64[ns]')
+    assert slice_range(dates) == (0, 4, None)
+    assert slice_range(dates, parse_bound('2024-01-02'), parse_bound('2024-01-03')) == (1, 3, None)
+    assert slice_range(dates, parse_bound('2024-01-02'), limit=2) == (1, 3, 3)
+    assert slice_range(dates, parse_bound('2024-02-01')) == (4, 4, None)
+    assert slice_range(dates, parse_bound('2024-01-03'), parse_bound('2024-01-02')) == (2, 2, None)
+
+
+def test_iter_rows_chunks_join_into_one_json_array():
+    columns = {'date': np.arange('2024-01-01', '2024-01-06', dtype='datetime64[D]').astype('datetime64[ns]'),
+               'floor_price': np.array([1.0, np.nan, 3.0, 4.0, 5.0])}
+    body = b''.join(iter_rows(columns, 0, 5, ['floor_price'], fmt=JSON, chunk_rows=2))
+    rows = json.loads(body)
+    assert [row['date'] for row in rows] == [f'2024-01-0{i}T00:00:00' for i in range(1, 6)]
+    assert [row['floor_price'] for row in rows] == [1.0, None, 3.0, 4.0, 5.0]
+    assert b''.join(iter_rows(columns, 2, 2, ['floor_price'], fmt=JSON)) == b'[]'
+
+
+def test_history_window_and_headers(client):
+    response = client.get('/history/azuki?from=2024-01-02&to=2024-01-04&fields=floor_price,volume')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert ndjson(response) == [
+        {'date': '2024-01-02T00:00:00', 'floor_price': 2.0, 'volume': None},
+        {'date': '2024-01-03T00:00:00', 'floor_price': 3.0, 'volume': 30.0},
+        {'date': '2024-01-04T00:00:00', 'floor_price': 4.0, 'volume': 40.0},
+    ]
+    assert (response.headers['X-Row-Count'], response.headers['X-Range-Rows']) == ('3', '3')
+    assert 'X-Next-From' not in response.headers
+
+
+def test_history_pages_with_limit_and_next_from(client):
+    dates, url = [], '/history/azuki?from=2024-01-02&limit=2&fields=floor_price'
+    while True:
+        response = client.get(url)
+        assert response.headers['X-Range-Rows'] == str(4 - len(dates))
+        rows = ndjson(response)
+        assert response.headers['X-Row-Count'] == str(len(rows))
+        dates += [row['date'][:10] for row in rows]
+        if 'X-Next-From' not in response.headers:
+            break
+        url = f"/history/azuki?from={response.headers['X-Next-From']}&limit=2&fields=floor_price"
+    assert dates == ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05']
+
+
+def test_history_rejects_bad_queries(client):
+    assert client.get('/history/azuki?fields=price').status_code == 400
+    assert client.get('/history/azuki?format=csv').status_code == 400
+    assert client.get('/history/azuki?limit=0').status_code == 400
+    assert client.get('/history/azuki?from=not-a-date').status_code == 400
+    assert client.get('/history/doodles').status_code == 404
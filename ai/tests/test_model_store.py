@@ -0,0 +1,73 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from model_store import ModelCache, artifact_paths, write_atomic
+
+
+def export(model_dir, collection_id, slope):
+    """Ghi model/scaler giống export_model (file tạm rồi rename): model dự đoán slope * x"""
+    X = np.arange(10.0).reshape(-1, 1)
+    model = LinearRegression().fit(X, slope * X[:, 0])
+    model_path, scaler_path, _ = artifact_paths(model_dir, collection_id)
+    write_atomic(model_path, lambda f: joblib.dump(model, f))
+    write_atomic(scaler_path, lambda f: joblib.dump(StandardScaler(with_mean=False, with_std=False).fit(X), f))
+
+
+def predict(artifacts, x=2.0):
+    return float(artifacts.model.predict(artifacts.scaler.transform([[x]]))[0])
+
+
+def test_cache_hit_reuses_loaded_artifacts(tmp_path):
+    export(str(tmp_path), 'azuki', 1.0)
+    cache = ModelCache(str(tmp_path))
+    first = cache.get('azuki')
+    assert cache.get('azuki') is first
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits'], stats['reloads']) == (1, 1, 0)
+
+
+def test_cache_reloads_when_model_is_exported_again(tmp_path):
+    export(str(tmp_path), 'azuki', 1.0)
+    cache = ModelCache(str(tmp_path))
+    assert predict(cache.get('azuki')) == pytest.approx(2.0)
+
+    export(str(tmp_path), 'azuki', 3.0)
+    assert predict(cache.get('azuki')) == pytest.approx(6.0)
+    assert cache.stats()['reloads'] == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    for collection_id in ('a', 'b', 'c'):
+        export(str(tmp_path), collection_id, 1.0)
+    cache = ModelCache(str(tmp_path), max_size=2)
+    cache.get('a')
+    cache.get('b')
+    cache.get('a')
+    cache.get('c')
+    stats = cache.stats()
+    assert stats['collections'] == ['a', 'c']
+    assert stats['evictions'] == 1
+
+
+def test_missing_or_deleted_model_returns_none(tmp_path):
+    cache = ModelCache(str(tmp_path))
+    assert cache.get('azuki') is None
+
+    export(str(tmp_path), 'azuki', 1.0)
+    assert cache.get('azuki') is not None
+    os.remove(artifact_paths(str(tmp_path), 'azuki')[0])
+    assert cache.get('azuki') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_invalidate_forces_reload(tmp_path):
+    export(str(tmp_path), 'azuki', 1.0)
+    cache = ModelCache(str(tmp_path))
+    first = cache.get('azuki')
+    cache.invalidate('azuki')
+    assert cache.get('azuki') is not first
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from prediction_snapshots import PredictionSnapshots
+
+
+def write_snapshot(directory, collection_id, version, data):
+    path = os.path.join(directory, f"ai_predictions_{collection_id}_{version}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    return path
+
+
+@pytest.fixture
+def client(ai_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_api, 'prediction_snapshots', PredictionSnapshots([str(tmp_path)]))
+    return ai_api.app.test_client()
+
+
+def test_snapshot_is_reused_until_file_changes(tmp_path):
+    path = write_snapshot(str(tmp_path), 'azuki', '20240101_000000', {'price': 1.0})
+    snapshots = PredictionSnapshots([str(tmp_path)])
+    first = snapshots.get('azuki')
+    assert snapshots.get('azuki') is first
+    assert json.loads(first.body) == {'price': 1.0}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'price': 22.0}, f)
+    second = snapshots.get('azuki')
+    assert second.etag != first.etag and json.loads(second.body) == {'price': 22.0}
+
+
+def test_broken_new_snapshot_keeps_previous(tmp_path):
+    snapshots = PredictionSnapshots([str(tmp_path)])
+    write_snapshot(str(tmp_path), 'azuki', '20240101_000000', {'price': 1.0})
+    first = snapshots.get('azuki')
+    (tmp_path / 'ai_predictions_azuki_20240102_000000.json').write_text('{"price": ')
+    assert snapshots.get('azuki') is first
+
+    with pytest.raises(ValueError):
+        PredictionSnapshots([str(tmp_path)]).get('azuki')
+
+
+def test_get_predictions_returns_304_for_matching_etag(client, tmp_path):
+    write_snapshot(str(tmp_path), 'azuki', '20240101_000000', {'price': 1.0})
+    response = client.get('/api/predictions/azuki')
+    assert response.status_code == 200
+    assert response.get_json() == {'price': 1.0}
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+
+    response = client.get('/api/predictions/azuki', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.data == b''
+    assert response.headers['ETag'] == etag
+
+    response = client.get('/api/predictions/azuki', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    assert client.get('/api/predictions/other').status_code == 404
+
+
+def test_get_all_predictions_etag_changes_with_any_snapshot(client, tmp_path):
+    write_snapshot(str(tmp_path), 'azuki', '20240101_000000', {'price': 1.0})
+    write_snapshot(str(tmp_path), 'doodles', '20240101_000000', {'price': 2.0})
+    response = client.get('/api/predictions')
+    assert response.get_json() == {'azuki': {'price': 1.0}, 'doodles': {'price': 2.0}}
+    etag = response.headers['ETag']
+    assert client.get('/api/predictions', headers={'If-None-Match': etag}).status_code == 304
+
+    write_snapshot(str(tmp_path), 'doodles', '20240102_000000', {'price': 3.0})
+    response = client.get('/api/predictions', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['doodles'] == {'price': 3.0}
+    assert response.headers['ETag'] != etag
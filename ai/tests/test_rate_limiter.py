@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import coingecko_client
+import rate_limiter
+from coingecko_client import CoinGeckoClient
+from rate_limiter import RateLimiter, retry_after_seconds
+
+
+class FakeClock:
+    """Thay module time trong rate_limiter: sleep() chỉ tăng đồng hồ và ghi lại thời gian chờ"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Như sleep thật: đồng hồ luôn tiến ít nhất 1 µs
+        self.sleeps.append(seconds)
+        self.now += max(seconds, 1e-6)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def test_retry_after_seconds_and_http_date(clock):
+    assert retry_after_seconds('120') == 120.0
+    assert retry_after_seconds('-5') == 0.0
+    date = format_datetime(datetime.fromtimestamp(clock.now + 30, timezone.utc), usegmt=True)
+    assert retry_after_seconds(date) == pytest.approx(30.0)
+    assert retry_after_seconds('soon') is None
+    assert retry_after_seconds(None) is None
+
+
+def test_bucket_spaces_requests_after_burst(tmp_path, clock):
+    limiter = RateLimiter(str(tmp_path / 'rate.json'), quota=30, period=60.0, burst=1)
+    assert limiter.acquire() == 0.0
+    # Hết burst: mỗi request sau chờ một token hồi lại, 29 token / 60 giây
+    assert limiter.acquire() == pytest.approx(60.0 / 29)
+    assert clock.now == pytest.approx(1_700_000_000.0 + 60.0 / 29)
+
+
+def test_block_for_is_shared_through_state_file(tmp_path, clock):
+    state = str(tmp_path / 'rate.json')
+    first, second = RateLimiter(state), RateLimiter(state)
+    first.block_for(10.0)
+    # Một client khác (process khác) dùng cùng file state cũng phải chờ hết thời gian bị chặn
+    assert second.acquire() >= 10.0
+
+
+def test_client_honours_retry_after_on_429(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(coingecko_client.random, 'uniform', lambda a, b: 0.0)
+    limiter = RateLimiter(str(tmp_path / 'rate.json'), quota=1000, period=1.0)
+    client = CoinGeckoClient(cache_dir=str(tmp_path / 'cache'), rate_limiter=limiter)
+    client.session = FakeSession([FakeResponse(429, {'Retry-After': '7'}), FakeResponse(200)])
+
+    response = client._send('https://example.test/x', None, {}, None)
+    assert response.status_code == 200
+    assert (client.session.calls, client.throttled) == (2, 1)
+    # Thời gian chờ đi qua bucket (block_for rồi acquire), không sleep thêm lần nữa ngoài bucket
+    assert sum(clock.sleeps) == pytest.approx(7.0)
+
+
+def test_client_gives_up_after_max_retries(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(coingecko_client, 'time', clock)
+    client = CoinGeckoClient(cache_dir=str(tmp_path / 'cache'), rate_limiter=RateLimiter(str(tmp_path / 'rate.json')))
+    client.rate_limiter = None
+    client.max_retries = 2
+    client.session = FakeSession([FakeResponse(503, {'Retry-After': '1'})] * 3)
+
+    assert client._send('https://example.test/x', None, {}, None).status_code == 503
+    assert client.session.calls == 3 and len(clock.sleeps) == 2
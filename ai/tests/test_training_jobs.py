@@ -0,0 +1,124 @@
+import fcntl
+import os
+import time
+
+import pytest
+
+import training_jobs
+from dataset_store import remove_temp_files, temp_prefix
+from training_jobs import FINISHED_STATUSES, QUEUED, SLOT_FILE, QueueFullError, TrainingJobQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    settings = {'model_dir': str(tmp_path / 'models'), 'results_dir': str(tmp_path / 'results'), 'dataset_dirs': []}
+    return TrainingJobQueue(str(tmp_path / 'jobs'), settings, nice=0, **kwargs)
+
+
+def wait_finished(queue, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in FINISHED_STATUSES:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_slot_held_by_other_process_blocks_dispatch(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, 'SLOT_RETRY_SECONDS', 0.05)
+    queue = make_queue(tmp_path, max_concurrent=1)
+
+    # Giả lập worker API khác đang chạy một job: giữ flock slot duy nhất
+    os.makedirs(queue.jobs_dir)
+    fd = os.open(os.path.join(queue.jobs_dir, SLOT_FILE.format(0)), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        job = queue.submit('no-such-collection')
+        time.sleep(0.3)
+        assert queue.get(job['job_id'])['status'] == QUEUED
+    finally:
+        os.close(fd)
+
+    # Slot được trả: lần thử lại chạy job (không có dataset nên job thất bại nhanh)
+    job = wait_finished(queue, job['job_id'])
+    assert job['started_at'] is not None
+
+
+def test_pending_limit_counts_jobs_of_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, 'SLOT_RETRY_SECONDS', 3600)
+    first = make_queue(tmp_path, max_concurrent=1, max_pending=1)
+    second = make_queue(tmp_path, max_concurrent=1, max_pending=1)
+    # Cả hai hàng đợi dùng chung jobs_dir; job chờ của worker kia được tính vào max_pending
+    os.makedirs(first.jobs_dir)
+    fd = os.open(os.path.join(first.jobs_dir, SLOT_FILE.format(0)), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        first._write({**first._create_job('a', None), 'status': 'running', 'owner_pid': os.getpid()})
+        first.submit('b')
+        with pytest.raises(QueueFullError):
+            second.submit('c')
+    finally:
+        os.close(fd)
+
+
+def test_remove_temp_files_only_of_dead_process(tmp_path):
+    names = [temp_prefix('.artifact-', 4242) + 'abc', temp_prefix('.forest-', 4242) + 'def',
+             temp_prefix('.artifact-', 4343) + 'ghi', 'nft_model_x.pkl']
+    for name in names:
+        (tmp_path / name).write_bytes(b'x')
+
+    assert remove_temp_files(str(tmp_path), ('.artifact-', '.forest-'), 4242) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(names[2:])
+    assert remove_temp_files(str(tmp_path / 'missing'), ('.artifact-',), 4242) == 0
+
+
+def test_submit_reuses_active_job_of_collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, 'SLOT_RETRY_SECONDS', 3600)
+    queue = make_queue(tmp_path, max_concurrent=1)
+    os.makedirs(queue.jobs_dir)
+    fd = os.open(os.path.join(queue.jobs_dir, SLOT_FILE.format(0)), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        job = queue.submit('a', reuse_active=True)
+        assert queue.submit('a', reuse_active=True)['job_id'] == job['job_id']
+        assert queue.submit('b', reuse_active=True)['job_id'] != job['job_id']
+        assert queue.submit('a')['job_id'] != job['job_id']
+    finally:
+        os.close(fd)
+
+
+def test_finished_jobs_are_moved_and_pruned(tmp_path):
+    queue = make_queue(tmp_path, keep_finished=2)
+    jobs = []
+    for i in range(4):
+        job = queue._create_job(f"c{i}", None)
+        queue._write({**job, 'submitted_at': f"2024-01-0{i + 1}T00:00:00", 'status': 'failed'})
+        jobs.append(job['job_id'])
+        time.sleep(0.01)
+    active = queue._create_job('active', None)
+
+    # Job đã kết thúc không nằm trong jobs_dir nên không bị đọc khi đếm hàng đợi
+    assert [name for name in os.listdir(queue.jobs_dir) if name.startswith('job_')] == [f"job_{active['job_id']}.json"]
+    assert queue._count_jobs() == (1, 0)
+    assert [job['job_id'] for job in queue.list_jobs()] == [active['job_id'], jobs[3], jobs[2]]
+    assert queue.get(jobs[0]) is None
+    assert queue.get(jobs[3])['status'] == 'failed'
+
+
+def test_pending_limit_holds_while_slots_are_busy(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, 'SLOT_RETRY_SECONDS', 3600)
+    queue = make_queue(tmp_path, max_concurrent=2, max_pending=2)
+    # Slot bị process khác giữ nhưng không có job running nào trong jobs_dir: job mới vẫn phải chờ
+    os.makedirs(queue.jobs_dir)
+    fds = [os.open(os.path.join(queue.jobs_dir, SLOT_FILE.format(k)), os.O_RDWR | os.O_CREAT) for k in range(2)]
+    try:
+        for fd in fds:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        queue.submit('a')
+        queue.submit('b')
+        with pytest.raises(QueueFullError):
+            queue.submit('c')
+        assert queue._count_jobs() == (2, 0)
+    finally:
+        for fd in fds:
+            os.close(fd)
@@ -0,0 +1,393 @@
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from multiprocessing.connection import wait
+
+from dataset_store import NEW_FILE_MODE, SIDECAR_TMP_PREFIX, remove_temp_files, write_atomic
+from flat_forest import FOREST_TMP_PREFIX
+from model_store import ARTIFACT_TMP_PREFIX
+from nft_predictor_from_txt import NFTPredictorFromTXT
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ giới hạn trong process
+    fcntl = None
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = {SUCCEEDED, FAILED, CANCELLED}
+
+DEFAULT_MAX_CONCURRENT = 1
+DEFAULT_MAX_PENDING = 8
+# Job đã kết thúc được chuyển vào jobs_dir/finished và chỉ giữ lại chừng này job mới nhất
+FINISHED_DIR = 'finished'
+DEFAULT_KEEP_FINISHED = 100
+# Process train chạy với nice cao hơn để request predict được ưu tiên CPU
+DEFAULT_NICE = 10
+
+# Mỗi job đang chạy giữ flock một slot file trong jobs_dir: giới hạn chung cho mọi process API
+SLOT_FILE = '.slot-{}.lock'
+SUBMIT_LOCK_FILE = '.submit.lock'
+# Hết slot (job của worker khác đang chạy) thì thử lại sau
+SLOT_RETRY_SECONDS = 2.0
+# File tạm write_atomic mà process train có thể để lại khi bị kill (model, forest, kết quả, sidecar)
+TRAINING_TMP_PREFIXES = (ARTIFACT_TMP_PREFIX, FOREST_TMP_PREFIX, SIDECAR_TMP_PREFIX)
+
+
+class QueueFullError(Exception):
+    """Hàng đợi training đã đầy"""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_training_job(conn, collection_id, horizon, predictor_settings, nice):
+    """Chạy trong process con: train + export model của một collection, gửi kết quả qua conn"""
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+    predictor = NFTPredictorFromTXT()
+    for name, value in predictor_settings.items():
+        setattr(predictor, name, value)
+
+    try:
+        result = predictor.run_prediction_pipeline(collection_id, horizon=horizon)
+        if result is None:
+            conn.send((FAILED, 'Training failed'))
+        else:
+            conn.send((SUCCEEDED, {
+                'horizon': horizon,
+                'performance': result['results'],
+                'execution_time': result['execution_time']
+            }))
+    except Exception as e:
+        conn.send((FAILED, str(e)))
+    finally:
+        conn.close()
+
+
+class TrainingJobQueue:
+    """Hàng đợi train có giới hạn: mỗi job chạy trong một process riêng (spawn)
+
+    Trạng thái job được ghi thành file JSON trong jobs_dir nên mọi worker API (vd. gunicorn)
+    đều đọc/huỷ được, kể cả job do worker khác nhận. Giới hạn số job chạy đồng thời (slot
+    flock) và số job chờ áp dụng chung cho mọi process API dùng cùng jobs_dir. Job kết thúc
+    được chuyển sang jobs_dir/finished, chỉ giữ keep_finished job mới nhất.
+    """
+
+    def __init__(self, jobs_dir, predictor_settings, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 max_pending=DEFAULT_MAX_PENDING, nice=DEFAULT_NICE, on_finish=None,
+                 keep_finished=DEFAULT_KEEP_FINISHED):
+        self.jobs_dir = jobs_dir
+        self.finished_dir = os.path.join(jobs_dir, FINISHED_DIR)
+        self.keep_finished = max(0, int(keep_finished))
+        self.predictor_settings = predictor_settings
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_pending = max(1, int(max_pending))
+        self.nice = nice
+        # on_finish(job) được gọi trong process API khi job kết thúc (vd. invalidate cache model)
+        self.on_finish = on_finish
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._running = {}
+        self._slots = {}
+        self._retry_timer = None
+
+    def _job_path(self, job_id, directory=None):
+        return os.path.join(directory or self.jobs_dir, f"job_{job_id}.json")
+
+    def _write(self, job):
+        """Ghi file job ra file tạm rồi rename, reader không thấy file dở dang
+
+        Job đã kết thúc được rename sang finished_dir: đếm job chờ/chạy chỉ cần đọc jobs_dir.
+        """
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._job_path(job['job_id'])
+        write_atomic(path, lambda f: f.write(json.dumps(job, indent=2).encode('utf-8')), prefix='.job-')
+        if job['status'] in FINISHED_STATUSES:
+            os.makedirs(self.finished_dir, exist_ok=True)
+            os.replace(path, self._job_path(job['job_id'], self.finished_dir))
+            self._prune_finished()
+
+    def _prune_finished(self):
+        """Xoá các job đã kết thúc cũ nhất, chỉ giữ keep_finished job"""
+        paths = self._job_files(self.finished_dir)
+        if len(paths) <= self.keep_finished:
+            return
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        for path in sorted(mtimes, key=mtimes.get)[:len(mtimes) - self.keep_finished]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Worker API khác vừa xoá
+                pass
+
+    def _job_files(self, directory):
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in names if name.startswith('job_') and name.endswith('.json')]
+
+    def _read(self, job_id):
+        # Đọc jobs_dir trước: job vừa kết thúc được rename sang finished_dir sau khi ghi
+        for directory in (self.jobs_dir, self.finished_dir):
+            try:
+                with open(self._job_path(job_id, directory), 'r') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                return None
+        return None
+
+    def _update(self, job_id, **fields):
+        job = self._read(job_id)
+        if job is not None:
+            job.update(fields)
+            self._write(job)
+        return job
+
+    def get(self, job_id):
+        """Trạng thái job (dict) hoặc None nếu không có"""
+        # job_id do server sinh (hex), không cho phép path lạ
+        if not job_id.isalnum():
+            return None
+
+        job = self._read(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+
+        # Process API sở hữu job đã chết (restart/recycle) thì job không bao giờ xong
+        if not _pid_alive(job['owner_pid']):
+            job = self._update(job_id, status=FAILED, error='API process exited before the job finished',
+                               finished_at=datetime.now().isoformat())
+        return job
+
+    def _active_jobs(self):
+        """Các job đang chờ/chạy của mọi process API (không đọc job đã kết thúc)"""
+        jobs = []
+        for path in self._job_files(self.jobs_dir):
+            job = self.get(os.path.basename(path)[len('job_'):-len('.json')])
+            if job is not None and job['status'] not in FINISHED_STATUSES:
+                jobs.append(job)
+        return jobs
+
+    def list_jobs(self):
+        """Job đang chờ/chạy và tối đa keep_finished job đã kết thúc, mới nhất trước"""
+        jobs = self._active_jobs()
+        active = {job['job_id'] for job in jobs}
+        for path in self._job_files(self.finished_dir):
+            job_id = os.path.basename(path)[len('job_'):-len('.json')]
+            job = self._read(job_id) if job_id not in active else None
+            if job is not None:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+
+    def _open_lock(self, name):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        return os.open(os.path.join(self.jobs_dir, name), os.O_RDWR | os.O_CREAT, NEW_FILE_MODE)
+
+    def _acquire_slot(self):
+        """fd của một slot file đã flock (giữ tới khi job xong), None nếu mọi slot đang bận"""
+        if fcntl is None:
+            return -1
+        for k in range(self.max_concurrent):
+            fd = self._open_lock(SLOT_FILE.format(k))
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def _release_slot(self, job_id):
+        fd = self._slots.pop(job_id, -1)
+        if fd >= 0:
+            os.close(fd)
+
+    def _retry_dispatch(self):
+        with self._lock:
+            self._retry_timer = None
+        self._dispatch()
+
+    def _count_jobs(self):
+        """(số job đang chờ, số job đang chạy) của mọi process API"""
+        statuses = [job['status'] for job in self._active_jobs()]
+        return statuses.count(QUEUED), statuses.count(RUNNING)
+
+    def _find_active(self, collection_id, horizon):
+        """Job đang chờ/chạy của collection (cùng horizon), None nếu không có"""
+        for job in self._active_jobs():
+            if job['collection_id'] == collection_id and job['horizon'] == horizon:
+                return job
+        return None
+
+    def submit(self, collection_id, horizon=None, reuse_active=False):
+        """Đưa job train vào hàng đợi, trả về job (raise QueueFullError khi đầy)
+
+        reuse_active=True: collection đã có job đang chờ/chạy thì trả về job đó, không tạo job mới.
+        """
+        with self._lock:
+            lock_fd = self._open_lock(SUBMIT_LOCK_FILE)
+            try:
+                # Đếm + ghi job trong flock để các worker không cùng vượt max_pending
+                if fcntl is not None:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                if reuse_active:
+                    job = self._find_active(collection_id, horizon)
+                    if job is not None:
+                        return job
+                job = self._create_job(collection_id, horizon)
+            finally:
+                os.close(lock_fd)
+            self._pending.append(job['job_id'])
+
+        self._dispatch()
+        return job
+
+    def _create_job(self, collection_id, horizon):
+        # Mọi job chưa chạy đều tính là đang chờ (kể cả khi slot bị worker khác giữ)
+        pending, _ = self._count_jobs()
+        if pending >= self.max_pending:
+            raise QueueFullError(f"Training queue is full ({self.max_pending} pending jobs)")
+
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'collection_id': collection_id,
+            'horizon': horizon,
+            'status': QUEUED,
+            'owner_pid': os.getpid(),
+            'pid': None,
+            'cancel_requested': False,
+            'submitted_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        self._write(job)
+        return job
+
+    def cancel(self, job_id):
+        """Huỷ job đang chờ hoặc đang chạy, trả về trạng thái mới (None nếu không có job)"""
+        job = self.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+
+        with self._lock:
+            if job_id in self._pending:
+                self._pending.remove(job_id)
+                return self._update(job_id, status=CANCELLED, cancel_requested=True,
+                                    finished_at=datetime.now().isoformat())
+
+            job = self._update(job_id, cancel_requested=True)
+            if job_id in self._running:
+                self._running[job_id].terminate()
+            elif job['pid'] is not None and _pid_alive(job['pid']):
+                # Job của worker API khác: kill process train, worker kia sẽ ghi trạng thái cancelled
+                os.kill(job['pid'], signal.SIGTERM)
+            return job
+
+    def _dispatch(self):
+        """Chạy các job đang chờ khi còn slot trống (tối đa max_concurrent job trên mọi process)"""
+        with self._lock:
+            while self._pending and len(self._running) < self.max_concurrent:
+                job_id = self._pending[0]
+                job = self._read(job_id)
+                if job is None or job['cancel_requested']:
+                    self._pending.popleft()
+                    if job is not None:
+                        # Bị huỷ từ worker API khác khi còn đang chờ
+                        self._update(job_id, status=CANCELLED, finished_at=datetime.now().isoformat())
+                    continue
+
+                slot = self._acquire_slot()
+                if slot is None:
+                    # Slot đang bị job của worker khác giữ: thử lại sau
+                    if self._retry_timer is None:
+                        self._retry_timer = threading.Timer(SLOT_RETRY_SECONDS, self._retry_dispatch)
+                        self._retry_timer.daemon = True
+                        self._retry_timer.start()
+                    break
+                self._pending.popleft()
+                self._slots[job_id] = slot
+
+                parent_conn, child_conn = self._ctx.Pipe(duplex=False)
+                process = self._ctx.Process(
+                    target=run_training_job,
+                    args=(child_conn, job['collection_id'], job['horizon'], self.predictor_settings, self.nice),
+                    daemon=True
+                )
+                process.start()
+                child_conn.close()
+
+                self._running[job_id] = process
+                self._update(job_id, status=RUNNING, pid=process.pid, started_at=datetime.now().isoformat())
+                threading.Thread(target=self._monitor, args=(job_id, process, parent_conn), daemon=True).start()
+
+    def _output_dirs(self):
+        """Các thư mục process train ghi vào: model, kết quả, dataset (sidecar)"""
+        settings = self.predictor_settings
+        dirs = [settings.get('model_dir'), settings.get('results_dir')] + list(settings.get('dataset_dirs') or [])
+        return [directory for directory in dirs if directory]
+
+    def _monitor(self, job_id, process, conn):
+        """Chờ process train kết thúc, ghi kết quả rồi chạy job tiếp theo"""
+        wait([conn, process.sentinel])
+        outcome = None
+        if conn.poll():
+            try:
+                outcome = conn.recv()
+            except EOFError:
+                pass
+        conn.close()
+        process.join()
+
+        if outcome is None or outcome[0] != SUCCEEDED:
+            # Bị huỷ (terminate) hoặc crash giữa lúc export: xoá file tạm còn sót của process train
+            for directory in self._output_dirs():
+                remove_temp_files(directory, TRAINING_TMP_PREFIXES, process.pid)
+
+        with self._lock:
+            self._running.pop(job_id, None)
+            self._release_slot(job_id)
+            job = self._read(job_id)
+            if job['cancel_requested']:
+                fields = {'status': CANCELLED}
+            elif outcome is None:
+                fields = {'status': FAILED, 'error': f"Training process exited with code {process.exitcode}"}
+            elif outcome[0] == SUCCEEDED:
+                fields = {'status': SUCCEEDED, 'result': outcome[1]}
+            else:
+                fields = {'status': FAILED, 'error': outcome[1]}
+            job = self._update(job_id, finished_at=datetime.now().isoformat(), **fields)
+
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                print(f"⚠️  on_finish lỗi cho job {job_id}: {e}")
+
+        self._dispatch()
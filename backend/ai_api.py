@@ -1,11 +1,7 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
-import joblib
 import numpy as np
-import pandas as pd
 import os
-import json
-import glob
 from datetime import datetime, timedelta
 import sys
 import logging
@@ -15,8 +11,19 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Add ai directory to path
-sys.path.append('../ai')
-from nft_predictor_from_txt import NFTPredictorFromTXT
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.environ.get('AI_MODEL_DIR', os.path.join(ROOT_DIR, 'ai_models'))
+DATASET_DIRS = [os.path.join(ROOT_DIR, 'ai', 'ai', 'datasets'), os.path.join(ROOT_DIR, 'ai', 'datasets')]
+RESULTS_DIR = os.environ.get('AI_RESULTS_DIR', os.path.join(ROOT_DIR, 'ai'))
+JOBS_DIR = os.path.join(MODEL_DIR, 'jobs')
+sys.path.append(os.path.join(ROOT_DIR, 'ai'))
+from nft_predictor_from_txt import NFTPredictorFromTXT, forecast_collections
+from model_store import ModelCache, DEFAULT_CACHE_SIZE
+from forecast_cache import ForecastCache, dataset_fingerprint, model_fingerprint, DEFAULT_CACHE_SIZE as DEFAULT_FORECAST_CACHE_SIZE, DEFAULT_TTL_SECONDS
+from prediction_snapshots import PredictionSnapshots
+from history_stream import load_history, parse_bound, parse_fields, slice_range, iter_rows, NDJSON, JSON
+from core_budget import TRAINING, INFERENCE, limit_threads, thread_budget
+from training_jobs import TrainingJobQueue, QueueFullError, FINISHED_STATUSES, SUCCEEDED, DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_PENDING, DEFAULT_NICE, DEFAULT_KEEP_FINISHED
 
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:3001', 'http://0.0.0.0:3001'])
@@ -24,78 +31,166 @@ CORS(app, origins=['http://localhost:3001', 'http://0.0.0.0:3001'])
 # Configure JSON encoder để tránh lỗi encoding
 app.config['JSON_AS_ASCII'] = False
 
+# Ngân sách thread tách riêng cho predict và train: mỗi request predict chạy 1 thread
+# (AI_INFERENCE_N_JOBS) thay vì fan-out ra mọi core theo n_jobs=-1 đã pickle trong model,
+# train mặc định 1 thread (AI_TRAINING_N_JOBS) để không chiếm CPU của request predict
+INFERENCE_N_JOBS = thread_budget(INFERENCE)
+TRAINING_N_JOBS = thread_budget(TRAINING, default=1)
+# Giới hạn thread BLAS/OpenMP của cả process API theo ngân sách predict
+limit_threads(INFERENCE_N_JOBS)
+
+# Một cache model dùng chung cho mọi route: LRU có giới hạn, tự reload khi file model đổi
+model_cache = ModelCache(MODEL_DIR, max_size=int(os.environ.get('MODEL_CACHE_SIZE', DEFAULT_CACHE_SIZE)))
+
+# Kết quả /predict/future theo (collection, days, version dataset, version model)
+forecast_cache = ForecastCache(
+    max_size=int(os.environ.get('FORECAST_CACHE_SIZE', DEFAULT_FORECAST_CACHE_SIZE)),
+    ttl=float(os.environ.get('FORECAST_CACHE_TTL', DEFAULT_TTL_SECONDS))
+)
+
+# Snapshot ai_predictions_<id>_<ts>.json mới nhất của từng collection, serialize sẵn
+prediction_snapshots = PredictionSnapshots([RESULTS_DIR])
+
+def on_training_finished(job):
+    """Job train xong: bỏ model và forecast cũ khỏi cache để request sau dùng bản mới"""
+    if job['status'] == SUCCEEDED:
+        model_cache.invalidate(job['collection_id'])
+        forecast_cache.invalidate(job['collection_id'])
+    logger.info(f"Training job {job['job_id']} for {job['collection_id']}: {job['status']}")
+
+# Train chạy ở process riêng (nice, n_jobs giới hạn) để không chiếm CPU của request predict
+training_queue = TrainingJobQueue(
+    JOBS_DIR,
+    {
+        'model_dir': MODEL_DIR,
+        'dataset_dirs': DATASET_DIRS,
+        'results_dir': RESULTS_DIR,
+        'n_jobs': TRAINING_N_JOBS
+    },
+    max_concurrent=int(os.environ.get('AI_TRAINING_CONCURRENCY', DEFAULT_MAX_CONCURRENT)),
+    max_pending=int(os.environ.get('AI_TRAINING_QUEUE_SIZE', DEFAULT_MAX_PENDING)),
+    nice=int(os.environ.get('AI_TRAINING_NICE', DEFAULT_NICE)),
+    on_finish=on_training_finished,
+    keep_finished=int(os.environ.get('AI_TRAINING_KEEP_JOBS', DEFAULT_KEEP_FINISHED))
+)
+
+class ModelTrainingQueued(Exception):
+    """Collection chưa có model: job train đã được đưa vào hàng đợi"""
+
+    def __init__(self, collection_id, job):
+        super().__init__(f"Model for {collection_id} is being trained (job {job['job_id']})")
+        self.collection_id = collection_id
+        self.job = job
+
 class NFTAPIPredictor:
-    def __init__(self):
-        self.models = {}
-        self.scalers = {}
+    def __init__(self, cache, forecasts):
+        self.cache = cache
+        self.forecasts = forecasts
         self.collections = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
 
+    def make_predictor(self):
+        """NFTPredictorFromTXT đọc model qua cache dùng chung"""
+        predictor = NFTPredictorFromTXT()
+        predictor.dataset_dirs = DATASET_DIRS
+        predictor.model_dir = MODEL_DIR
+        predictor.results_dir = RESULTS_DIR
+        predictor.model_cache = self.cache
+        return predictor
+
+    def get_artifacts(self, collection_id):
+        """Model, scaler và metadata từ cache
+
+        Chưa có model thì đưa job train vào hàng đợi (train ở process riêng, không train trong
+        request) rồi raise ModelTrainingQueued; hàng đợi đầy thì raise QueueFullError.
+        """
+        artifacts = self.cache.get(collection_id)
+        if artifacts is None:
+            job = training_queue.submit(collection_id, reuse_active=True)
+            logger.warning(f"Model files not found for {collection_id}, training job {job['job_id']} is {job['status']}")
+            raise ModelTrainingQueued(collection_id, job)
+        return artifacts
+
     def load_model(self, collection_id):
-        """Load model và scaler từ file .pkl"""
+        """Nạp trước model vào cache (không train khi chưa có model)"""
         try:
-            model_path = f"../ai_models/nft_model_{collection_id}.pkl"
-            scaler_path = f"../ai_models/nft_scaler_{collection_id}.pkl"
-
-            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
-                logger.warning(f"Model files not found for {collection_id}, attempting to train...")
-                # Tự động train model nếu không tìm thấy
-                if self.auto_train_model(collection_id):
-                    return self.load_model(collection_id)  # Retry loading
-                else:
-                    logger.error(f"Failed to auto-train model for {collection_id}")
-                    return False
-
-            self.models[collection_id] = joblib.load(model_path)
-            self.scalers[collection_id] = joblib.load(scaler_path)
-
-            logger.info(f"Loaded model for {collection_id}")
-            return True
-
+            if self.cache.get(collection_id) is None:
+                logger.warning(f"Model files not found for {collection_id}, skipping preload")
+                return False
         except Exception as e:
             logger.error(f"Error loading model for {collection_id}: {e}")
             return False
 
-    def auto_train_model(self, collection_id):
-        """Tự động train model nếu chưa có"""
-        try:
-            logger.info(f"Auto-training model for {collection_id}...")
-            # Import inside function to avoid circular imports
-            import sys
-            sys.path.append('../ai')
-            from nft_predictor_from_txt import NFTPredictorFromTXT
-
-            predictor = NFTPredictorFromTXT()
-            result = predictor.run_prediction_pipeline(collection_id)
-            return result is not None
-        except Exception as e:
-            logger.error(f"Auto-training failed for {collection_id}: {e}")
-            return False
+        logger.info(f"Loaded model for {collection_id}")
+        return True
 
     def predict_price(self, collection_id, features):
-        """Dự đoán giá từ features"""
+        """Dự đoán giá từ features (model multi-horizon trả về list t+1 ... t+H)"""
         try:
-            if collection_id not in self.models:
-                if not self.load_model(collection_id):
-                    return None
-
-            model = self.models[collection_id]
-            scaler = self.scalers[collection_id]
+            artifacts = self.get_artifacts(collection_id)
 
             # Scale features và predict
-            features_scaled = scaler.transform(features)
-            prediction = model.predict(features_scaled)
+            features_scaled = artifacts.scaler.transform(features)
+            prediction = artifacts.model.predict(features_scaled)
 
+            if np.ndim(prediction) == 2:
+                return [float(p) for p in prediction[0]]
             return float(prediction[0])
 
+        except (ModelTrainingQueued, QueueFullError):
+            raise
         except Exception as e:
             logger.error(f"Error predicting for {collection_id}: {e}")
             return None
 
+    def predict_batch(self, features_by_collection):
+        """Dự đoán nhiều dòng cho nhiều collection: mỗi collection chỉ transform + predict một lần
+
+        Trả về (results, training): results[collection_id] là mảng dự đoán (None nếu lỗi),
+        training[collection_id] là job train đã xếp hàng cho collection chưa có model.
+        """
+        results = {}
+        training = {}
+        for collection_id, features in features_by_collection.items():
+            try:
+                artifacts = self.get_artifacts(collection_id)
+                results[collection_id] = artifacts.model.predict(artifacts.scaler.transform(features))
+
+            except ModelTrainingQueued as e:
+                training[collection_id] = e.job
+            except QueueFullError:
+                raise
+            except Exception as e:
+                logger.error(f"Error batch predicting for {collection_id}: {e}")
+                results[collection_id] = None
+
+        return results, training
+
+    def forecast_key(self, collection_id, days):
+        """Key cache forecast, None nếu chưa có dataset hoặc model (không cache)"""
+        dataset_version = dataset_fingerprint(DATASET_DIRS, collection_id)
+        model_version = model_fingerprint(MODEL_DIR, collection_id)
+        if dataset_version is None or model_version is None:
+            return None
+        return (collection_id, days, dataset_version, model_version)
+
     def get_future_predictions(self, collection_id, days=7):
-        """Lấy dự đoán tương lai từ dataset có sẵn"""
+        """Lấy dự đoán tương lai từ dataset có sẵn (dùng lại kết quả nếu dataset/model không đổi)"""
+        key = self.forecast_key(collection_id, days)
+        if key is not None:
+            cached = self.forecasts.get(key)
+            if cached is not None:
+                return cached
+
+        predictions = self.compute_future_predictions(collection_id, days)
+        if predictions is not None and key is not None:
+            self.forecasts.put(key, predictions)
+        return predictions
+
+    def compute_future_predictions(self, collection_id, days=7):
+        """Chạy pipeline forecast: load model, đọc dataset, preprocess, dự đoán days ngày"""
         try:
             # Load predictor và chạy pipeline
-            predictor = NFTPredictorFromTXT()
+            predictor = self.make_predictor()
 
             # Load model nếu có
             if predictor.load_model(collection_id):
@@ -124,8 +219,53 @@ class NFTAPIPredictor:
             logger.error(f"Error getting future predictions for {collection_id}: {e}")
             return None
 
+    def get_batch_future_predictions(self, horizons):
+        """Dự đoán tương lai cho nhiều collection trong một lượt: horizons = {collection_id: days}
+
+        Collection đã có forecast trong cache không phải chạy lại, phần còn lại forecast chung một lượt.
+        """
+        try:
+            results = {}
+            keys = {}
+            pending = {}
+            for collection_id, days in horizons.items():
+                keys[collection_id] = key = self.forecast_key(collection_id, days)
+                cached = self.forecasts.get(key) if key is not None else None
+                if cached is not None:
+                    results[collection_id] = cached
+                else:
+                    pending[collection_id] = days
+
+            if not pending:
+                return results
+
+            forecasts = forecast_collections(pending, predictor_factory=self.make_predictor)
+
+            for collection_id, forecast in forecasts.items():
+                last_date = forecast['last_date']
+                results[collection_id] = {
+                    'future_dates': [
+                        (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d')
+                        for i in range(len(forecast['predicted_prices']))
+                    ],
+                    'predicted_prices': [float(p) for p in forecast['predicted_prices']],
+                    'collection_id': collection_id
+                }
+                if keys[collection_id] is not None:
+                    self.forecasts.put(keys[collection_id], results[collection_id])
+            return results
+
+        except Exception as e:
+            logger.error(f"Error getting batch future predictions: {e}")
+            return None
+
 # Initialize predictor
-api_predictor = NFTAPIPredictor()
+api_predictor = NFTAPIPredictor(model_cache, forecast_cache)
+
+def preload_models():
+    """Load model của mọi collection vào cache (gunicorn gọi trong master trước khi fork)"""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    return sum(api_predictor.load_model(collection) for collection in api_predictor.collections)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -140,6 +280,16 @@ def get_collections():
         'available_models': []
     })
 
+@app.route('/models/cache', methods=['GET'])
+def get_model_cache_stats():
+    """Thống kê cache model (hit/miss/reload/eviction)"""
+    return jsonify(model_cache.stats())
+
+@app.route('/forecasts/cache', methods=['GET'])
+def get_forecast_cache_stats():
+    """Thống kê cache forecast của /predict/future (hit/miss/expiration/eviction)"""
+    return jsonify(forecast_cache.stats())
+
 @app.route('/predict/<collection_id>', methods=['POST'])
 def predict_single(collection_id):
     """Predict giá từ features"""
@@ -152,17 +302,148 @@ def predict_single(collection_id):
         if prediction is None:
             return jsonify({'error': 'Prediction failed'}), 500
 
-        return jsonify({
+        response = {
             'collection_id': collection_id,
-            'prediction': prediction,
-            'prediction_dpsv': prediction * 100,
             'timestamp': datetime.now().isoformat()
-        })
-
+        }
+        if isinstance(prediction, list):
+            # Model multi-horizon: 'prediction' là t+1, kèm cả horizon
+            response['horizon'] = len(prediction)
+            response['horizon_predictions'] = prediction
+            prediction = prediction[0]
+
+        response['prediction'] = prediction
+        response['prediction_dpsv'] = prediction * 100
+        return jsonify(response)
+
+    except ModelTrainingQueued as e:
+        return jsonify({'collection_id': collection_id, 'training': training_job_payload(e.job)}), 202
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error in predict_single: {e}")
         return jsonify({'error': str(e)}), 500
 
+def training_job_payload(job):
+    """Job train đang chạy thay cho model còn thiếu: client theo dõi qua status_url rồi gọi lại"""
+    return {'job_id': job['job_id'], 'status': job['status'], 'status_url': f"/train/jobs/{job['job_id']}"}
+
+def prediction_payload(values):
+    """Kết quả một dòng: giá t+1 (+ horizon_predictions nếu model multi-horizon)"""
+    if np.ndim(values) == 1:
+        payload = {'prediction': float(values[0]), 'horizon_predictions': [float(p) for p in values]}
+    else:
+        payload = {'prediction': float(values)}
+    payload['prediction_dpsv'] = payload['prediction'] * 100
+    return payload
+
+def parse_batch_item(item):
+    """(dòng features float64, None) của một item /predict/batch, hoặc (None, lỗi) nếu item sai"""
+    if not isinstance(item, dict):
+        return None, 'item must be an object'
+    if not isinstance(item.get('collection_id'), str):
+        return None, "missing 'collection_id'"
+    features = item.get('features')
+    if not isinstance(features, list) or not features:
+        return None, "'features' must be a non-empty list"
+    try:
+        row = np.array(features, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None, "'features' must contain only numbers"
+    if row.ndim != 1:
+        return None, "'features' must be a flat list"
+    return row, None
+
+def parse_batch_collections(collections):
+    """({collection_id: ma trận features}, None) của body dạng 'collections', hoặc (None, lỗi)"""
+    if not isinstance(collections, dict):
+        return None, {'error': "'collections' must be an object"}
+
+    features_by_collection = {}
+    for collection_id, rows in collections.items():
+        if not isinstance(rows, list) or not rows:
+            return None, {'error': f"Invalid collection {collection_id}: rows must be a non-empty list", 'collection_id': collection_id}
+        parsed = []
+        for i, features in enumerate(rows):
+            row, error = parse_batch_item({'collection_id': collection_id, 'features': features})
+            if error is None and parsed and len(parsed[0]) != len(row):
+                error = f"expected {len(parsed[0])} features like row 0, got {len(row)}"
+            if error is not None:
+                return None, {'error': f"Invalid collection {collection_id}, row {i}: {error}",
+                              'collection_id': collection_id, 'index': i}
+            parsed.append(row)
+        features_by_collection[collection_id] = np.stack(parsed)
+    return features_by_collection, None
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Predict nhiều dòng features cho nhiều collection trong một request
+
+    Body: {"items": [{"collection_id": "azuki", "features": [...]}, ...]}
+       -> {"predictions": [...]} cùng thứ tự với items
+    hoặc {"collections": {"azuki": [[...], [...]], "cryptopunks": [[...]]}}
+       -> {"predictions": {"azuki": [...], "cryptopunks": [...]}} cùng thứ tự dòng
+    Collection chưa có model được đưa vào hàng đợi train (mục 'training', status 202).
+    """
+    try:
+        data = request.json or {}
+
+        if 'collections' in data:
+            features_by_collection, error = parse_batch_collections(data['collections'])
+            if error is not None:
+                return jsonify(error), 400
+            results, training = api_predictor.predict_batch(features_by_collection)
+            return jsonify({
+                'predictions': {
+                    collection_id: [prediction_payload(values) for values in predictions]
+                    for collection_id, predictions in results.items() if predictions is not None
+                },
+                'failed': [collection_id for collection_id, predictions in results.items() if predictions is None],
+                'training': {collection_id: training_job_payload(job) for collection_id, job in training.items()},
+                'timestamp': datetime.now().isoformat()
+            }), 202 if training else 200
+
+        items = data.get('items')
+        if not isinstance(items, list):
+            return jsonify({'error': "Body must contain 'items' or 'collections'"}), 400
+
+        # Gom dòng theo collection, nhớ vị trí để trả kết quả đúng thứ tự ban đầu
+        positions = {}
+        rows = []
+        for i, item in enumerate(items):
+            row, error = parse_batch_item(item)
+            if error is None:
+                indices = positions.setdefault(item['collection_id'], [])
+                if indices and len(rows[indices[0]]) != len(row):
+                    error = f"expected {len(rows[indices[0]])} features like item {indices[0]}, got {len(row)}"
+            if error is not None:
+                return jsonify({'error': f"Invalid item {i}: {error}", 'index': i}), 400
+            indices.append(i)
+            rows.append(row)
+        features_by_collection = {
+            collection_id: np.stack([rows[i] for i in indices])
+            for collection_id, indices in positions.items()
+        }
+        results, training = api_predictor.predict_batch(features_by_collection)
+
+        predictions = [None] * len(items)
+        for collection_id, indices in positions.items():
+            for row, i in enumerate(indices):
+                if collection_id in training:
+                    predictions[i] = {'collection_id': collection_id, 'training': training_job_payload(training[collection_id])}
+                elif results[collection_id] is None:
+                    predictions[i] = {'collection_id': collection_id, 'error': 'Prediction failed'}
+                else:
+                    predictions[i] = {'collection_id': collection_id, **prediction_payload(results[collection_id][row])}
+
+        return jsonify({'predictions': predictions, 'timestamp': datetime.now().isoformat()}), 202 if training else 200
+
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error in predict_batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/predict/future/<collection_id>', methods=['GET'])
 def predict_future(collection_id):
     """Lấy dự đoán giá tương lai cho chart"""
@@ -180,11 +461,81 @@ def predict_future(collection_id):
         logger.error(f"Error in predict_future: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/future/batch', methods=['POST'])
+def predict_future_batch():
+    """Dự đoán giá tương lai cho nhiều collection trong một request
+
+    Body: {"horizons": {"azuki": 7, "cryptopunks": 30}}
+       hoặc {"collections": ["azuki", "cryptopunks"], "days": 7}
+    """
+    try:
+        data = request.json or {}
+        horizons = data.get('horizons')
+        if horizons is None:
+            days = int(data.get('days', 7))
+            horizons = {collection_id: days for collection_id in data.get('collections', api_predictor.collections)}
+        horizons = {collection_id: int(days) for collection_id, days in horizons.items()}
+
+        predictions = api_predictor.get_batch_future_predictions(horizons)
+
+        if predictions is None:
+            return jsonify({'error': 'Batch future prediction failed'}), 500
+
+        return jsonify({
+            'predictions': predictions,
+            'missing': [collection_id for collection_id in horizons if collection_id not in predictions]
+        })
+
+    except Exception as e:
+        logger.error(f"Error in predict_future_batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history/<collection_id>', methods=['GET'])
+def get_history(collection_id):
+    """Lịch sử floor price/volume/market cap, stream từng chunk (NDJSON hoặc mảng JSON)
+
+    Query: from, to (ISO date, inclusive), fields (vd. floor_price,volume), limit (số dòng tối đa),
+    format (ndjson | json). Header X-Row-Count là số dòng trong response này, X-Range-Rows là số
+    dòng trong [from, to] trước khi cắt theo limit; khi limit cắt bớt, X-Next-From là from của trang sau.
+    """
+    try:
+        try:
+            start = parse_bound(request.args.get('from'))
+            end = parse_bound(request.args.get('to'))
+            fields = parse_fields(request.args.get('fields'))
+            limit = request.args.get('limit', type=int)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        fmt = request.args.get('format', NDJSON)
+        if fmt not in (NDJSON, JSON):
+            return jsonify({'error': f"Unknown format: {fmt} (allowed: {NDJSON}, {JSON})"}), 400
+        if limit is not None and limit <= 0:
+            return jsonify({'error': 'limit must be positive'}), 400
+
+        columns = load_history(DATASET_DIRS, collection_id)
+        if columns is None:
+            return jsonify({'error': f'No dataset found for {collection_id}'}), 404
+
+        lo, hi, next_index = slice_range(columns['date'], start, end, limit)
+        range_lo, range_hi, _ = slice_range(columns['date'], start, end)
+        mimetype = 'application/x-ndjson' if fmt == NDJSON else 'application/json'
+        response = Response(iter_rows(columns, lo, hi, fields, fmt), mimetype=mimetype)
+        response.headers['X-Row-Count'] = str(hi - lo)
+        response.headers['X-Range-Rows'] = str(range_hi - range_lo)
+        if next_index is not None:
+            response.headers['X-Next-From'] = str(np.datetime_as_string(columns['date'][next_index], unit='s'))
+        return response
+
+    except Exception as e:
+        logger.error(f"Error in get_history: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/models/<collection_id>/download', methods=['GET'])
 def download_model(collection_id):
     """Download model file"""
     try:
-        model_path = f"../ai_models/nft_model_{collection_id}.pkl"
+        model_path = os.path.join(MODEL_DIR, f"nft_model_{collection_id}.pkl")
 
         if not os.path.exists(model_path):
             return jsonify({'error': 'Model not found'}), 404
@@ -197,54 +548,89 @@ def download_model(collection_id):
 
 @app.route('/train/<collection_id>', methods=['POST'])
 def train_model(collection_id):
-    """Train model cho collection"""
+    """Đưa job train cho collection vào hàng đợi (chạy ở process riêng), trả về job_id"""
     try:
-        logger.info(f"Starting training for {collection_id}")
-
-        # Initialize predictor và train
-        predictor = NFTPredictorFromTXT()
-        result = predictor.run_prediction_pipeline(collection_id)
-
-        if result is None:
-            return jsonify({'error': 'Training failed'}), 500
-
-        # Reload model vào memory
-        api_predictor.load_model(collection_id)
+        horizon = request.args.get('horizon', type=int)
+        job = training_queue.submit(collection_id, horizon=horizon)
+        logger.info(f"Queued training job {job['job_id']} for {collection_id} (horizon={horizon})")
 
         return jsonify({
+            'job_id': job['job_id'],
             'collection_id': collection_id,
-            'status': 'training_completed',
-            'performance': result['results'],
-            'execution_time': result['execution_time'],
+            'status': job['status'],
+            'horizon': horizon,
+            'status_url': f"/train/jobs/{job['job_id']}",
             'timestamp': datetime.now().isoformat()
-        })
+        }), 202
 
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
-        logger.error(f"Error training model: {e}")
+        logger.error(f"Error queueing training job: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/train/jobs', methods=['GET'])
+def list_training_jobs():
+    """Job train đang chờ/chạy và các job đã kết thúc gần nhất (AI_TRAINING_KEEP_JOBS), mới nhất trước"""
+    return jsonify({'jobs': training_queue.list_jobs()})
+
+@app.route('/train/jobs/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """Trạng thái job train"""
+    job = training_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/train/jobs/<job_id>/result', methods=['GET'])
+def get_training_job_result(job_id):
+    """Kết quả job train: 202 khi chưa xong, 409 khi job lỗi hoặc đã huỷ"""
+    job = training_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] not in FINISHED_STATUSES:
+        return jsonify({'job_id': job_id, 'status': job['status']}), 202
+    if job['status'] != SUCCEEDED:
+        return jsonify({'job_id': job_id, 'status': job['status'], 'error': job['error']}), 409
+
+    return jsonify({
+        'job_id': job_id,
+        'collection_id': job['collection_id'],
+        'status': 'training_completed',
+        'horizon': job['horizon'],
+        'performance': job['result']['performance'],
+        'execution_time': job['result']['execution_time'],
+        'timestamp': job['finished_at']
+    })
+
+@app.route('/train/jobs/<job_id>', methods=['DELETE'])
+def cancel_training_job(job_id):
+    """Huỷ job train đang chờ hoặc đang chạy"""
+    job = training_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+def snapshot_response(body, etag):
+    """Response từ bytes đã serialize; client gửi If-None-Match khớp thì nhận 304"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/api/predictions/<collection_id>', methods=['GET'])
 def get_predictions(collection_id):
     try:
-        # Map collection_id to filename (absolute paths from root)
-        filename_map = {
-            'azuki': 'ai/ai_predictions_azuki_20250612_140242.json',
-            'bored-ape-yacht-club': 'ai/ai_predictions_bored-ape-yacht-club_20250612_140242.json',
-            'cryptopunks': 'ai/ai_predictions_cryptopunks_20250612_140242.json'
-        }
+        try:
+            snapshot = prediction_snapshots.get(collection_id)
+        except ValueError as e:
+            logger.error(f"JSONDecodeError: {e}")
+            return jsonify({'error': str(e)}), 500
 
-        filepath = filename_map.get(collection_id)
-        if not filepath:
+        if snapshot is None:
             return jsonify({'error': f'No predictions found for {collection_id}'}), 404
 
-        with open(filepath, 'r', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSONDecodeError: {e}")
-                return jsonify({'error': f'Failed to decode JSON for {collection_id}: {e}'}), 500
-
-        return jsonify(data)
+        return snapshot_response(snapshot.body, snapshot.etag)
     except Exception as e:
         print(f"Error in get_predictions: {e}")
         return jsonify({'error': str(e)}), 500
@@ -252,15 +638,11 @@ def get_predictions(collection_id):
 @app.route('/api/predict/<collection_id>', methods=['POST'])
 def predict_price(collection_id):
     try:
-        # Load model và scaler
-        model_path = f'ai_models/nft_model_{collection_id}.pkl'
-        scaler_path = f'ai_models/nft_scaler_{collection_id}.pkl'
-
-        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        # Model và scaler từ cache dùng chung (chỉ load lại khi file đổi)
+        artifacts = model_cache.get(collection_id)
+        if artifacts is None:
             return jsonify({'error': f'Model not found for {collection_id}'}), 404
-
-        model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
+        model, scaler = artifacts.model, artifacts.scaler
 
         # Nhận features từ request
         data = request.json
@@ -270,12 +652,21 @@ def predict_price(collection_id):
         features_scaled = scaler.transform(features)
         prediction = model.predict(features_scaled)
 
-        return jsonify({
+        # Model multi-horizon trả về (1, H): giá t+1 + toàn bộ horizon
+        horizon_predictions = None
+        if prediction.ndim == 2:
+            horizon_predictions = [float(p) for p in prediction[0]]
+            prediction = prediction[:, 0]
+
+        response = {
             'collection_id': collection_id,
             'prediction_usd': float(prediction[0]),
             'prediction_dpsv': float(prediction[0] * 100),
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if horizon_predictions is not None:
+            response['horizon_predictions'] = horizon_predictions
+        return jsonify(response)
     except Exception as e:
         print(f"Error in predict_price: {e}")
         return jsonify({'error': str(e)}), 500
@@ -283,42 +674,18 @@ def predict_price(collection_id):
 @app.route('/api/predictions', methods=['GET'])
 def get_all_predictions():
     try:
-        collections = ['cryptopunks', 'azuki', 'bored-ape-yacht-club']
-        all_predictions = {}
-
-        # Map collection_id to filename (absolute paths from root)
-        filename_map = {
-            'azuki': 'ai/ai_predictions_azuki_20250612_140242.json',
-            'bored-ape-yacht-club': 'ai/ai_predictions_bored-ape-yacht-club_20250612_140242.json',
-            'cryptopunks': 'ai/ai_predictions_cryptopunks_20250612_140242.json'
-        }
-
-        for collection in collections:
-            filepath = filename_map.get(collection)
-            if not filepath:
-                logger.warning(f"No prediction file defined for {collection}")
-                continue
-
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                all_predictions[collection] = data
-            except Exception as e:
-                print(f"Error loading {collection}: {e}")
-                continue
-
-        return jsonify(all_predictions)
+        # Mọi collection có file snapshot trong RESULTS_DIR (bản mới nhất của mỗi collection)
+        body, etag = prediction_snapshots.get_all()
+        return snapshot_response(body, etag)
     except Exception as e:
         print(f"Error in get_all_predictions: {e}")
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    # Ensure ai_models directory exists
-    os.makedirs('../ai_models', exist_ok=True)
-
     # Load existing models on startup
-    for collection in api_predictor.collections:
-        api_predictor.load_model(collection)
+    preload_models()
 
-    logger.info("AI API Server starting on port 5000...")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Dev server (Werkzeug); production: gunicorn -c gunicorn.conf.py ai_api:app
+    debug = os.environ.get('AI_API_DEBUG', '1') == '1'
+    logger.info(f"AI API Server starting on port 5000 (debug={debug})...")
+    app.run(host='0.0.0.0', port=5000, debug=debug)
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Gunicorn config cho chế độ production của AI API
+
+Chạy (từ thư mục backend/):
+    gunicorn -c gunicorn.conf.py ai_api:app
+hoặc:
+    python start_ai_api.py --production
+
+Model được load một lần trong master (preload_app + when_ready), các worker fork ra
+dùng chung copy-on-write. Reload graceful: kill -HUP <master pid>.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('AI_API_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('AI_API_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('AI_API_THREADS', 1))
+
+# Import ai_api trong master trước khi fork
+preload_app = True
+
+# Recycle worker sau N request (jitter để các worker không restart cùng lúc)
+max_requests = int(os.environ.get('AI_API_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('AI_API_MAX_REQUESTS_JITTER', 100))
+
+# /train chạy nền (TrainingJobQueue) nên request nào cũng chỉ là inference; request chậm nhất
+# là lần đầu load model chưa preload hoặc forecast batch lớn
+timeout = int(os.environ.get('AI_API_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('AI_API_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = os.environ.get('AI_API_ACCESS_LOG')
+errorlog = '-'
+loglevel = os.environ.get('AI_API_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Load model của mọi collection trong master, trước khi fork worker"""
+    import ai_api
+
+    loaded = ai_api.preload_models()
+    server.log.info(f"Preloaded {loaded} models: {ai_api.model_cache.stats()['collections']}")
+
+    # Đưa object đã load ra khỏi GC để lượt collect trong worker không ghi vào page dùng chung
+    gc.freeze()
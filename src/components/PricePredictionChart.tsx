@@ -107,8 +107,22 @@ const PricePredictionChart: React.FC<PricePredictionChartProps> = ({
         throw new Error(`Training failed: ${response.status}`)
       }
 
-      const result = await response.json()
-      console.log('Training completed:', result)
+      // Training chạy nền trên AI API: poll trạng thái job tới khi xong
+      const { job_id } = await response.json()
+      let job: any
+      do {
+        await new Promise(resolve => setTimeout(resolve, 2000))
+        const statusResponse = await fetch(`http://localhost:5000/train/jobs/${job_id}`)
+        if (!statusResponse.ok) {
+          throw new Error(`Training status failed: ${statusResponse.status}`)
+        }
+        job = await statusResponse.json()
+      } while (job.status === 'queued' || job.status === 'running')
+
+      if (job.status !== 'succeeded') {
+        throw new Error(`Training ${job.status}: ${job.error || ''}`)
+      }
+      console.log('Training completed:', job.result)
 
       // Refresh predictions after training
       await fetchPredictions(collection)
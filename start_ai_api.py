@@ -9,19 +9,25 @@ import sys
 import subprocess
 
 def main():
-    print("🚀 Starting NFT AI Prediction API...")
+    # --production: gunicorn with preforked workers sharing preloaded models (backend/gunicorn.conf.py)
+    production = '--production' in sys.argv
+    print(f"🚀 Starting NFT AI Prediction API{' (production)' if production else ''}...")
     
     # Change to backend directory
     os.chdir('backend')
     
+    if production:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'ai_api:app']
+    else:
+        command = [sys.executable, 'ai_api.py']
+    
     # Start Flask AI API
     try:
-        subprocess.run([
-            sys.executable, 
-            'ai_api.py'
-        ], check=True)
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         print(f"❌ Error starting AI API: {e}")
+        if production:
+            print("💡 Production mode requires gunicorn: pip install -r ai/requirements.txt")
         return 1
     except KeyboardInterrupt:
         print("\n⏹️  AI API stopped by user")